@@ -15,7 +15,8 @@ with open('src/soorgeon/__init__.py', 'rb') as f:
             _version_re.search(f.read().decode('utf-8')).group(1)))
 
 REQUIRES = [
-    'jupytext',
+    # writers.py matches the output of these versions
+    'jupytext>=1.15,<1.20',
     'parso',
     'nbformat',
     'jinja2',
@@ -67,6 +68,7 @@ setup(
     package_data={"": []},
     classifiers=[],
     keywords=[],
+    python_requires='>=3.8',
     install_requires=REQUIRES,
     extras_require={
         'dev': DEV,
@@ -45,3 +45,13 @@ argument.
 """
 
 __version__ = '0.0.17dev'
+
+
+def __getattr__(name):
+    # imported on first access, so importing soorgeon (e.g., from the CLI)
+    # doesn't import jupytext, parso and the rest of the dependencies
+    if name == 'analyze':
+        from soorgeon.structure import analyze
+        return analyze
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,213 @@
+"""
+Static analysis of a notebook: which variables each section uses and
+exposes, and how sections depend on each other
+"""
+from soorgeon import io, astio, definitions, parallel
+from soorgeon.cache import AnalysisCache
+
+
+class Analysis:
+    """
+    Results of the static analysis of a notebook. They are computed once and
+    shared with every step that needs them
+
+    Parameters
+    ----------
+    context : context.AnalysisContext
+        Parsed notebook's code, the sections' snippets must be registered
+
+    engine : {'parso', 'ast'}, default='parso'
+        Engine to find the inputs and outputs of each section, 'ast' uses
+        the astio module, which is faster
+
+    cache : cache.AnalysisCache, default=None
+        Cache with the results of earlier runs. If passed, only the sections
+        whose code (or the names they inherit from earlier sections) changed
+        are analyzed
+
+    jobs : int, default=None
+        Number of processes to analyze the sections. If None, they're
+        analyzed in the current process. Ignored if passing pool
+
+    pool : parallel.Pool, default=None
+        Worker processes to analyze the sections, created with
+        (engine, context) as shared argument. Pass it to reuse the workers
+        (and the sections they parsed) in later steps
+
+    Attributes
+    ----------
+    io : dict
+        {name: (inputs, outputs), ...} mapping
+
+    io_pruned : dict
+        Like io, but outputs only include variables used by other sections
+
+    providers : io.ProviderMapping
+        Resolves which section declares each variable
+
+    upstream : dict
+        {name: [upstream_name, ...], ...} mapping
+
+    definitions : dict
+        {name: code, ...} mapping with all the function and class
+        definitions in the notebook
+
+    find_inputs_memo : io.FindInputsMemo
+        Memo used when computing io, it has hit and miss counters. None if
+        using the 'ast' engine
+    """
+
+    def __init__(self,
+                 context,
+                 engine='parso',
+                 cache=None,
+                 jobs=None,
+                 pool=None):
+        if pool is None:
+            with parallel.Pool(jobs, shared=(engine, context)) as pool:
+                self.io = self._find_io(context, engine, cache, pool)
+        else:
+            self.io = self._find_io(context, engine, cache, pool)
+
+        self.io_pruned = io.prune_io(self.io)
+        # inputs are the same in io and io_pruned, and pruning only removes
+        # outputs that no section uses, so both give the same providers
+        self.providers = io.ProviderMapping(self.io_pruned)
+        self.upstream = io.find_upstream_from_io(self.io, self.providers)
+        self.definitions = definitions.from_def_and_class(context.tree)
+
+    def _find_io(self, context, engine, cache, pool):
+        if engine == 'ast':
+            self.find_inputs_memo = None
+            return _find_io(context, engine, cache, pool)
+
+        with io.memoize_find_inputs() as memo:
+            self.find_inputs_memo = memo
+            return _find_io(context, engine, cache, pool)
+
+
+def _find_io(context, engine, cache, pool):
+    if cache is None and not pool.is_parallel(list(context.snippets)):
+        if engine == 'ast':
+            return astio.find_io(context.snippets, modules=context.modules)
+        else:
+            return io.find_io(context.snippets, trees=context.trees)
+    else:
+        return _find_io_by_section(context, engine, cache, pool)
+
+
+def _find_io_by_section(context, engine, cache, pool):
+    """
+    Like io.find_io, but analyzes sections independently so it can reuse
+    the results in the cache (if any) and distribute the work among the
+    pool's processes. Sections are only parsed if their results aren't in
+    the cache, and each one is parsed once (in the process that analyzes it)
+    """
+    sections = list(context.snippets.items())
+
+    # the names a section defines only depend on its code, so they're
+    # cached separately and we can find the sections to analyze without
+    # parsing the ones that are in the cache
+    defined = {}
+    missing = []
+
+    for name, code in sections:
+        names = (cache.get(_key_defined(engine, code))
+                 if cache is not None else None)
+
+        if names is None:
+            missing.append((name, code))
+        else:
+            defined[name] = names
+
+    for (name, code), names in zip(missing,
+                                   pool.map(_find_defined_names, missing)):
+        defined[name] = names
+
+        if cache is not None:
+            cache.set(_key_defined(engine, code), names)
+
+    entries = {}
+    # (name, code, scope) for the sections to analyze
+    pending = []
+    # names defined in earlier sections
+    scope = frozenset()
+
+    for name, code in sections:
+        entry = (cache.get(_key(engine, code, scope))
+                 if cache is not None else None)
+
+        if entry is None:
+            pending.append((name, code, scope))
+        else:
+            entries[name] = entry
+
+        scope = scope.union(defined[name])
+
+    # sections parsed above go first, in the same order, so they're analyzed
+    # by the same processes, which already parsed them
+    order = {name: idx for idx, (name, _) in enumerate(missing)}
+    pending.sort(key=lambda section: order.get(section[0], len(order)))
+    results = pool.map(_find_section_io, pending)
+
+    for (name, code, scope), (inputs, outputs) in zip(pending, results):
+        entries[name] = {'inputs': inputs, 'outputs': outputs}
+
+        if cache is not None:
+            cache.set(_key(engine, code, scope), entries[name])
+
+    if cache is not None:
+        cache.evict()
+
+    return {
+        name: (set(entries[name]['inputs']), set(entries[name]['outputs']))
+        for name, _ in sections
+    }
+
+
+def _key(engine, code, scope):
+    return AnalysisCache.key('io', engine, code, *sorted(scope))
+
+
+def _key_defined(engine, code):
+    return AnalysisCache.key('defined', engine, code)
+
+
+def _parse(shared, name):
+    """
+    Returns the parsed section, the context keeps it so the next steps (in
+    the same process) reuse it
+    """
+    engine, context = shared
+    return (context.get_module(name)
+            if engine == 'ast' else context.get_tree(name))
+
+
+def _find_defined_names(shared, section):
+    """Returns the (sorted) names defined in a section
+    """
+    name, _ = section
+    parsed = _parse(shared, name)
+
+    if shared[0] == 'ast':
+        defined = astio.find_defined_names(parsed)
+    else:
+        defined = definitions.find_defined_names(parsed)
+
+    return sorted(defined)
+
+
+def _find_section_io(shared, section):
+    """Returns the (sorted) inputs and outputs of a section
+    """
+    name, code, scope = section
+    parsed = _parse(shared, name)
+
+    if shared[0] == 'ast':
+        inputs, outputs = astio.find_inputs_and_outputs_from_module(
+            parsed, code, local_scope=scope)
+    else:
+        inputs, outputs = io.find_inputs_and_outputs_from_tree(
+            parsed, local_scope=scope)
+
+    return sorted(inputs), sorted(outputs)
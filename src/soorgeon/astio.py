@@ -0,0 +1,569 @@
+"""
+Alternative engine to determine inputs and outputs from code snippets. It
+uses the ast module (and symtable to analyze function bodies) instead of
+parso. Parsing with ast is considerably faster, the rules to decide what's an
+input or an output are the same as the ones in the io module, so both engines
+return the same mappings (see Notes in find_io for known differences)
+"""
+import ast
+import symtable
+
+_BUILTIN = set(__builtins__)
+
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+_BLOCKS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With,
+           ast.AsyncWith)
+
+if hasattr(ast, 'TryStar'):
+    _BLOCKS = _BLOCKS + (ast.TryStar, )
+
+# match statements were added in Python 3.10
+_MATCH = getattr(ast, 'Match', ())
+
+
+def find_defined_names(module):
+    """
+    Returns the names defined by import statements, function and class
+    definitions, ast version of definitions.find_defined_names (only returns
+    the names)
+    """
+    names = set()
+    statements = list(module.body)
+
+    while statements:
+        statement = statements.pop()
+
+        if isinstance(statement, ast.Import):
+            names.update(alias.asname or alias.name.split('.')[0]
+                         for alias in statement.names)
+        elif isinstance(statement, ast.ImportFrom):
+            names.update(alias.asname or alias.name
+                         for alias in statement.names if alias.name != '*')
+        elif isinstance(statement,
+                        (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(statement.name)
+        elif isinstance(statement, _BLOCKS):
+            statements.extend(_iter_bodies(statement))
+
+    return names
+
+
+def _iter_bodies(statement):
+    """Iterate over the statements inside a compound statement
+    """
+    for field in ('body', 'orelse', 'finalbody'):
+        yield from getattr(statement, field, ())
+
+    for handler in getattr(statement, 'handlers', ()):
+        yield from handler.body
+
+
+def _is_comprehension(node):
+    """
+    Returns True if node is a comprehension or generator. Such nodes are
+    analyzed with find_comprehension_inputs
+    """
+    return (isinstance(node, _COMPREHENSIONS)
+            and not any(gen.is_async for gen in node.generators))
+
+
+def find_inputs(node, only_getitem_and_attribute_access=False):
+    """
+    Extract inputs from an expression
+    e.g. function(x, y) returns {'function', 'x', 'y'}
+
+    Parameters
+    ----------
+    only_getitem_and_attribute_access : bool, default=False
+        Only return names that are followed by [ or .
+
+    Returns
+    -------
+    frozenset
+        The inputs
+    """
+    names = set()
+    stack = [node]
+
+    while stack:
+        current = stack.pop()
+
+        if _is_comprehension(current):
+            names.update(find_comprehension_inputs(current))
+        elif isinstance(current, ast.Lambda):
+            scope, inputs = find_lambda_scope_and_inputs(current)
+            names.update(inputs - scope)
+        elif isinstance(current, ast.Name):
+            if (not only_getitem_and_attribute_access
+                    and current.id not in _BUILTIN):
+                names.add(current.id)
+        else:
+            if (only_getitem_and_attribute_access
+                    and isinstance(current, (ast.Attribute, ast.Subscript))
+                    and isinstance(current.value, ast.Name)
+                    and current.value.id not in _BUILTIN):
+                names.add(current.value.id)
+
+            stack.extend(ast.iter_child_nodes(current))
+
+    return frozenset(names)
+
+
+def _find_inputs_for_each(nodes):
+    return frozenset().union(*(find_inputs(node) for node in nodes))
+
+
+def find_comprehension_inputs(node):
+    """Find inputs for list/set/dict comprehension or generator
+    """
+    if not isinstance(node, _COMPREHENSIONS):
+        raise ValueError('Expected a comprehension or generator, '
+                         f'got: {type(node).__name__}')
+
+    if isinstance(node, ast.DictComp):
+        inputs_left = _find_inputs_for_each([node.key, node.value])
+    else:
+        inputs_left = find_inputs(node.elt)
+
+    inputs, declared = set(), set()
+
+    for generator in node.generators:
+        declared.update(find_inputs(generator.target))
+        inputs.update(find_inputs(generator.iter))
+
+        # conditions are ignored, and so are the loops that follow them,
+        # e.g., [y for x in a if x for y in x]
+        if generator.ifs:
+            break
+
+    return (inputs_left | inputs) - declared
+
+
+def _find_parameters(arguments):
+    """
+    Returns the names in a function or lambda signature (including names
+    used in default values and annotations)
+    """
+    args = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+    args += [arg for arg in (arguments.vararg, arguments.kwarg) if arg]
+
+    annotations = [arg.annotation for arg in args if arg.annotation]
+    defaults = [
+        default for default in arguments.defaults + arguments.kw_defaults
+        if default
+    ]
+
+    return ({arg.arg
+             for arg in args if arg.arg not in _BUILTIN}
+            | _find_inputs_for_each(annotations + defaults))
+
+
+def find_lambda_scope_and_inputs(lambda_, local_scope=None):
+    if not isinstance(lambda_, ast.Lambda):
+        raise ValueError(f'Expected a lambda, got {lambda_}')
+
+    local_scope = local_scope or set()
+
+    parameters = _find_parameters(lambda_.args)
+    body_in = find_inputs(lambda_.body)
+
+    return parameters, body_in - local_scope - parameters
+
+
+def _find_defined_names_in_target(node):
+    """
+    Returns the names defined by an assignment target, e.g.,
+    a, (b, c), d.e = ... returns ['a', 'b', 'c', 'e']
+    """
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return [
+            name for element in node.elts
+            for name in _find_defined_names_in_target(element)
+        ]
+    elif isinstance(node, ast.Starred):
+        return _find_defined_names_in_target(node.value)
+    elif isinstance(node, ast.Attribute):
+        return [node.attr]
+    elif isinstance(node, ast.Name):
+        return [node.id]
+    else:
+        return []
+
+
+def _find_last_name(node):
+    """Returns a set with the name at the end of node (if any)
+    """
+    end = (node.end_lineno, node.end_col_offset)
+
+    return {
+        current.id
+        for current in ast.walk(node) if isinstance(current, ast.Name) and (
+            current.end_lineno, current.end_col_offset) == end
+    }
+
+
+def _find_identifiers(node):
+    """Returns all the identifiers in a node (including attribute names)
+    """
+    identifiers = set()
+
+    for current in ast.walk(node):
+        if isinstance(current, ast.Name):
+            identifiers.add(current.id)
+        elif isinstance(current, ast.Attribute):
+            identifiers.add(current.attr)
+        elif isinstance(current, ast.keyword) and current.arg:
+            identifiers.add(current.arg)
+        elif isinstance(current, ast.arg):
+            identifiers.add(current.arg)
+
+    return identifiers
+
+
+class _FunctionScopes:
+    """
+    Finds the global variables that functions use. Uses the symbol table
+    of the snippet, which is only computed if it has functions
+
+    Parameters
+    ----------
+    code : str
+        Source code of the snippet that contains the functions
+    """
+
+    def __init__(self, code):
+        self._code = code
+        self._tables = None
+
+    def _get_table(self, funcdef):
+        if self._tables is None:
+            self._tables = {}
+            pending = [symtable.symtable(self._code, '<snippet>', 'exec')]
+
+            while pending:
+                table = pending.pop()
+
+                if table.get_type() == 'function':
+                    self._tables[(table.get_name(),
+                                  table.get_lineno())] = table
+
+                pending.extend(table.get_children())
+
+        return self._tables[(funcdef.name, funcdef.lineno)]
+
+    def find_global_names(self, funcdef):
+        """
+        Returns the global names used in the function's body (including
+        nested functions, lambdas and comprehensions but not classes)
+        """
+        names = set()
+        pending = [self._get_table(funcdef)]
+
+        while pending:
+            table = pending.pop()
+
+            names.update(
+                symbol.get_name() for symbol in table.get_symbols()
+                if symbol.is_global() and (
+                    symbol.is_referenced() or symbol.is_declared_global()))
+
+            pending.extend(child for child in table.get_children()
+                           if child.get_type() != 'class')
+
+        return names
+
+
+class _Scope:
+    """
+    Finds inputs and outputs in a list of statements, ast version of
+    io.find_inputs_and_outputs_from_leaf
+
+    Parameters
+    ----------
+    local_scope : set
+        Names that should not be considered inputs
+
+    functions : _FunctionScopes
+        Used to find the global variables in function bodies
+    """
+
+    def __init__(self, local_scope, functions):
+        self.local_scope = local_scope
+        self.inputs = set()
+        self.outputs = set()
+        self._functions = functions
+
+    def run(self, statements):
+        for statement in statements:
+            self._statement(statement)
+
+        return self.inputs, self.outputs
+
+    def _add_inputs(self, candidates):
+        self.inputs.update(
+            candidates.difference(_BUILTIN, self.local_scope, self.outputs))
+
+    def _run_block(self, statements, local_scope):
+        """
+        Analyze the body of a for loop or context manager, returns the
+        inputs and outputs
+        """
+        return _Scope(local_scope, self._functions).run(statements)
+
+    def _statement(self, node):
+        if isinstance(node, ast.Assign):
+            self._assign(node.targets, node.value)
+        elif isinstance(node, ast.AnnAssign):
+            if node.value is None:
+                self._expression(node, is_assignment=True)
+            else:
+                self._assign([node.target], node.value)
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            self._for(node)
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            self._with(node)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self._funcdef(node)
+        elif isinstance(node, ast.ClassDef):
+            # TODO: parse annotations
+            for decorator in node.decorator_list:
+                self._expression(decorator)
+        elif isinstance(node, (ast.If, ast.While)):
+            self._expression(node.test)
+            self.run(node.body)
+            self.run(node.orelse)
+        elif isinstance(node, _BLOCKS):
+            # try statements
+            self.run(node.body)
+
+            for handler in node.handlers:
+                if handler.type:
+                    self._expression(handler.type)
+
+                self.run(handler.body)
+
+            self.run(node.orelse)
+            self.run(node.finalbody)
+        elif isinstance(node, _MATCH):
+            self._expression(node.subject)
+
+            for case in node.cases:
+                self._expression(case.pattern)
+
+                if case.guard:
+                    self._expression(case.guard)
+
+                self.run(case.body)
+        else:
+            self._expression(node)
+
+    def _expression(self, node, is_assignment=False):
+        """
+        Find inputs in a node. Variables inside function calls
+        (e.g., some_function(df)) and variables whose items or attributes are
+        accessed (e.g., df['x'], df.x) are inputs. If the node is part of
+        an assignment, only the (keyword) arguments are considered, since the
+        rest is analyzed when processing the assignment
+        """
+        # (node, whether it's inside a function call) pairs
+        stack = [(node, False)]
+
+        while stack:
+            current, inside_call = stack.pop()
+
+            if _is_comprehension(current):
+                self._add_inputs(find_comprehension_inputs(current))
+            elif isinstance(current, ast.Lambda):
+                _, candidates = find_lambda_scope_and_inputs(
+                    current, local_scope=self.local_scope)
+                self._add_inputs(candidates)
+            elif isinstance(current, ast.JoinedStr):
+                self._add_inputs(find_inputs(current))
+            elif isinstance(current, ast.Name):
+                if inside_call and not is_assignment:
+                    self._add_inputs({current.id})
+            elif isinstance(current, ast.Call):
+                # fn(x) and obj.fn(x) are function calls, but (fn)(x) and
+                # fn()(x) are not
+                inside_call_args = inside_call or isinstance(
+                    current.func, (ast.Name, ast.Attribute))
+
+                stack.append((current.func, inside_call))
+                stack.extend(
+                    (arg, inside_call_args) for arg in current.args)
+
+                for keyword in current.keywords:
+                    if keyword.arg:
+                        self._add_inputs(find_inputs(keyword.value))
+
+                    stack.append((keyword.value, inside_call_args))
+            else:
+                if (isinstance(current, (ast.Attribute, ast.Subscript))
+                        and isinstance(current.value, ast.Name)
+                        and not is_assignment):
+                    self._add_inputs({current.value.id})
+
+                stack.extend((child, inside_call)
+                             for child in ast.iter_child_nodes(current))
+
+    def _assign(self, targets, value):
+        """
+        Process an assignment, each target is processed from left to right:
+        a = b = value
+        """
+        for idx, target in enumerate(targets):
+            self._expression(target, is_assignment=True)
+
+            # process inputs. In chained assignments, the next node is
+            # another target, its last name is followed by = and it's
+            # ignored (like keyword arguments)
+            if idx + 1 < len(targets):
+                next_ = targets[idx + 1]
+                self._add_inputs(
+                    find_inputs(next_) - _find_last_name(next_))
+            else:
+                self._add_inputs(find_inputs(value))
+
+            # process outputs, ignore targets that modify existing variables
+            # (defined in the current section)
+            # e.g.,
+            # a = {}
+            # a['x'] = 1
+            # a.b = 1
+            modified = _find_identifiers(target) & (self.outputs
+                                                    | self.local_scope)
+
+            # assigning multiple values, e.g., a, b = 1, 2
+            if isinstance(target, (ast.Tuple, ast.List)):
+                outputs = self.outputs.union(
+                    *(_find_defined_names_in_target(target_)
+                      for target_ in targets))
+            elif isinstance(target, (ast.Attribute, ast.Subscript)):
+                outputs = self.outputs | (find_inputs(target) - modified)
+            else:
+                outputs = self.outputs | (set(
+                    _find_defined_names_in_target(target)) - modified)
+
+            # if the object hasn't been declared so far, getting an item or
+            # setting an attribute on it makes it an input
+            # e.g., object.attribute = value or object['key'] = value
+            inputs_candidates = find_inputs(
+                target, only_getitem_and_attribute_access=True)
+            self.inputs.update(inputs_candidates - self.outputs - modified)
+
+            self.outputs = outputs
+
+        self._expression(value, is_assignment=True)
+
+    def _for(self, node):
+        defined = find_inputs(node.target)
+        iterator_in = find_inputs(node.iter)
+
+        body_in, body_out = self._run_block(node.body + node.orelse,
+                                            local_scope=defined)
+
+        self._add_inputs((iterator_in | body_in) - self.local_scope)
+        self.outputs = self.outputs | body_out
+
+    def _with(self, node):
+        exp, defined = set(), set()
+
+        for item in node.items:
+            exp.update(find_inputs(item.context_expr))
+
+            if item.optional_vars:
+                defined.update(find_inputs(item.optional_vars))
+
+        body_in, body_out = self._run_block(node.body, local_scope=defined)
+
+        self._add_inputs((exp | body_in) - self.local_scope)
+        self.outputs = self.outputs | body_out
+
+    def _funcdef(self, node):
+        for decorator in node.decorator_list:
+            self._expression(decorator)
+
+        parameters = _find_parameters(node.args)
+        body_in = self._functions.find_global_names(node) - parameters
+
+        if node.returns:
+            body_in = body_in | find_inputs(node.returns)
+
+        self._add_inputs(body_in - self.local_scope)
+
+
+def find_inputs_and_outputs(code_str, local_scope=None):
+    """
+    Given a Python code string, find which variables the code consumes (not
+    declared in the snipped) and which ones it exposes (declared in the
+    snippet)
+
+    Parameters
+    ----------
+    local_scope : set
+        Names that should not be considered inputs
+    """
+    return find_inputs_and_outputs_from_module(ast.parse(code_str),
+                                               code_str,
+                                               local_scope=local_scope)
+
+
+def find_inputs_and_outputs_from_module(module, code, local_scope=None):
+    """
+    Like find_inputs_and_outputs, but takes an already parsed module
+
+    Parameters
+    ----------
+    module : ast.Module
+        Parsed code
+
+    code : str
+        The source code of the module
+    """
+    local_scope = set(local_scope or set()) | find_defined_names(module)
+    scope = _Scope(local_scope, _FunctionScopes(code))
+    return scope.run(module.body)
+
+
+def find_io(snippets, modules=None):
+    """
+    Generates a {snippet_name: (inputs, outputs), ...} mapping where inputs
+    are the variables that snippet_name requires to work and outputs the ones
+    that it creates
+
+    Parameters
+    ----------
+    snippets : dict
+        {snippet_name: snippet, ...}
+
+    modules : dict, default=None
+        {snippet_name: ast.Module, ...} with the already parsed snippets. If
+        None, snippets are parsed
+
+    Notes
+    -----
+    Results match the ones from io.find_io except for some constructs where
+    the parso engine fails or returns wrong results, such as annotated
+    assignments (x: int = 1), lambdas with no or more than one parameter, or
+    generators without parenthesis (sum(x for x in y)), where the parso
+    engine reports the loop variable as an input.
+    Function bodies are analyzed with symtable, which follows Python's
+    scoping rules: imports, nested functions and classes inside a function
+    are local to it, the parso engine reports them as inputs
+    """
+    modules = modules or {
+        name: ast.parse(code)
+        for name, code in snippets.items()
+    }
+
+    io = {}
+    scope = frozenset()
+
+    for name, code in snippets.items():
+        io[name] = find_inputs_and_outputs_from_module(modules[name],
+                                                       code,
+                                                       local_scope=scope)
+        scope = scope | find_defined_names(modules[name])
+
+    return io
@@ -0,0 +1,217 @@
+"""
+Refactor many notebooks at once (e.g., when migrating a repository), each
+one into its own directory
+"""
+import os
+import glob
+import time
+import warnings
+from io import StringIO
+from pathlib import Path
+from collections import namedtuple
+from contextlib import redirect_stdout
+
+import click
+
+from soorgeon import exceptions, parallel, ipynb
+from soorgeon.export import NotebookExporter, single_task_from_path
+
+Result = namedtuple('Result', ['path', 'output', 'status', 'elapsed', 'error'])
+
+
+def find_notebooks(pattern):
+    """
+    Returns the notebooks matching a glob pattern, or all the .ipynb files
+    in a directory (recursively) if pattern is a directory. Checkpoints and
+    backups (created by soorgeon refactor --single-task) are ignored
+    """
+    return _find_notebooks(pattern)[0]
+
+
+def _find_notebooks(pattern):
+    """Like find_notebooks, but also returns the backups it ignored
+    """
+    if Path(pattern).is_dir():
+        paths = Path(pattern).glob('**/*.ipynb')
+    else:
+        paths = (Path(path) for path in glob.glob(pattern, recursive=True))
+
+    paths = sorted(
+        path for path in paths
+        if path.is_file() and '.ipynb_checkpoints' not in path.parts)
+    notebooks, backups = [], []
+
+    for path in paths:
+        (backups if _is_backup(path) else notebooks).append(path)
+
+    return notebooks, backups
+
+
+def _is_backup(path):
+    """
+    Returns True if path is a backup ({name}-backup.{ext}) created by
+    soorgeon refactor --single-task, which keeps the original notebook
+    ({name}.{ext}) next to it
+    """
+    name = path.stem
+
+    return name.endswith('-backup') and path.with_name(
+        f'{name[:-len("-backup")]}{path.suffix}').is_file()
+
+
+def output_dirs(paths, out_root):
+    """
+    Returns the output directory for each notebook: out_root and the
+    notebook's path (without extension) relative to the notebooks' common
+    directory
+    """
+    if not paths:
+        return []
+
+    paths = [path.resolve() for path in paths]
+    base = Path(os.path.commonpath([path.parent for path in paths]))
+
+    return [
+        Path(out_root, path.relative_to(base).with_suffix(''))
+        for path in paths
+    ]
+
+
+def refactor_many(paths, out_root, jobs=None, **kwargs):
+    """Refactors many notebooks, continues if any of them fails
+
+    Parameters
+    ----------
+    paths : list of pathlib.Path
+        Notebooks to refactor
+
+    out_root : str or pathlib.Path
+        Each notebook is refactored in a subdirectory (see output_dirs)
+
+    jobs : int, default=None
+        Number of processes. If None, notebooks are refactored in the current
+        process
+
+    **kwargs
+        product_prefix, file_format, df_format, serializer and engine, same
+        as in soorgeon refactor
+
+    Returns
+    -------
+    list of Result
+        Results in the same order as paths. status is 'ok', 'single-task'
+        (if the notebook could only be refactored as a single task
+        pipeline) or 'failed'
+    """
+    items = [(str(path), str(output))
+             for path, output in zip(paths, output_dirs(paths, out_root))]
+    return parallel.run(_refactor, items, jobs, shared=kwargs)
+
+
+def _refactor(kwargs, item):
+    path, output = item
+    start = time.perf_counter()
+    Path(output).mkdir(parents=True, exist_ok=True)
+
+    # the messages (and warnings) from each notebook are meaningless once
+    # they're mixed, we only show the summary
+    with redirect_stdout(StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        status, error = _refactor_or_fallback(path, output, **kwargs)
+
+    return Result(path, output, status, time.perf_counter() - start, error)
+
+
+def _refactor_or_fallback(path,
+                          output,
+                          product_prefix=None,
+                          file_format=None,
+                          df_format=None,
+                          serializer=None,
+                          engine='parso'):
+    ext = Path(path).suffix[1:] if file_format is None else file_format
+
+    try:
+        exporter = NotebookExporter(ipynb.read(path, outputs=ext != 'py'),
+                                    verbose=False,
+                                    df_format=df_format,
+                                    serializer=serializer,
+                                    py=ext == 'py',
+                                    engine=engine,
+                                    output_dir=output)
+        exporter.export(product_prefix=product_prefix)
+    # the notebook won't run, even as a single task
+    except exceptions.InputWontRunError as e:
+        return 'failed', _error_message(e)
+    except Exception as e:
+        error = _error_message(e)
+    else:
+        return 'ok', None
+
+    try:
+        single_task_from_path(path,
+                              product_prefix=product_prefix,
+                              file_format=file_format,
+                              output_dir=output,
+                              backup=False)
+    except Exception as e:
+        return 'failed', f'{error} (single task: {_error_message(e)})'
+    else:
+        return 'single-task', error
+
+
+def _error_message(e):
+    lines = str(e).strip().splitlines()
+    return f'{type(e).__name__}: {lines[0] if lines else ""}'
+
+
+def summary(results, elapsed):
+    """Returns a table with the results
+    """
+    rows = [('Notebook', 'Status', 'Time (s)', 'Details')]
+    rows += [(str(result.path), result.status, f'{result.elapsed:.2f}',
+              result.error or result.output) for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+
+    lines = [
+        '  '.join(value.ljust(width)
+                  for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+    lines.insert(1, '  '.join('-' * width for width in widths))
+
+    failed = sum(result.status == 'failed' for result in results)
+    lines.append(f'\n{len(results) - failed} succeeded, {failed} failed '
+                 f'in {elapsed:.2f}s')
+
+    return '\n'.join(lines)
+
+
+def refactor_many_cli(pattern, out_root, jobs=None, **kwargs):
+    """Refactors many notebooks and prints a summary
+
+    Returns
+    -------
+    bool
+        True if all notebooks were refactored
+    """
+    out_root_ = Path(out_root).resolve()
+    notebooks, backups = _find_notebooks(pattern)
+    # skip the notebooks generated in earlier runs
+    paths = [
+        path for path in notebooks if out_root_ not in path.resolve().parents
+    ]
+
+    if backups:
+        click.echo(f'Skipping {len(backups)} backup(s): ' +
+                   ', '.join(str(path) for path in backups))
+
+    if not paths:
+        raise click.ClickException(f'No notebooks found in {pattern!r}')
+
+    click.echo(f'Refactoring {len(paths)} notebook(s)...')
+    start = time.perf_counter()
+    results = refactor_many(paths, out_root, jobs=jobs, **kwargs)
+    click.echo(summary(results, time.perf_counter() - start))
+
+    return all(result.status != 'failed' for result in results)
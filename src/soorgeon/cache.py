@@ -0,0 +1,213 @@
+"""
+Persistent cache for the static analysis of notebook sections. Entries are
+content-addressed (keyed by a hash of the section's code and the names it
+inherits from earlier sections), so editing a section only invalidates the
+sections whose code or inherited names change
+"""
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+from soorgeon import __version__
+
+
+class AnalysisCache:
+    """Stores JSON-serializable analysis results in a directory
+
+    Parameters
+    ----------
+    path : str or pathlib.Path, default='.soorgeon/cache'
+        Directory to store the entries, created if it doesn't exist
+
+    max_size : int, default=64MB
+        Maximum size (in bytes) of all entries. When exceeded, least recently
+        used entries are deleted
+
+    Attributes
+    ----------
+    hits : int
+        Number of times get found an entry
+
+    misses : int
+        Number of times get did not find an entry
+    """
+
+    def __init__(self, path='.soorgeon/cache', max_size=64 * 1024 * 1024):
+        self._path = Path(path)
+        self._max_size = max_size
+        self._written = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts):
+        """Returns the key for an entry from the given string parts
+        """
+        hash_ = hashlib.sha256(__version__.encode())
+
+        for part in parts:
+            hash_.update(b'\0')
+            hash_.update(part.encode())
+
+        return hash_.hexdigest()
+
+    def _path_to(self, key):
+        return self._path / f'{key}.json'
+
+    def get(self, key):
+        """Returns the value stored with the key (None if there isn't any)
+        """
+        path = self._path_to(key)
+
+        try:
+            value = json.loads(path.read_text())
+            # the modification time tracks usage to evict the least recently
+            # used entries
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Stores a JSON-serializable value
+        """
+        if not self._path.is_dir():
+            self._path.mkdir(parents=True, exist_ok=True)
+            (self._path / '.gitignore').write_text('*\n')
+
+        path = self._path_to(key)
+        # a unique temporary file, other processes and threads may be writing
+        # the same entry
+        fd, path_tmp = tempfile.mkstemp(dir=self._path, suffix='.tmp')
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps(value))
+
+        # replace is atomic, concurrent readers never see partial entries
+        os.replace(path_tmp, path)
+
+        self._written = True
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the total size is
+        under max_size. Only checks the entries if set was called since
+        the last time
+        """
+        if not self._written:
+            return
+
+        self._written = False
+        entries = []
+
+        for path in self._path.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+
+        for _, size_entry, path in sorted(entries, key=lambda e: e[0]):
+            if size <= self._max_size:
+                break
+
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+            size -= size_entry
+
+    def __repr__(self):
+        return (f'{type(self).__name__}({str(self._path)!r}, '
+                f'hits={self.hits}, misses={self.misses})')
+
+
+class MemoryCache:
+    """
+    Stores analysis results in memory, it has the same get, set and evict
+    methods as AnalysisCache. Used by long-lived processes that analyze the
+    same notebook many times
+
+    Parameters
+    ----------
+    backend : AnalysisCache, default=None
+        If passed, entries that aren't in memory are looked up there, and
+        new entries are also stored there, so results are shared with
+        processes that use the same directory
+
+    Attributes
+    ----------
+    hits : int
+        Number of times get found an entry
+
+    misses : int
+        Number of times get did not find an entry
+
+    Notes
+    -----
+    evict deletes the entries that weren't used since the last time it was
+    called, so it only keeps the results from the last analysis
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._entries = {}
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the value stored with the key (None if there isn't any)
+        """
+        value = self._entries.get(key)
+
+        if value is None and self._backend is not None:
+            value = self._backend.get(key)
+
+            if value is not None:
+                self._entries[key] = value
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._used.add(key)
+
+        return value
+
+    def set(self, key, value):
+        """Stores a value
+        """
+        self._entries[key] = value
+        self._used.add(key)
+
+        if self._backend is not None:
+            self._backend.set(key, value)
+
+    def evict(self):
+        """Deletes the entries that weren't used since the last call
+        """
+        self._entries = {
+            key: value
+            for key, value in self._entries.items() if key in self._used
+        }
+        self._used = set()
+
+        if self._backend is not None:
+            self._backend.evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(hits={self.hits}, '
+                f'misses={self.misses})')
@@ -0,0 +1,136 @@
+"""
+Lightweight, read-only views of notebook cells. Refactoring transforms the
+cells' source code a few times (e.g., commenting magics, removing imports),
+instead of copying the notebook on each step, views share the original cell
+(and its metadata, outputs, etc.) and only store the new source
+"""
+import nbformat
+
+
+class Cell:
+    """Read-only view of a notebook cell
+
+    Parameters
+    ----------
+    node : dict-like or Cell
+        The cell (e.g., an nbformat.NotebookNode), it's never modified. If
+        a Cell, the new view shares its cell
+
+    source : str, default=None
+        The cell's source code, if None, it uses the one in node
+
+    Notes
+    -----
+    It supports the read operations we use on notebook cells (e.g.,
+    cell.cell_type and cell['source']), use to_node to get an
+    nbformat.NotebookNode
+    """
+    __slots__ = ('_node', '_source')
+
+    def __init__(self, node, source=None):
+        if isinstance(node, Cell):
+            source = node._source if source is None else source
+            node = node._node
+
+        # only store the source if it's different, so views that don't
+        # change it share the string
+        if source is not None and source == node['source']:
+            source = None
+
+        object.__setattr__(self, '_node', node)
+        object.__setattr__(self, '_source', source)
+
+    @property
+    def source(self):
+        return self._node['source'] if self._source is None else self._source
+
+    @property
+    def cell_type(self):
+        return self._node['cell_type']
+
+    @property
+    def metadata(self):
+        return self._node.get('metadata', {})
+
+    def replace(self, source):
+        """Returns a view of the same cell with another source
+        """
+        return Cell(self, source)
+
+    def to_node(self, **values):
+        """
+        Returns an nbformat.NotebookNode with the cell's content, updated with
+        values (e.g., id). Values that aren't replaced (e.g., metadata) are
+        shared with the original cell, not copied
+        """
+        return nbformat.NotebookNode({
+            **self._node, 'source': self.source,
+            **values
+        })
+
+    def __getitem__(self, key):
+        return self.source if key == 'source' else self._node[key]
+
+    def __contains__(self, key):
+        return key in self._node
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __reduce__(self):
+        # proto tasks are sent to other processes when using jobs
+        return type(self), (self._node, self._source)
+
+    def __eq__(self, other):
+        return (isinstance(other, Cell) and self._node is other._node
+                and self.source == other.source)
+
+    def __hash__(self):
+        return hash((id(self._node), self.source))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.cell_type}, {self.source!r})'
+
+
+class Notebook:
+    """Read-only view of a notebook, with a tuple of Cell views
+
+    Parameters
+    ----------
+    cells : iterable
+        Cells (or Cell views)
+
+    metadata : dict, default=None
+        Notebook metadata, it's shared (not copied)
+    """
+    __slots__ = ('cells', 'metadata')
+
+    def __init__(self, cells, metadata=None):
+        object.__setattr__(self, 'cells', tuple(
+            cell if isinstance(cell, Cell) else Cell(cell) for cell in cells))
+        object.__setattr__(self, 'metadata',
+                           metadata if metadata is not None else {})
+
+    @classmethod
+    def from_nb(cls, nb):
+        """Returns a view of a notebook (e.g., an nbformat.NotebookNode)
+        """
+        return nb if isinstance(nb, cls) else cls(nb.cells, nb.metadata)
+
+    def map_code(self, fn):
+        """
+        Returns a view with fn applied to the source of each code cell
+        """
+        return Notebook((cell.replace(fn(cell.source))
+                         if cell.cell_type == 'code' else cell
+                         for cell in self.cells),
+                        metadata=self.metadata)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __reduce__(self):
+        return type(self), (self.cells, self.metadata)
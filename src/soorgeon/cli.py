@@ -1,6 +1,14 @@
+"""
+Command line interface. soorgeon is called from pre-commit hooks (once per
+file), so startup time matters: subsystems (and their dependencies, like
+jupytext and parso) are imported inside the commands that use them. If
+soorgeon serve is running, analyze, refactor and clean run there
+"""
+import os
+import logging
+
 import click
-from soorgeon import __version__, export
-from soorgeon.clean import basic_clean
+from soorgeon import __version__, server
 
 
 @click.group()
@@ -38,8 +46,26 @@ def cli():
               default=None,
               type=click.Choice(('cloudpickle', 'dill')),
               help='Serializer for non-picklable data')
+@click.option('--engine',
+              '-e',
+              default='parso',
+              type=click.Choice(('parso', 'ast')),
+              help='Engine to find inputs and outputs (ast is faster)')
+@click.option('--no-cache',
+              is_flag=True,
+              help=('Analyze all sections, even if the results are cached '
+                    'in .soorgeon/cache'))
+@click.option('--jobs',
+              '-j',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Number of processes to analyze and export sections')
+@click.option('--watch',
+              '-w',
+              is_flag=True,
+              help='Refactor again every time the notebook changes')
 def refactor(path, log, product_prefix, df_format, single_task, file_format,
-             serializer):
+             serializer, engine, no_cache, jobs, watch):
     """
     Refactor a monolithic notebook.
 
@@ -53,14 +79,49 @@ def refactor(path, log, product_prefix, df_format, single_task, file_format,
 
     User guide: https://github.com/ploomber/soorgeon/blob/main/doc/guide.md
     """
+    if log:
+        logging.basicConfig(level=log.upper())
+
+    if watch:
+        from soorgeon.watch import watch as watch_notebook
+
+        if single_task:
+            raise click.UsageError('--watch cannot be used with --single-task')
+
+        return watch_notebook(path,
+                              product_prefix=product_prefix,
+                              file_format=file_format,
+                              df_format=df_format,
+                              serializer=serializer,
+                              engine=engine,
+                              jobs=jobs)
+
+    # the server handles requests in threads and doesn't start processes,
+    # so refactoring with jobs runs in this process, and so does refactoring
+    # with --log, since logs are configured in this process
+    served = jobs is None and not log and _refactor_in_server(
+        path=os.path.abspath(path),
+        cwd=os.getcwd(),
+        product_prefix=product_prefix,
+        df_format=df_format,
+        single_task=single_task,
+        file_format=file_format,
+        serializer=serializer,
+        engine=engine,
+        no_cache=no_cache)
+
+    if not served:
+        from soorgeon import export
 
-    export.refactor(path,
-                    log,
-                    product_prefix=product_prefix,
-                    df_format=df_format,
-                    single_task=single_task,
-                    file_format=file_format,
-                    serializer=serializer)
+        export.refactor(path,
+                        product_prefix=product_prefix,
+                        df_format=df_format,
+                        single_task=single_task,
+                        file_format=file_format,
+                        serializer=serializer,
+                        engine=engine,
+                        no_cache=no_cache,
+                        jobs=jobs)
 
     click.secho(f'Finished refactoring {path!r}, use Ploomber to continue.',
                 fg='green')
@@ -84,6 +145,117 @@ Plot pipeline:
 """)
 
 
+def _refactor_in_server(**params):
+    """Returns True if soorgeon serve refactored the notebook
+    """
+    try:
+        server.call('refactor', **params)
+    except server.NotRunningError:
+        return False
+    else:
+        return True
+
+
+@cli.command()
+@click.argument('pattern')
+@click.option('--out-root',
+              '-o',
+              default='refactored',
+              help='Directory to store the pipelines (one per notebook)')
+@click.option('--jobs',
+              '-j',
+              default=None,
+              type=click.IntRange(min=1),
+              help='Number of notebooks to refactor in parallel')
+@click.option(
+    '--df-format',
+    '-d',
+    default=None,
+    type=click.Choice(('parquet', 'csv')),
+    help='Format for variables with the df prefix. Otherwise uses pickle')
+@click.option('--product-prefix',
+              '-p',
+              default=None,
+              help='Prefix for all products')
+@click.option(
+    '--file-format',
+    '-f',
+    default=None,
+    type=click.Choice(('py', 'ipynb')),
+    help=('Format for pipeline tasks, if empty keeps the same format '
+          'as the input'))
+@click.option('--serializer',
+              '-z',
+              default=None,
+              type=click.Choice(('cloudpickle', 'dill')),
+              help='Serializer for non-picklable data')
+@click.option('--engine',
+              '-e',
+              default='parso',
+              type=click.Choice(('parso', 'ast')),
+              help='Engine to find inputs and outputs (ast is faster)')
+def refactor_many(pattern, out_root, jobs, df_format, product_prefix,
+                  file_format, serializer, engine):
+    """
+    Refactor many notebooks, each one into its own directory.
+
+    $ soorgeon refactor-many notebooks/ --jobs 4
+
+    $ soorgeon refactor-many 'notebooks/**/*.ipynb' --out-root pipelines
+
+    If a directory is passed, it refactors all .ipynb files in it. Notebooks
+    that can't be refactored are converted into single task pipelines.
+    """
+    from soorgeon import batch
+
+    ok = batch.refactor_many_cli(pattern,
+                                 out_root,
+                                 jobs=jobs,
+                                 product_prefix=product_prefix,
+                                 file_format=file_format,
+                                 df_format=df_format,
+                                 serializer=serializer,
+                                 engine=engine)
+
+    if not ok:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--json',
+              'as_json',
+              is_flag=True,
+              help='Print the results as JSON')
+@click.option('--engine',
+              '-e',
+              default='parso',
+              type=click.Choice(('parso', 'ast')),
+              help='Engine to find inputs and outputs (ast is faster)')
+def analyze(path, as_json, engine):
+    """
+    Show the sections of a notebook and how they depend on each other
+    (without refactoring it).
+
+    $ soorgeon analyze nb.ipynb
+
+    $ soorgeon analyze nb.ipynb --json
+    """
+    import json
+    from soorgeon import structure
+
+    try:
+        result = structure.NotebookStructure(**server.call(
+            'analyze', path=os.path.abspath(path), engine=engine))
+    except server.NotRunningError:
+        result = structure.analyze(path, engine=engine)
+
+    if as_json:
+        click.echo(json.dumps(result._asdict(), indent=2))
+    else:
+        click.echo(structure.to_text(result))
+
+
 @cli.command()
 @click.argument("filename", type=click.Path(exists=True))
 def clean(filename):
@@ -95,4 +267,31 @@ def clean(filename):
     $ soorgeon clean path/to/notebook.ipynb
 
     """
-    basic_clean(filename)
+    try:
+        server.call('clean', path=os.path.abspath(filename))
+    except server.NotRunningError:
+        from soorgeon.clean import basic_clean
+
+        basic_clean(filename)
+
+
+@cli.command()
+@click.option('--socket',
+              '-s',
+              'socket_path',
+              default=None,
+              help=('Path to the Unix socket. Defaults to $SOORGEON_SOCKET '
+                    'or ~/.soorgeon/serve.sock'))
+@click.option('--log', '-l', default=None)
+def serve(socket_path, log):
+    """
+    Run a server that keeps notebooks' analysis in memory. While it's
+    running, analyze, refactor and clean are sent to it (set
+    SOORGEON_NO_SERVER=1 to run them in the current process).
+
+    $ soorgeon serve
+    """
+    if log:
+        logging.basicConfig(level=log.upper())
+
+    server.serve(socket_path)
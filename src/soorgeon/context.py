@@ -0,0 +1,124 @@
+"""
+Parsed representations of a notebook's source code. Parsing is one of the
+most expensive steps when refactoring large notebooks, so we do it once and
+share the results with the checks and the exporter
+"""
+import ast
+
+import parso
+
+
+class AnalysisContext:
+    """Parses the code of a notebook (and its sections) once
+
+    Parameters
+    ----------
+    code : str
+        Notebook's source code (all code cells)
+
+    parse : callable, default=None
+        Function to parse code with parso, called with the section's name
+        (None for the notebook's source code) and the code. If None, it
+        uses parso.parse
+
+    Notes
+    -----
+    Objects are parsed on first access. Section code must be registered
+    with add_snippets before accessing the trees and modules attributes
+    """
+
+    def __init__(self, code, parse=None):
+        self._code = code
+        self._snippets = {}
+        self._parse = parse or _parse
+
+        self._tree = None
+        self._module = None
+        self._trees = {}
+        self._modules = {}
+
+    def __reduce__(self):
+        # other processes (see parallel.Pool) get the code but parse it on
+        # their own: sending parsed objects is slower than parsing them
+        # again, and the parse function may not be picklable
+        return _unpickle, (self._code, self._snippets)
+
+    def add_snippets(self, snippets):
+        """Register the code of each notebook section
+
+        Parameters
+        ----------
+        snippets : dict
+            {section_name: code, ...} mapping. Order is important, it must
+            match the order of appearance of the sections in the notebook
+        """
+        self._snippets.update(snippets)
+
+    @property
+    def code(self):
+        """Notebook's source code
+        """
+        return self._code
+
+    @property
+    def snippets(self):
+        """{section_name: code, ...} mapping
+        """
+        return self._snippets
+
+    @property
+    def tree(self):
+        """parso tree for the notebook's source code
+        """
+        if self._tree is None:
+            self._tree = self._parse(None, self._code)
+
+        return self._tree
+
+    @property
+    def module(self):
+        """ast module for the notebook's source code, raises a SyntaxError
+        if the code is invalid
+        """
+        if self._module is None:
+            self._module = ast.parse(self._code)
+
+        return self._module
+
+    @property
+    def trees(self):
+        """{section_name: parso tree, ...} mapping
+        """
+        return {name: self.get_tree(name) for name in self._snippets}
+
+    @property
+    def modules(self):
+        """{section_name: ast module, ...} mapping
+        """
+        return {name: self.get_module(name) for name in self._snippets}
+
+    def get_tree(self, name):
+        """parso tree for a single section, only parses that section
+        """
+        if name not in self._trees:
+            self._trees[name] = self._parse(name, self._snippets[name])
+
+        return self._trees[name]
+
+    def get_module(self, name):
+        """ast module for a single section, only parses that section
+        """
+        if name not in self._modules:
+            self._modules[name] = ast.parse(self._snippets[name])
+
+        return self._modules[name]
+
+
+def _parse(name, code):
+    return parso.parse(code)
+
+
+def _unpickle(code, snippets):
+    context = AnalysisContext(code)
+    context.add_snippets(snippets)
+    return context
@@ -186,3 +186,148 @@ def is_accessing_variable(leaf):
     dotaccess = children[0].value == '.'
     # FIXME: adding dotacess breaks other tests
     return getitem or dotaccess
+
+
+class LeafIndex:
+    """
+    Flattens the leaves of a parso tree and precomputes some detectors for
+    each one of them. Detectors such as is_inside_funcdef walk up to the
+    root of the tree on every call, the index computes the answers for all
+    leaves in a single pass so they become lookups
+
+    Parameters
+    ----------
+    tree : parso.python.tree.Module
+        The tree to index
+
+    Notes
+    -----
+    Methods return the same values as the functions with the same name in
+    this module, but they only work with leaves in the indexed tree
+    """
+
+    def __init__(self, tree):
+        self._leaves = []
+        # NOTE: we use id(leaf) as key because operators and keywords are
+        # hashed by value, so a tree with many of them would produce lots
+        # of collisions
+        self._leaf2idx = {}
+
+        # the following lists have one element per leaf
+        self._position = []
+        self._inside_funcdef = []
+        self._for_loop = []
+        self._context_manager = []
+        self._inside_parenthesis = []
+        self._expr_stmt = []
+
+        # the for_ and with_ states are None if the node is not inside a
+        # for loop (context manager), True if it's inside but not in its
+        # body, and False if it's in its body. parenthesis is True if the
+        # node or any of its parents is inside function call parenthesis
+        stack = [(tree, None, False, None, None, False, None)]
+
+        while stack:
+            (node, position, funcdef, for_, with_, parenthesis,
+             expr_stmt) = stack.pop()
+
+            # NOTE: nodes are visited in order so we have already seen the
+            # leaves to the left of this one
+            parenthesis = (parenthesis
+                           or self._is_inside_parenthesis(node, position))
+
+            children = getattr(node, 'children', None)
+
+            if children is None:
+                self._leaf2idx[id(node)] = len(self._leaves)
+                self._leaves.append(node)
+                self._position.append(position)
+                self._inside_funcdef.append(funcdef)
+                self._for_loop.append(bool(for_))
+                self._context_manager.append(bool(with_))
+                self._inside_parenthesis.append(parenthesis)
+                self._expr_stmt.append(expr_stmt)
+                continue
+
+            type_ = node.type
+
+            funcdef = funcdef or type_ == 'funcdef'
+
+            if type_ == 'for_stmt':
+                for_ = True
+            elif type_ == 'suite' and for_ is not None:
+                for_ = False
+
+            if type_ == 'with_stmt':
+                with_ = True
+            elif type_ == 'suite' and with_ is not None:
+                with_ = False
+
+            if type_ == 'expr_stmt':
+                expr_stmt = node
+
+            for position_child in reversed(range(len(children))):
+                stack.append((children[position_child], position_child,
+                              funcdef, for_, with_, parenthesis, expr_stmt))
+
+    def _is_inside_parenthesis(self, node, position):
+        """Like is_inside_parenthesis, but uses the index to look up leaves
+        """
+        if position is None or position == 0:
+            return False
+
+        siblings = node.parent.children
+
+        left = siblings[position - 1]
+
+        if getattr(left, 'value', None) != '(':
+            return False
+
+        if position + 1 == len(siblings):
+            return False
+
+        if getattr(siblings[position + 1], 'value', None) != ')':
+            return False
+
+        # to prevent (1, 2, 3) being detected as a function call
+        idx = self._leaf2idx[id(left)]
+        return idx > 0 and self._leaves[idx - 1].type == 'name'
+
+    def next_leaf(self, leaf):
+        """Returns the next leaf (None if this is the last one)
+        """
+        idx = self._leaf2idx[id(leaf)] + 1
+        return self._leaves[idx] if idx < len(self._leaves) else None
+
+    def is_inside_funcdef(self, leaf):
+        return self._inside_funcdef[self._leaf2idx[id(leaf)]]
+
+    def is_for_loop(self, leaf):
+        return self._for_loop[self._leaf2idx[id(leaf)]]
+
+    def is_context_manager(self, leaf):
+        return self._context_manager[self._leaf2idx[id(leaf)]]
+
+    def is_inside_function_call(self, leaf):
+        # ignore it if this is a function definition
+        if leaf.parent.type == 'param':
+            return False
+
+        idx = self._leaf2idx[id(leaf)]
+        siblings = leaf.parent.children
+        position = self._position[idx] + 1
+
+        # ignore names in keyword arguments
+        if (position < len(siblings)
+                and getattr(siblings[position], 'value', None) == '='):
+            return False
+
+        return self._inside_parenthesis[idx]
+
+    def is_left_side_of_assignment(self, leaf):
+        to_check = self._expr_stmt[self._leaf2idx[id(leaf)]]
+
+        if not to_check:
+            return False
+
+        return to_check.children[1].value == '='
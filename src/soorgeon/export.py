@@ -119,12 +119,16 @@ Step 8. Generate step.
 Finally, we generate the pipeline.yaml file.
 """
 import shutil
+import tarfile
+import zipfile
 import traceback
-import ast
 import pprint
+from io import BytesIO
 from collections import namedtuple
+from contextlib import contextmanager
 from pathlib import Path
 import logging
+import warnings
 from importlib import resources
 from soorgeon import assets
 
@@ -135,7 +139,9 @@ import yaml
 import nbformat
 
 from soorgeon import (split, io, definitions, proto, exceptions, magics,
-                      pyflakes)
+                      pyflakes, context, analysis, detect, parallel, files,
+                      ipynb)
+from soorgeon.cache import AnalysisCache
 
 logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=4)
@@ -143,6 +149,11 @@ pp = pprint.PrettyPrinter(indent=4)
 
 class NotebookExporter:
     """Converts a notebook into a Ploomber pipeline
+
+    Notes
+    -----
+    Files are written to output_dir (the current directory if None), so
+    exporters with different output directories can run concurrently
     """
 
     def __init__(self,
@@ -150,7 +161,12 @@ class NotebookExporter:
                  verbose=True,
                  df_format=None,
                  serializer=None,
-                 py=False):
+                 py=False,
+                 engine='parso',
+                 cache=None,
+                 jobs=None,
+                 parse=None,
+                 output_dir=None):
         if df_format not in {None, 'parquet', 'csv'}:
             raise ValueError("df_format must be one of "
                              "None, 'parquet' or 'csv', "
@@ -161,27 +177,44 @@ class NotebookExporter:
                              "None, 'cloudpickle' or 'dill', "
                              f"got: {serializer!r}")
 
-        # NOTE: we're commenting magics here but removing them in ProtoTask,
-        # maybe we should comment magics also in ProtoTask?
-        nb = magics.comment_magics(nb)
+        if engine not in {'parso', 'ast'}:
+            raise ValueError("engine must be one of 'parso' or 'ast', "
+                             f"got: {engine!r}")
+
+        if jobs is not None and (not isinstance(jobs, int) or jobs < 1):
+            raise ValueError("jobs must be None or an integer "
+                             f"greater than 0, got: {jobs!r}")
 
-        self._nb = nb
+        # magics are masked for the analysis and restored in ProtoTask (this
+        # returns a cells.Notebook view, nb is not copied nor modified)
+        self._nb, self._magics = magics.mask_magics(nb)
         self._df_format = df_format
         self._serializer = serializer
         self._verbose = verbose
+        self._engine = engine
+        self._cache = cache
+        self._jobs = jobs
+        self._output_dir = Path(output_dir or '')
 
-        self._io = None
-        self._definitions = None
-        self._tree = None
+        self._analysis = None
+        self._imports_parser = None
         self._providers = None
+        self._pool = None
+
+        # parsed code, shared by the checks and the static analysis so we
+        # only parse the notebook once
+        self._context = context.AnalysisContext(self._get_code(),
+                                                parse=parse)
 
         self._check()
 
-        self._proto_tasks = self._init_proto_tasks(nb, py)
+        self._proto_tasks = self._init_proto_tasks(self._nb, self._magics,
+                                                   py)
 
         # snippets map names with the code the task will contain, we use
         # them to run static analysis
         self._snippets = {pt.name: str(pt) for pt in self._proto_tasks}
+        self._context.add_snippets(self._snippets)
 
     def export(self, product_prefix=None):
         """Export the project
@@ -202,45 +235,127 @@ class NotebookExporter:
         # export .gitignore
         self.export_gitignore(product_prefix)
 
-        task_specs = self.get_task_specs(product_prefix=product_prefix)
+        for path, content in self.get_pipeline_files(product_prefix).items():
+            files.write_text(self._output_dir / path, content)
+
+        self.export_readme()
+
+    def export_to_memory(self, product_prefix=None):
+        """
+        Export the project to memory, returns a {path: content, ...} mapping
+        with the same files export writes (assuming an empty directory).
+        Paths are relative and contents are bytes
+
+        Parameters
+        ---------
+        product_prefix : str
+            A prefix to append to all products. If None, it is set to 'output'
+        """
+        return dict(self._iter_files(product_prefix))
+
+    def export_to_archive(self,
+                          fileobj,
+                          archive_format='zip',
+                          product_prefix=None):
+        """
+        Export the project as a zip or tar archive, written to a file-like
+        object. Each file is written to the archive once it's generated (the
+        tasks are generated together), the archive isn't kept in memory
+
+        Parameters
+        ---------
+        fileobj : file-like object
+            Object to write the archive to (opened in binary mode), it
+            doesn't have to be seekable
+
+        archive_format : {'zip', 'tar'}, default='zip'
+            Archive format
+
+        product_prefix : str
+            A prefix to append to all products. If None, it is set to 'output'
+        """
+        if archive_format not in {'zip', 'tar'}:
+            raise ValueError("archive_format must be one of 'zip' or 'tar', "
+                             f"got: {archive_format!r}")
+
+        files_ = self._iter_files(product_prefix)
+
+        if archive_format == 'zip':
+            _write_zip(fileobj, files_)
+        else:
+            _write_tar(fileobj, files_)
+
+    def _iter_files(self, product_prefix):
+        """
+        Generates (path, content) pairs with the files export writes
+        (assuming an empty directory). Contents are bytes
+        """
+        product_prefix = product_prefix or 'output'
+
+        for path, content in self._iter_sources(product_prefix):
+            if content is not None:
+                yield path, content.encode()
+
+    def _iter_sources(self, product_prefix):
+        yield from self.get_pipeline_files(product_prefix).items()
+        yield 'exported.py', self.get_definitions_source()
+        yield 'requirements.txt', self._get_requirements(None)
+        yield '.gitignore', self._get_gitignore(None, product_prefix)
+        yield 'README.md', self._get_readme(None)
+
+    def get_pipeline_files(self, product_prefix=None):
+        """
+        Return a {path: content, ...} mapping with the tasks' source code and
+        the pipeline.yaml file
+
+        Parameters
+        ---------
+        product_prefix : str
+            A prefix to append to all products. If None, it is set to 'output'
+        """
+        product_prefix = product_prefix or 'output'
 
-        sources = self.get_sources()
+        # analyzing and exporting the sections share the worker processes
+        with self._workers():
+            task_specs = self.get_task_specs(product_prefix=product_prefix)
+            sources = self.get_sources()
 
         dag_spec = {'tasks': list(task_specs.values())}
 
-        for name, task_spec in task_specs.items():
-            path = Path(task_spec['source'])
-            path.parent.mkdir(exist_ok=True, parents=True)
-            path.write_text(sources[name])
+        sources_by_path = {
+            task_spec['source']: sources[name]
+            for name, task_spec in task_specs.items()
+        }
 
         out = yaml.dump(dag_spec, sort_keys=False)
         # pyyaml doesn't have an easy way to control whitespace, but we want
         # tasks to have an empty line between them
         out = out.replace('\n- ', '\n\n- ')
 
-        Path('pipeline.yaml').write_text(out)
+        sources_by_path['pipeline.yaml'] = out
 
-        self.export_readme()
+        return sources_by_path
 
     def _check(self):
         """
         Run a few checks before continuing the refactoring. If this fails,
         we'll require the user to do some small changes to their code.
         """
-        code = self._get_code()
-        _check_syntax(code)
-        pyflakes.check_notebook(self._nb)
-        _check_functions_do_not_use_global_variables(code)
-        _check_no_star_imports(code)
+        code = self._context.code
+        _check_syntax(self._context)
+        pyflakes.check_module(self._context.module)
+        _check_functions_do_not_use_global_variables(code, tree=self.tree)
+        _check_no_star_imports(code, tree=self.tree)
 
-    def _init_proto_tasks(self, nb, py):
+    def _init_proto_tasks(self, nb, magics_, py):
         """Break notebook into smaller sections
         """
         # use H2 headers to break notebook
         breaks = split.find_breaks(nb)
 
-        # generate groups of cells
+        # generate groups of cells (and their magics)
         cells_split = split.split_with_breaks(nb.cells, breaks)
+        magics_split = split.split_with_breaks(magics_, breaks)
 
         # extract names by using the H2 header text
         names = split.names_with_breaks(nb.cells, breaks)
@@ -253,7 +368,9 @@ class NotebookExporter:
                 df_format=self._df_format,
                 serializer=self._serializer,
                 py=py,
-            ) for name, cell_group in zip(names, cells_split)
+                magics=magics_group,
+            ) for name, cell_group, magics_group in zip(
+                names, cells_split, magics_split)
         ]
 
     def get_task_specs(self, product_prefix=None):
@@ -268,47 +385,64 @@ class NotebookExporter:
         """
         Generate the code strings (ipynb or percent format) for each proto task
         """
-        # FIXME: this calls find_providers, we should only call it once
-        upstream = io.find_upstream(self._snippets)
-
-        code_nb = self._get_code()
-
-        return {
-            pt.name: pt.export(
-                upstream,
+        with self._workers() as pool:
+            results = (
+                self.analysis.upstream,
                 self.io,
                 self.providers,
-                code_nb,
+                self.imports_parser,
                 self.definitions,
             )
-            for pt in self._proto_tasks
+
+            sources = pool.map(_export_proto_task, self._proto_tasks,
+                               results)
+
+        return {
+            pt.name: source
+            for pt, source in zip(self._proto_tasks, sources)
         }
 
     def export_definitions(self):
         """Create an exported.py file with function and class definitions
         """
+        exported = self.get_definitions_source()
+
         # do not create exported.py if there are no definitions
+        if exported is not None:
+            files.write_text(self._output_dir / 'exported.py', exported)
+
+    def get_definitions_source(self):
+        """
+        Return the source code for the exported.py file, None if there are
+        no function or class definitions
+        """
         if not self.definitions:
-            return
+            return None
 
         out = '\n\n'.join(self.definitions.values())
 
-        ip = io.ImportsParser(self._get_code())
-        imports = ip.get_imports_cell_for_task(out)
+        imports = self.imports_parser.get_imports_cell_for_task(out)
 
         if imports:
-            exported = f'{imports}\n\n\n{out}'
+            return f'{imports}\n\n\n{out}'
         else:
-            exported = out
-
-        Path('exported.py').write_text(exported)
+            return out
 
     def export_requirements(self):
-        """Generates requirements.txt file, appends it at the end if already
-        exists
+        """Generates requirements.txt file, if it already exists, appends the
+        packages that aren't listed
         """
-        reqs = Path('requirements.txt')
+        path = self._output_dir / 'requirements.txt'
+        content = self._get_requirements(files.read_text(path))
 
+        if content is not None:
+            files.write_text(path, content)
+
+    def _get_requirements(self, content):
+        """
+        Returns requirements.txt's content after adding the packages that
+        aren't listed in content (None if there aren't any)
+        """
         # ploomber is added by default (pinned to >=0.14.7 because earlier
         # versions throw an error when using the inline bash IPython magic
         # during the static_analysis stage)
@@ -325,16 +459,20 @@ class NotebookExporter:
         elif (self._serializer == 'dill' and 'dill' not in pkgs):
             pkgs = ['dill'] + pkgs
 
+        content = content or ''
+        listed = set(content.splitlines())
+        pkgs = [pkg for pkg in pkgs if pkg not in listed]
+
+        if not pkgs:
+            return None
+
         pkgs_txt = '\n'.join(sorted(pkgs))
 
         out = f"""\
 # Auto-generated file, may need manual editing
 {pkgs_txt}
 """
-        if reqs.exists():
-            reqs.write_text(reqs.read_text() + out)
-        else:
-            reqs.write_text(out)
+        return content + out
 
     def _get_code(self):
         """Returns the source of code cells
@@ -343,77 +481,141 @@ class NotebookExporter:
                          if cell['cell_type'] == 'code')
 
     def export_gitignore(self, product_prefix):
-        if product_prefix and not Path(product_prefix).is_absolute():
-            path = Path('.gitignore')
-            content = '' if not path.exists() else path.read_text() + '\n'
-            path.write_text(content + product_prefix + '\n')
+        path = self._output_dir / '.gitignore'
+        content = self._get_gitignore(files.read_text(path), product_prefix)
+
+        if content is not None:
+            files.write_text(path, content)
             self._echo(f'Added {str(product_prefix)!r} directory'
                        ' to .gitignore...')
 
+    def _get_gitignore(self, content, product_prefix):
+        """
+        Returns .gitignore's content after adding product_prefix (None if
+        there's no need to add it)
+        """
+        if not product_prefix or Path(product_prefix).is_absolute():
+            return None
+
+        if content is not None and product_prefix in content.splitlines():
+            return None
+
+        content = '' if content is None else content + '\n'
+        return content + product_prefix + '\n'
+
     def export_readme(self):
-        path = Path('README.md')
+        path = self._output_dir / 'README.md'
+        found = path.exists()
+        content = self._get_readme(files.read_text(path))
 
-        if path.exists():
-            content = path.read_text() + '\n'
-            self._echo('README.md found, appended auto-generated content')
-        else:
-            content = ''
-            self._echo('Added README.md')
+        if content is not None:
+            files.write_text(path, content)
 
-        path.write_text(content + resources.read_text(assets, 'README.md'))
+            if found:
+                self._echo('README.md found, appended auto-generated content')
+            else:
+                self._echo('Added README.md')
+
+    def _get_readme(self, content):
+        """
+        Returns README.md's content after appending the auto-generated
+        content (None if it's already there)
+        """
+        readme = resources.read_text(assets, 'README.md')
+
+        if content is None:
+            return readme
+        elif readme in content:
+            return None
+        else:
+            return content + '\n' + readme
 
     def _echo(self, msg):
         if self._verbose:
             click.echo(msg)
 
+    @contextmanager
+    def _workers(self):
+        """
+        Starts the worker processes (if using jobs), the analysis and export
+        steps in the block share them, so each worker parses its sections
+        once
+        """
+        if self._pool is not None:
+            yield self._pool
+            return
+
+        with parallel.Pool(self._jobs,
+                           shared=(self._engine, self._context)) as pool:
+            self._pool = pool
+
+            try:
+                yield pool
+            finally:
+                self._pool = None
+
+    @property
+    def analysis(self):
+        """
+        Static analysis results, computed once and shared by all the
+        exporting steps
+        """
+        if self._analysis is None:
+            self._analysis = analysis.Analysis(self._context,
+                                               engine=self._engine,
+                                               cache=self._cache,
+                                               jobs=self._jobs,
+                                               pool=self._pool)
+
+            logger.info(f'io: {pp.pformat(self._analysis.io)}\n')
+            logger.info(
+                f'pruned io: {pp.pformat(self._analysis.io_pruned)}\n')
+
+            if self._analysis.find_inputs_memo is not None:
+                logger.info(f'{self._analysis.find_inputs_memo!r}\n')
+
+            if self._cache is not None:
+                logger.info(f'{self._cache!r}\n')
+
+        return self._analysis
+
     @property
     def definitions(self):
-        if self._definitions is None:
-            self._definitions = (definitions.from_def_and_class(self.tree))
+        return self.analysis.definitions
+
+    @property
+    def imports_parser(self):
+        if self._imports_parser is None:
+            self._imports_parser = io.ImportsParser(self._context.code,
+                                                    tree=self.tree)
 
-        return self._definitions
+        return self._imports_parser
 
     @property
     def tree(self):
-        if self._tree is None:
-            code = self._get_code()
-            self._tree = parso.parse(code)
-
-        return self._tree
+        return self._context.tree
 
     @property
     def providers(self):
-        if self._providers is None:
-            self._providers = io.ProviderMapping(self.io)
-
-        return self._providers
+        return self.analysis.providers
 
     @property
     def io(self):
         """
         {name: (inputs, outputs), ...}
         """
-        if self._io is None:
-            io_ = self._get_raw_io()
-
-            logging.info(f'io: {pp.pformat(io_)}\n')
-
-            self._io = io.prune_io(io_)
-
-            logging.info(f'pruned io: {pp.pformat(self._io)}\n')
-
-        return self._io
+        return self.analysis.io_pruned
 
     def _get_raw_io(self):
-        return io.find_io(self._snippets)
+        return self.analysis.io
 
 
 FunctionNeedsFix = namedtuple('FunctionNeedsFix', ['name', 'pos', 'args'])
 
 
-def _check_syntax(code):
+def _check_syntax(context):
     try:
-        ast.parse(code)
+        context.module
     except SyntaxError:
         error = traceback.format_exc()
     else:
@@ -424,8 +626,8 @@ def _check_syntax(code):
                                           f'to invalid syntax\n\n {error}')
 
 
-def _check_no_star_imports(code):
-    tree = parso.parse(code)
+def _check_no_star_imports(code, tree=None):
+    tree = tree if tree is not None else parso.parse(code)
 
     star_imports = [
         import_ for import_ in tree.iter_imports() if import_.is_star_import()
@@ -443,20 +645,22 @@ def _check_no_star_imports(code):
 
 
 # see issue #12 on github
-def _check_functions_do_not_use_global_variables(code):
-    tree = parso.parse(code)
+def _check_functions_do_not_use_global_variables(code, tree=None):
+    tree = tree if tree is not None else parso.parse(code)
 
     needs_fix = []
 
     local_scope = set(definitions.find_defined_names(tree))
 
+    # a single index for all the functions, so we only go over the tree once
+    index = detect.LeafIndex(tree)
+
     for funcdef in tree.iter_funcdefs():
-        # FIXME: this should be passing the tree directly, no need to reparse
-        # again, but for some reason,
-        # using find_inputs_and_outputs_from_tree(funcdef) returns the name
-        # of the function as an input
-        in_, _ = io.find_inputs_and_outputs(funcdef.get_code(),
-                                            local_scope=local_scope)
+        # the function's own name is not an input (e.g., recursive calls)
+        _, in_, _ = io.find_function_scope_and_io(funcdef,
+                                                  local_scope=local_scope
+                                                  | {funcdef.name.value},
+                                                  index=index)
 
         if in_:
             needs_fix.append(
@@ -483,27 +687,82 @@ def _check_functions_do_not_use_global_variables(code):
         raise exceptions.InputError(message)
 
 
+def _write_zip(fileobj, files_):
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for path, content in files_:
+            # fixed timestamp so the same project generates the same archive
+            info = zipfile.ZipInfo(path, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, content)
+
+
+def _write_tar(fileobj, files_):
+    # streaming mode (w|) so fileobj doesn't have to be seekable
+    with tarfile.open(fileobj=fileobj, mode='w|') as tf:
+        for path, content in files_:
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            info.mode = 0o644
+            tf.addfile(info, BytesIO(content))
+
+
+def _export_proto_task(shared, proto_task, results):
+    """
+    Exports a proto task with the analysis results, it may run in another
+    process (see get_sources)
+    """
+    _, context = shared
+    return proto_task.export(*results, tree=context.get_tree(proto_task.name))
+
+
 def from_nb(nb,
             log=None,
             product_prefix=None,
             df_format=None,
             serializer=None,
-            py=False):
+            py=False,
+            engine='parso',
+            cache=None,
+            jobs=None,
+            output_dir=None):
     """Refactor a notebook by passing a notebook object
 
     Parameters
     ----------
+    log : str, default=None
+        Deprecated, configure logging with logging.basicConfig instead. If
+        passed, it's used as the logging level
+
     product_prefix : str
         A prefix to add to all products. If None, it's set to 'output'
 
+    engine : {'parso', 'ast'}, default='parso'
+        Engine to find the inputs and outputs of each section
+
+    cache : cache.AnalysisCache, default=None
+        Cache to reuse the analysis of sections that haven't changed since
+        the last run
+
+    jobs : int, default=None
+        Number of processes to analyze and export the sections. If None,
+        everything runs in the current process
+
+    output_dir : str or pathlib.Path, default=None
+        Directory to write the pipeline. If None, it uses the current
+        directory
+
     """
-    if log:
-        logging.basicConfig(level=log.upper())
+    _configure_logging(log)
 
     exporter = NotebookExporter(nb,
                                 df_format=df_format,
                                 serializer=serializer,
-                                py=py)
+                                py=py,
+                                engine=engine,
+                                cache=cache,
+                                jobs=jobs,
+                                output_dir=output_dir)
 
     exporter.export(product_prefix=product_prefix)
 
@@ -512,7 +771,15 @@ def from_nb(nb,
     # the same text)
 
 
-def from_path(path, log=None, product_prefix=None, df_format=None, py=False):
+def from_path(path,
+              log=None,
+              product_prefix=None,
+              df_format=None,
+              py=False,
+              engine='parso',
+              cache=None,
+              jobs=None,
+              output_dir=None):
     """Refactor a notebook by passing a path to it
 
     Parameters
@@ -522,18 +789,47 @@ def from_path(path, log=None, product_prefix=None, df_format=None, py=False):
         into a multi-stage pipeline. If True, it will first try to refactor
         the notebook, and if it fails, it will generate a pipeline with
         a single task
+
+    log : str, default=None
+        Deprecated, configure logging with logging.basicConfig instead
+
+    Notes
+    -----
+    .ipynb tasks keep the notebook's outputs, so they're read (and decoded)
+    if py is False, which takes longer than reading the code alone, with
+    py=True, outputs are skipped
     """
-    from_nb(jupytext.read(path),
-            log=log,
+    _configure_logging(log)
+
+    from_nb(ipynb.read(path, outputs=not py),
             product_prefix=product_prefix,
             df_format=df_format,
-            py=py)
+            py=py,
+            engine=engine,
+            cache=cache,
+            jobs=jobs,
+            output_dir=output_dir)
+
+
+def single_task_from_path(path,
+                          product_prefix,
+                          file_format,
+                          output_dir=None,
+                          backup=True):
+    """Refactor a notebook into a single task Ploomber pipeline
 
+    Parameters
+    ----------
+    output_dir : str or pathlib.Path, default=None
+        Directory to write the pipeline. If None, it uses the current
+        directory
 
-def single_task_from_path(path, product_prefix, file_format):
-    """Refactor a notebook into a single task Ploomber pipeline
+    backup : bool, default=True
+        Store a copy of the notebook next to it ({name}-backup.{ext}), since
+        the task may overwrite it
     """
     path = Path(path)
+    output_dir = Path(output_dir or '')
 
     click.echo('Creating a pipeline with a single task...')
 
@@ -550,11 +846,12 @@ def single_task_from_path(path, product_prefix, file_format):
     ext = path.suffix[1:] if file_format is None else file_format
     path_to_task = f'{name}.{ext}'
 
-    # create backup
-    shutil.copy(path, path_backup)
+    if backup:
+        shutil.copy(path, path_backup)
 
+    output_dir.mkdir(parents=True, exist_ok=True)
     jupytext.write(nb,
-                   path_to_task,
+                   output_dir / path_to_task,
                    fmt='py:percent' if ext == 'py' else 'ipynb')
 
     spec = {
@@ -567,40 +864,98 @@ def single_task_from_path(path, product_prefix, file_format):
     }
 
     pipeline = 'pipeline.yaml'
-    click.echo(f'Done. Copied code to {path_to_task!r} and added it to '
-               f'{pipeline!r}. Created backup of original notebook '
-               f'at {str(path_backup)!r}.')
+    msg = (f'Done. Copied code to {path_to_task!r} and added it to '
+           f'{pipeline!r}.')
+
+    if backup:
+        msg += (' Created backup of original notebook '
+                f'at {str(path_backup)!r}.')
 
-    Path('pipeline.yaml').write_text(yaml.safe_dump(spec, sort_keys=False))
+    click.echo(msg)
 
+    files.write_text(output_dir / pipeline,
+                     yaml.safe_dump(spec, sort_keys=False))
 
-def refactor(path, log, product_prefix, df_format, single_task, file_format,
-             serializer):
+
+def refactor(path,
+             log=None,
+             product_prefix=None,
+             df_format=None,
+             single_task=False,
+             file_format=None,
+             serializer=None,
+             engine='parso',
+             no_cache=False,
+             jobs=None,
+             output_dir=None):
+    _configure_logging(log)
 
     if single_task:
         single_task_from_path(path=path,
                               product_prefix=product_prefix,
-                              file_format=file_format)
+                              file_format=file_format,
+                              output_dir=output_dir)
     else:
         ext = Path(path).suffix[1:] if file_format is None else file_format
 
-        try:
-            from_nb(jupytext.read(path),
-                    log=log,
+        path_to_cache = Path(output_dir or '', '.soorgeon', 'cache')
+
+        with suggest_single_task(path):
+            cache = None if no_cache else AnalysisCache(path_to_cache)
+            from_nb(ipynb.read(path, outputs=ext != 'py'),
                     product_prefix=product_prefix,
                     df_format=df_format,
                     serializer=serializer,
-                    py=ext == 'py')
-        # InputError means the input is broken
-        except exceptions.InputWontRunError:
-            raise
-        # This implies an error on our end
-        except Exception as e:
-            logger.exception('Error calling from_nb')
-            cmd = f'soorgeon refactor {path} --single-task'
-            msg = ('An error occurred when refactoring '
-                   'notebook.\n\nTry refactoring '
-                   f'as a single task pipeline:\n\n$ {cmd}\n\n'
-                   'Need help? https://ploomber.io/community\n\n'
-                   'Error details:\n')
-            raise exceptions.InputError(msg) from e
+                    py=ext == 'py',
+                    engine=engine,
+                    cache=cache,
+                    jobs=jobs,
+                    output_dir=output_dir)
+
+        if cache is not None:
+            _echo_cache(path_to_cache)
+
+
+def _echo_cache(path_to_cache):
+    """Tells where the analysis is cached and how to skip it
+    """
+    click.echo('Cached the analysis of each section in '
+               f'{str(path_to_cache)!r} (skip it with --no-cache)')
+
+
+def _configure_logging(log):
+    """
+    Configures logging like earlier versions did when passing log to
+    from_nb, from_path or refactor
+    """
+    if log is not None:
+        warnings.warn(
+            'log is deprecated and will be removed in a future version, '
+            'configure logging with logging.basicConfig instead',
+            DeprecationWarning,
+            stacklevel=3)
+        logging.basicConfig(level=log.upper())
+
+
+@contextmanager
+def suggest_single_task(path):
+    """
+    Context manager that re-raises errors when refactoring the notebook in
+    path as an InputError that suggests refactoring it as a single task
+    pipeline (unless the notebook won't run, even as a single task)
+    """
+    try:
+        yield
+    # InputError means the input is broken
+    except exceptions.InputWontRunError:
+        raise
+    # This implies an error on our end
+    except Exception as e:
+        logger.exception('Error refactoring notebook')
+        cmd = f'soorgeon refactor {path} --single-task'
+        msg = ('An error occurred when refactoring '
+               'notebook.\n\nTry refactoring '
+               f'as a single task pipeline:\n\n$ {cmd}\n\n'
+               'Need help? https://ploomber.io/community\n\n'
+               'Error details:\n')
+        raise exceptions.InputError(msg) from e
@@ -0,0 +1,66 @@
+"""
+Writing generated files. Files are only written if their content changes
+(so tools that look at modification times, like Ploomber, don't consider
+them outdated) and through a temporary file, so an interrupted export never
+leaves partially written files. Note that this is per file: an interrupted
+export may leave some files with the new content and others with the old one
+"""
+import os
+import shutil
+from pathlib import Path
+
+
+def read_text(path):
+    """Returns the file's content, None if it doesn't exist
+    """
+    try:
+        return Path(path).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def write_text(path, content):
+    """Writes content to path if it's different from the current content.
+    The file either has the old or the new content (even if interrupted),
+    and keeps its permissions
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        File to write, parent directories are created if needed
+
+    content : str
+        Content to write
+
+    Returns
+    -------
+    bool
+        True if the file was written
+    """
+    path = Path(path)
+
+    try:
+        current = read_text(path)
+    # not a text file (or a different encoding), overwrite it
+    except UnicodeDecodeError:
+        current = None
+
+    if current == content:
+        return False
+
+    path.parent.mkdir(exist_ok=True, parents=True)
+    path_tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+    try:
+        path_tmp.write_text(content)
+
+        if path.exists():
+            shutil.copymode(path, path_tmp)
+
+        # replace is atomic: the file either has the old or the new content
+        os.replace(path_tmp, path)
+    finally:
+        if path_tmp.exists():
+            path_tmp.unlink()
+
+    return True
@@ -1,6 +1,9 @@
 """
 Module to determine inputs and outputs from code snippets.
 """
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import reduce
 
 import parso
@@ -17,38 +20,43 @@ class ImportsParser:
     ----------
     code_nb : str
         Notebook's source code
+
+    tree : parso.python.tree.Module, default=None
+        The parsed notebook's source code. If None, code_nb is parsed
     """
 
-    def __init__(self, code_nb):
-        self._tree = parso.parse(code_nb)
-        # maps defined names (from imports) to the source code
-        self._name2code = definitions.from_imports(self._tree)
+    def __init__(self, code_nb, tree=None):
+        tree = tree if tree is not None else parso.parse(code_nb)
+        # maps defined names (from imports) to the source code. We don't
+        # keep the tree so the parser is cheap to send to other processes
+        self._name2code = definitions.from_imports(tree)
+        # position of each name, so we can return the import statements in
+        # the same order they appear in the notebook
+        self._name2idx = {
+            name: idx
+            for idx, name in enumerate(self._name2code)
+        }
 
     def get_imports_cell_for_task(self, code_task):
         """
         Get the source code with the appropriate import statements for a task
         with the given code to work.
         """
-        # NOTE: this was taken from jupyblog's source
-        leaf = parso.parse(code_task).get_first_leaf()
-
-        names = []
-
-        while leaf:
-            if leaf.type == 'name':
-                names.append(leaf.value)
-
-            leaf = leaf.get_next_leaf()
+        return self.get_imports_cell_for_names(
+            find_names(parso.parse(code_task)))
 
+    def get_imports_cell_for_names(self, names):
+        """
+        Like get_imports_cell_for_task, but takes the set of names that the
+        task uses. Use find_names to get them from a parso tree
+        """
         imports = self._name2code
 
-        # iterate over names defined by the imports and get the import
-        # statement if content_subset uses it
-        imports_to_use = []
-
-        for name, import_code in imports.items():
-            if name in names:
-                imports_to_use.append(import_code)
+        # look up the names that are defined by the imports and get the import
+        # statement for each one
+        names_imported = sorted((name for name in names if name in imports),
+                                key=self._name2idx.get)
+        imports_to_use = [imports[name] for name in names_imported]
 
         # remove duplicated elements but keep order, then join
         if imports:
@@ -92,11 +100,16 @@ def get_local_scope(leaf):
     return set()
 
 
-def find_for_loop_def_and_io(for_stmt, local_scope=None):
+def find_for_loop_def_and_io(for_stmt, local_scope=None, index=None):
     """
     Return a set with the definitions and inputs a for loop. e.g.,
     for x, (y, z) in something() returns {'x', 'y', 'z'}, set()
     for i in range(input_) returns {'i'}, {'input_'}
+
+    Parameters
+    ----------
+    index : detect.LeafIndex, default=None
+        Index for the tree that contains for_stmt. If None, it's created
     """
     # TODO: add a only_input flag for cases where we dont care about
     # parsin outputs
@@ -115,7 +128,8 @@ def find_for_loop_def_and_io(for_stmt, local_scope=None):
     body_in, body_out = find_inputs_and_outputs_from_leaf(
         body_node.get_first_leaf(),
         local_scope=defined,
-        leaf_end=body_node.get_last_leaf())
+        leaf_end=body_node.get_last_leaf(),
+        index=index)
 
     # Strictly speaking variables defined after the for keyword are also
     # outputs, since they're available after the loop ends (with the loop's
@@ -159,7 +173,7 @@ def find_f_string_inputs(fstring_start, local_scope=None):
     return names - local_scope
 
 
-def find_context_manager_def_and_io(with_stmt, local_scope=None):
+def find_context_manager_def_and_io(with_stmt, local_scope=None, index=None):
     if with_stmt.type != 'with_stmt':
         raise ValueError(f'Expected a node with type "with_stmt", '
                          f'got: {with_stmt} with type {with_stmt.type}')
@@ -184,12 +198,13 @@ def find_context_manager_def_and_io(with_stmt, local_scope=None):
     body_in, body_out = find_inputs_and_outputs_from_leaf(
         body_node.get_first_leaf(),
         local_scope=defined,
-        leaf_end=body_node.get_last_leaf())
+        leaf_end=body_node.get_last_leaf(),
+        index=index)
 
     return defined, (exp | body_in) - local_scope, body_out
 
 
-def find_function_scope_and_io(funcdef, local_scope=None):
+def find_function_scope_and_io(funcdef, local_scope=None, index=None):
     """Find function scope, input, and output
 
     Returns
@@ -230,7 +245,8 @@ def find_function_scope_and_io(funcdef, local_scope=None):
     body_in, body_out = find_inputs_and_outputs_from_leaf(
         body_node.get_first_leaf(),
         local_scope=parameters,
-        leaf_end=body_node.get_last_leaf())
+        leaf_end=body_node.get_last_leaf(),
+        index=index)
 
     if annotation_return:
         body_in = body_in | find_inputs(annotation_return,
@@ -354,6 +370,64 @@ def find_inputs_for_each(nodes,
     return inputs
 
 
+class FindInputsMemo:
+    """
+    Stores find_inputs results, use memoize_find_inputs to enable it. The
+    analysis calls find_inputs on the same nodes more than once (e.g., a
+    comprehension on the right side of an assignment)
+
+    Attributes
+    ----------
+    hits : int
+        Number of calls that returned a stored result
+
+    misses : int
+        Number of calls that computed the result
+    """
+
+    def __init__(self):
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node, flags):
+        # we keep a reference to the node, so its id is not reused
+        stored = self._results.get((id(node), flags))
+
+        if stored is not None and stored[0] is node:
+            self.hits += 1
+            return stored[1]
+
+        self.misses += 1
+        return None
+
+    def set(self, node, flags, result):
+        self._results[(id(node), flags)] = (node, result)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}(hits={self.hits}, '
+                f'misses={self.misses})')
+
+
+_find_inputs_memo = ContextVar('find_inputs_memo', default=None)
+
+
+@contextmanager
+def memoize_find_inputs():
+    """
+    Context manager that memoizes find_inputs calls, yields a FindInputsMemo
+    object. Results are keyed by node identity, so the memo must not outlive
+    the trees being analyzed
+    """
+    memo = FindInputsMemo()
+    token = _find_inputs_memo.set(memo)
+
+    try:
+        yield memo
+    finally:
+        _find_inputs_memo.reset(token)
+
+
 def find_inputs(node,
                 parse_list_comprehension=True,
                 only_getitem_and_attribute_access=False,
@@ -366,8 +440,33 @@ def find_inputs(node,
     ----------
     parse_list_comprehension : bool, default=True
         Whether to parse any list comprehension if node is inside one
+
+    Returns
+    -------
+    frozenset
+        The inputs
     """
+    memo = _find_inputs_memo.get()
+
+    # leaves are cheap to analyze and rarely analyzed twice, so we don't
+    # store them
+    if memo is None or not hasattr(node, 'children'):
+        return _find_inputs(node, parse_list_comprehension,
+                            only_getitem_and_attribute_access, allow_kwargs)
+
+    flags = (parse_list_comprehension, only_getitem_and_attribute_access,
+             allow_kwargs)
+    result = memo.get(node, flags)
+
+    if result is None:
+        result = _find_inputs(node, *flags)
+        memo.set(node, flags, result)
+
+    return result
 
+
+def _find_inputs(node, parse_list_comprehension,
+                 only_getitem_and_attribute_access, allow_kwargs):
     names = []
 
     leaf = node.get_first_leaf()
@@ -435,7 +534,7 @@ def find_inputs(node,
 
             leaf = leaf.get_next_leaf()
 
-    return set(names)
+    return frozenset(names)
 
 
 def find_inputs_and_outputs(code_str, local_scope=None):
@@ -453,7 +552,16 @@ def find_inputs_and_outputs(code_str, local_scope=None):
     return find_inputs_and_outputs_from_tree(tree, local_scope=local_scope)
 
 
-def find_inputs_and_outputs_from_tree(tree, local_scope=None):
+def find_inputs_and_outputs_from_tree(tree, local_scope=None, index=None):
+    """
+    Like find_inputs_and_outputs, but takes a parso node. If it's not a
+    module, only the code in the node is analyzed
+
+    Parameters
+    ----------
+    index : detect.LeafIndex, default=None
+        Index for the tree that contains the node. If None, it's created
+    """
     leaf = tree.get_first_leaf()
     # NOTE: we use this in find_inputs_and_outputs and ImportParser, maybe
     # move the functionality to a class so we only compute it once
@@ -462,19 +570,34 @@ def find_inputs_and_outputs_from_tree(tree, local_scope=None):
 
     local_scope = local_scope or set()
 
-    return find_inputs_and_outputs_from_leaf(leaf,
-                                             local_scope=local_scope
-                                             | defined_names)
+    # stop at the end of the node, otherwise we'd continue with the leaves
+    # that come after it when the node is not a module
+    return find_inputs_and_outputs_from_leaf(
+        leaf,
+        local_scope=local_scope | defined_names,
+        leaf_end=tree.get_last_leaf(),
+        index=index if index is not None else detect.LeafIndex(tree))
 
 
 # FIXME: try nested functions, and also functions inside for loops and loops
 # inside functions
-def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
+def find_inputs_and_outputs_from_leaf(leaf,
+                                      local_scope=None,
+                                      leaf_end=None,
+                                      index=None):
     """
     Find inputs and outputs. Starts parsing at the given leaf
+
+    Parameters
+    ----------
+    index : detect.LeafIndex, default=None
+        Index for the tree that contains leaf. If None, it's created
     """
     local_scope = local_scope or set()
 
+    if index is None:
+        index = detect.LeafIndex(leaf.get_root_node())
+
     inputs, outputs = [], set()
 
     local_variables = set()
@@ -490,7 +613,7 @@ def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
         return candidates
 
     while leaf:
-        _inside_funcdef = detect.is_inside_funcdef(leaf)
+        _inside_funcdef = index.is_inside_funcdef(leaf)
 
         if not _inside_funcdef:
             local_variables = set()
@@ -508,22 +631,22 @@ def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
             inputs.extend(clean_up_candidates(candidates_in, local_variables))
             # lambda's last leaf is the next one after the last in the
             # lambda node
-            leaf = leaf.parent.get_last_leaf().get_next_leaf()
-        elif detect.is_for_loop(leaf):
+            leaf = index.next_leaf(leaf.parent.get_last_leaf())
+        elif index.is_for_loop(leaf):
             # FIXME: i think is hould also pass the current foudn inputs
             # to local scope - write a test to break this
             (_, candidates_in, candidates_out) = find_for_loop_def_and_io(
-                leaf.parent, local_scope=local_scope)
+                leaf.parent, local_scope=local_scope, index=index)
             inputs.extend(clean_up_candidates(candidates_in, local_variables))
             outputs = outputs | candidates_out
             # jump to the end of the foor loop
             leaf = leaf.parent.get_last_leaf()
-        elif detect.is_context_manager(leaf):
+        elif index.is_context_manager(leaf):
             # FIXME: i think is hould also pass the current foudn inputs
             # to local scope - write a test to break this
             (_, candidates_in,
              candidates_out) = find_context_manager_def_and_io(
-                 leaf.parent, local_scope=local_scope)
+                 leaf.parent, local_scope=local_scope, index=index)
             inputs.extend(clean_up_candidates(candidates_in, local_variables))
             outputs = outputs | candidates_out
             # jump to the end of the foor loop
@@ -535,7 +658,7 @@ def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
             # FIXME: i think is hould also pass the current foudn inputs
             # to local scope - write a test to break this
             (_, candidates_in, candidates_out) = find_function_scope_and_io(
-                leaf.parent, local_scope=local_scope)
+                leaf.parent, local_scope=local_scope, index=index)
             inputs.extend(clean_up_candidates(candidates_in, local_variables))
             outputs = outputs | candidates_out
             # jump to the end of the function definition loop
@@ -644,13 +767,13 @@ def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
         # go to the first conditional, and the next leaf is the function call
         # so then we go into this conditional - we're skipping the left part
         # but not the right part of = yet
-        elif (leaf.type == 'name' and (detect.is_inside_function_call(leaf)
+        elif (leaf.type == 'name' and (index.is_inside_function_call(leaf)
                                        or detect.is_accessing_variable(leaf)
-                                       or detect.is_inside_funcdef(leaf))
+                                       or index.is_inside_funcdef(leaf))
               # skip if this is to the left of an '=', because we'll check it
               # when we get to that token since it'll go to the first
               # conditional
-              and not detect.is_left_side_of_assignment(leaf) and
+              and not index.is_left_side_of_assignment(leaf) and
               not detect.is_inside_list_comprehension(leaf) and
               leaf.value not in outputs and leaf.value not in local_scope and
               leaf.value not in _BUILTIN and leaf.value not in local_scope and
@@ -660,7 +783,7 @@ def find_inputs_and_outputs_from_leaf(leaf, local_scope=None, leaf_end=None):
         if leaf_end and leaf == leaf_end:
             break
 
-        leaf = leaf.get_next_leaf()
+        leaf = index.next_leaf(leaf)
 
     return set(inputs), outputs
 
@@ -687,10 +810,6 @@ def _get_modified_objects(leaf, outputs, names_from_imports):
     return set(names)
 
 
-def _map_outputs(name, outputs):
-    return [(out, name) for out in outputs]
-
-
 def _get_upstream(name, inputs, providers):
     return [providers.get(input_, name) for input_ in inputs]
 
@@ -710,21 +829,31 @@ class ProviderMapping:
 
     def __init__(self, io):
         self._io = io
+        # task name -> position in the notebook
+        self._task2idx = {name: idx for idx, name in enumerate(io)}
+        self._names = list(io)
+        # variable -> sorted positions of the tasks that declare it
+        self._variable2idx = {}
+
+        for idx, (_, outputs) in enumerate(io.values()):
+            for variable in outputs:
+                self._variable2idx.setdefault(variable, []).append(idx)
 
-    def _providers_for_task(self, name):
+    def _provider_for_task(self, variable, name):
         """
-        Returns a subset of io, only considering tasks that appear earlier
-        in the notebook
+        Returns the last task that declares variable, only considering tasks
+        that appear earlier in the notebook (None if there isn't any)
         """
-        out = {}
+        indexes = self._variable2idx.get(variable)
 
-        for key, value in self._io.items():
-            if key == name:
-                break
+        if not indexes:
+            return None
 
-            out[key] = value
+        # tasks that are not in the mapping can see all the tasks
+        end = self._task2idx.get(name, len(self._names))
+        position = bisect_left(indexes, end)
 
-        return _find_providers(out)
+        return self._names[indexes[position - 1]] if position else None
 
     def get(self, variable, task_name):
         """
@@ -734,9 +863,7 @@ class ProviderMapping:
         one closest to the task_name, by considering all previous sections
         in the notebook
         """
-        providers = self._providers_for_task(task_name)
-
-        provider = providers.get(variable)
+        provider = self._provider_for_task(variable, task_name)
 
         if not provider:
             raise KeyError(f'Error parsing inputs for section {task_name!r} '
@@ -752,69 +879,116 @@ class DefinitionsMapping:
     definitions) available for a given
     snippet. We use this to determine which names should not be considered
     inputs in tasks, since they are module names
+
+    Parameters
+    ----------
+    snippets : dict
+        {snippet_name: snippet, ...}
+
+    trees : dict, default=None
+        {snippet_name: parso tree, ...} with the already parsed snippets. If
+        None, snippets are parsed
     """
 
-    def __init__(self, snippets):
+    def __init__(self, snippets, trees=None):
+        trees = trees or _parse_snippets(snippets)
+
         self._names = {
-            name: set(definitions.find_defined_names(parso.parse(code)))
-            for name, code in snippets.items()
+            name: set(definitions.find_defined_names(trees[name]))
+            for name in snippets
         }
 
-    def get(self, name):
-        out = set()
+        # {name: names available to the snippet, ...}, computed in a single
+        # pass. Snippets that do not define new names share the same
+        # frozenset with the previous one
+        self._scopes = {}
+        scope = frozenset()
 
-        for key, value in self._names.items():
-            if key == name:
-                break
+        for name, defined in self._names.items():
+            self._scopes[name] = scope
+
+            if not scope.issuperset(defined):
+                scope = scope.union(defined)
 
-            out = out | value
+        # snippets that are not in the mapping can see all the names
+        self._scope_all = scope
 
-        return out
+    def get(self, name):
+        """Returns a frozenset with the names defined in snippets that appear
+        before the one with the given name
+        """
+        return self._scopes.get(name, self._scope_all)
+
+    def all_scopes(self):
+        """Returns a {name: frozenset, ...} mapping with the available names
+        for every snippet
+        """
+        return dict(self._scopes)
 
 
-def find_upstream(snippets):
+def find_upstream(snippets, trees=None):
     """
     Parameters
     ----------
     snippets : dict
         {snippet_name: snippet, ...}
+
+    trees : dict, default=None
+        {snippet_name: parso tree, ...} with the already parsed snippets. If
+        None, snippets are parsed
+    """
+    io = find_io(snippets, trees=trees)
+    return find_upstream_from_io(io)
+
+
+def find_upstream_from_io(io, providers=None):
     """
-    io = find_io(snippets)
+    Like find_upstream, but takes an io mapping (as generated by find_io)
 
-    providers = ProviderMapping(io)
+    Parameters
+    ----------
+    providers : ProviderMapping, default=None
+        Provider mapping for io. If None, it's created
+    """
+    providers = providers or ProviderMapping(io)
 
     upstream = {
-        snippet_name: list(set(_get_upstream(snippet_name, v[0], providers)))
+        snippet_name: sorted(set(_get_upstream(snippet_name, v[0],
+                                               providers)))
         for snippet_name, v in io.items()
     }
 
     return upstream
 
 
-def _find_providers(io):
-    # variable -> snippet that defines variable mapping
-    providers = [
-        _map_outputs(snippet_name, v[1]) for snippet_name, v in io.items()
-    ]
-
-    providers = dict([i for sub in providers for i in sub])
-
-    return providers
+def _parse_snippets(snippets):
+    return {name: parso.parse(code) for name, code in snippets.items()}
 
 
-def find_io(snippets):
+def find_io(snippets, trees=None):
     """
     Generates a {snippet_name: (inputs, outputs), ...} mapping where inputs
     are the variables that snippet_name requires to work and outputs the ones
     that it creates
+
+    Parameters
+    ----------
+    snippets : dict
+        {snippet_name: snippet, ...}
+
+    trees : dict, default=None
+        {snippet_name: parso tree, ...} with the already parsed snippets. If
+        None, snippets are parsed
     """
-    im = DefinitionsMapping(snippets)
+    trees = trees or _parse_snippets(snippets)
+
+    scopes = DefinitionsMapping(snippets, trees=trees).all_scopes()
 
-    # FIXME: find_upstream already calls this, we should only compute it once
     io = {
-        snippet_name: find_inputs_and_outputs(snippet,
-                                              local_scope=im.get(snippet_name))
-        for snippet_name, snippet in snippets.items()
+        snippet_name:
+        find_inputs_and_outputs_from_tree(trees[snippet_name],
+                                          local_scope=scopes[snippet_name])
+        for snippet_name in snippets
     }
 
     return io
@@ -848,10 +1022,38 @@ def _leaf_iterator(tree):
         leaf = leaf.get_next_leaf()
 
 
+def find_names(tree, skip_imports=False):
+    """
+    Returns the set of names in a parso tree
+
+    Parameters
+    ----------
+    skip_imports : bool, default=False
+        If True, ignore names that appear in import statements
+    """
+    names = set()
+    to_visit = [tree]
+
+    while to_visit:
+        node = to_visit.pop()
+
+        if node.type == 'name':
+            names.add(node.value)
+        elif not (skip_imports
+                  and node.type in {'import_name', 'import_from'}):
+            to_visit.extend(getattr(node, 'children', []))
+
+    return names
+
+
 def remove_imports(code_str):
     """
     Remove all import statements from a code string
     """
+    # parsing is expensive, skip it if there cannot be any import statement
+    if 'import' not in code_str:
+        return code_str
+
     tree = parso.parse(code_str)
 
     to_remove = []
@@ -0,0 +1,283 @@
+"""
+Fast .ipynb reader. Notebooks may have megabytes of outputs (e.g., images or
+data frames as HTML) that the analysis never uses, this reader scans the file
+and only decodes what the refactoring needs (cell types, sources, metadata),
+so the time and memory it takes depend on the size of the code, not the
+outputs. Outputs are only decoded if requested (e.g., to keep them in .ipynb
+tasks), in that case, the time and memory it takes depend on the size of the
+outputs, like with nbformat.read
+"""
+import re
+import json
+import mmap
+from pathlib import Path
+
+import jupytext
+import nbformat
+from nbformat.validator import normalize
+from nbformat.v4.rwbase import rejoin_lines, strip_transient
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+# everything up to the next string or bracket
+_UNTIL_STRUCTURAL = re.compile(rb'[^"\[\]{}]*')
+_BACKSLASH = ord('\\')
+# numbers, true, false and null
+_SCALAR = re.compile(rb'[^,\]}\s]+')
+
+_decoder = json.JSONDecoder()
+
+# cell keys we keep (attachments are referenced from markdown cells)
+_CELL_KEYS = {'cell_type', 'id', 'metadata', 'source', 'attachments'}
+_CELL_KEYS_OUTPUTS = _CELL_KEYS | {'outputs', 'execution_count'}
+
+
+def read(path, outputs=False):
+    """Reads a notebook, skipping its outputs
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to the notebook, formats other than .ipynb are read with
+        jupytext
+
+    outputs : bool, default=False
+        Decode the outputs and execution counts of code cells. If False,
+        they're skipped. Note that decoding the outputs takes as long as
+        with nbformat.read, since they're decoded in full (they're not
+        streamed to the generated tasks)
+
+    Returns
+    -------
+    nbformat.NotebookNode
+        The notebook. If outputs is False, code cells have no outputs and no
+        execution count
+
+    Notes
+    -----
+    It falls back to jupytext.read if the notebook is not in nbformat 4, or
+    the file is not valid JSON (to raise the same errors). Missing and
+    duplicated cell ids are repaired like nbformat does
+    """
+    if Path(path).suffix != '.ipynb':
+        return jupytext.read(path)
+
+    try:
+        with open(path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            nb = _read_notebook(_Scanner(buf), outputs)
+    # ValueError also includes empty files (they can't be memory mapped)
+    except ValueError:
+        return jupytext.read(path)
+
+    if nb.get('nbformat') != 4:
+        return jupytext.read(path)
+
+    if _needs_id_repair(nb):
+        _, nb = normalize(nb)
+
+    # remove the same values nbformat removes when reading (e.g., signature)
+    return strip_transient(rejoin_lines(nbformat.from_dict(nb)))
+
+
+def _needs_id_repair(nb):
+    """
+    Returns True if cells must have ids (nbformat 4.5 or newer) and some are
+    missing or duplicated
+    """
+    if nb.get('nbformat_minor', 0) < 5:
+        return False
+
+    ids = [cell.get('id') for cell in nb['cells']]
+    return None in ids or len(set(ids)) != len(ids)
+
+
+def _read_notebook(scanner, outputs):
+    nb = {}
+    keys = _CELL_KEYS_OUTPUTS if outputs else _CELL_KEYS
+
+    for key in scanner.object():
+        if key == 'cells':
+            nb['cells'] = [_read_cell(scanner, keys) for _ in scanner.array()]
+        else:
+            nb[key] = scanner.value()
+
+    if 'cells' not in nb:
+        raise ValueError('Notebook does not have cells')
+
+    return nb
+
+
+def _read_cell(scanner, keys):
+    cell = {}
+
+    for key in scanner.object():
+        if key in keys:
+            cell[key] = scanner.value()
+        else:
+            scanner.skip()
+
+    cell.setdefault('metadata', {})
+
+    if cell.get('cell_type') == 'code':
+        cell.setdefault('outputs', [])
+        cell.setdefault('execution_count', None)
+
+    return cell
+
+
+class _Scanner:
+    """Scans a JSON document, decoding only the values that are requested
+
+    Parameters
+    ----------
+    buf : bytes-like object
+        The document (e.g., a memory mapped file)
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        self._pos = 0
+
+    def object(self):
+        """
+        Iterates over the keys of the object starting at the current
+        position, the caller must read (or skip) each value
+        """
+        yield from self._container(b'{', b'}', key=True)
+
+    def array(self):
+        """
+        Iterates over the elements of the array starting at the current
+        position, the caller must read (or skip) each element
+        """
+        yield from self._container(b'[', b']', key=False)
+
+    def value(self):
+        """Decodes the value starting at the current position
+        """
+        start = self._pos
+        self.skip()
+        return _decoder.decode(self._buf[start:self._pos].decode())
+
+    def skip(self):
+        """Moves to the end of the value starting at the current position
+        """
+        char = self._peek()
+
+        if char == b'"':
+            self._skip_string()
+        elif char in (b'{', b'['):
+            self._skip_container()
+        else:
+            self._pos = self._match(_SCALAR).end()
+
+        self._skip_whitespace()
+
+    def _container(self, open_, close, key):
+        self._consume(open_)
+
+        if self._peek() == close:
+            self._consume(close)
+            return
+
+        while True:
+            if key:
+                yield self._key()
+            else:
+                yield None
+
+            if self._peek() == b',':
+                self._consume(b',')
+            else:
+                self._consume(close)
+                return
+
+    def _key(self):
+        start = self._pos
+        self._skip_string()
+        key = self._buf[start:self._pos]
+        self._consume(b':')
+
+        # keys rarely have escaped characters, decoding them is faster
+        return (key[1:-1].decode()
+                if b'\\' not in key else _decoder.decode(key.decode()))
+
+    def _skip_container(self):
+        # this is where we spend most of the time (skipping outputs), so we
+        # use local variables instead of calling the other methods
+        buf, pos, depth = self._buf, self._pos, 0
+
+        while True:
+            pos = _UNTIL_STRUCTURAL.match(buf, pos).end()
+            char = buf[pos:pos + 1]
+
+            if char == b'"':
+                pos = _string_end(buf, pos)
+                continue
+            elif char in (b'{', b'['):
+                depth += 1
+            elif char in (b'}', b']'):
+                depth -= 1
+            else:
+                raise ValueError('Unexpected end of document')
+
+            pos += 1
+
+            if not depth:
+                self._pos = pos
+                return
+
+    def _skip_string(self):
+        if self._peek() != b'"':
+            raise ValueError(f'Expected a string at position {self._pos}')
+
+        self._pos = _string_end(self._buf, self._pos)
+
+    def _match(self, regex):
+        match = regex.match(self._buf, self._pos)
+
+        if match is None:
+            raise ValueError(f'Invalid JSON at position {self._pos}')
+
+        return match
+
+    def _peek(self):
+        return self._buf[self._pos:self._pos + 1]
+
+    def _consume(self, char):
+        self._skip_whitespace()
+
+        if self._peek() != char:
+            raise ValueError(f'Expected {char.decode()!r} at position '
+                             f'{self._pos}')
+
+        self._pos += 1
+        self._skip_whitespace()
+
+    def _skip_whitespace(self):
+        self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+
+
+def _string_end(buf, start):
+    """
+    Returns the position after the closing quote of the string starting at
+    start. Strings are the largest values (e.g., base64 images), find is much
+    faster than a regular expression to look for the closing quote
+    """
+    end = start
+
+    while True:
+        end = buf.find(b'"', end + 1)
+
+        if end == -1:
+            raise ValueError('Unterminated string')
+
+        # the quote is escaped if it's preceded by an odd number of
+        # backslashes
+        backslashes = end - 1
+
+        while buf[backslashes] == _BACKSLASH:
+            backslashes -= 1
+
+        if (end - 1 - backslashes) % 2 == 0:
+            return end + 1
@@ -1,212 +1,186 @@
-import copy
+"""
+IPython magics (e.g., %timeit, %%bash, ! ls) aren't valid Python, so we mask
+them before analyzing the code and restore them when generating the tasks.
+
+Each cell is tokenized once: magic lines are replaced by empty lines (so line
+numbers don't change) and the original lines are kept in a side table
+(spans), a tuple of (line number, line) pairs, which we use to restore them
+"""
 import re
+from difflib import SequenceMatcher
 
-_IS_IPYTHON_CELL_MAGIC = r'^\s*%{2}[a-zA-Z]+'
-_IS_IPYTHON_LINE_MAGIC = r'^\s*%{1}[a-zA-Z]+'
-_IS_INLINE_SHELL = r'^\s*!{1}.+'
+from soorgeon.cells import Notebook
 
-_IS_COMMENTED_LINE_MAGIC = r'^(.+) # \[magic\] (%.*)'
-
-_PREFIX = '# [magic] '
-_PREFIX_LEN = len(_PREFIX)
+# a cell magic (captures the name), a line magic or an inline shell command
+_MAGIC = re.compile(r'\s*(?:(%%[a-zA-Z]+)|%[a-zA-Z]|!.)')
 
 # these are magics that can modify the dependency structure beacuse they
 # may declare new variables or use existing ones as inputs
 HAS_INLINE_PYTHON = {'%%capture', '%%timeit', '%%time', '%time', '%timeit'}
 
 
-def comment_magics(nb):
-    """
-    Iterates over cells, commenting the ones with magics
-    """
-    nb = copy.deepcopy(nb)
-
-    for cell in nb.cells:
-        if cell.cell_type == 'code':
-            cell['source'] = _comment_if_ipython_magic(cell['source'])
-
-    return nb
+def mask_magics(nb):
+    """Masks the magics in the notebook's code cells
 
+    Returns
+    -------
+    cells.Notebook
+        A view of nb with the magics masked (see tokenize), nb is not
+        modified
 
-def uncomment_magics(nb):
-    """
-    Iterates over cells, uncommenting the ones with magics
+    tuple
+        The spans of each cell (in the same order as the cells), pass them
+        to restore or map_code to get the original source
     """
-    nb = copy.deepcopy(nb)
+    nb = Notebook.from_nb(nb)
+    cells, spans = [], []
 
     for cell in nb.cells:
         if cell.cell_type == 'code':
-            cell['source'] = _uncomment_magics_cell(cell['source'])
-
-    return nb
-
-
-def _delete_magic(line):
-    """Returns an empty line if it starts with the # [magic] prefix
-    """
-    return '' if line.startswith(_PREFIX) else line
-
-
-def _delete_magics_cell(source):
-    """Reverts the comments applied to magics (cell level)
-    """
-    if not source:
-        return source
-
-    lines = source.splitlines()
-    lines_new = [_delete_magic(line) for line in lines]
-    return '\n'.join(lines_new).strip()
-
-
-def _uncomment_magic(line):
-    """Reverts the comments applied to magics (line level)
-    """
-    if line.startswith(_PREFIX):
-        return line[_PREFIX_LEN:]
-
-    parts = _is_commented_line_magic(line)
-
-    if parts:
-        code, magic = parts
-        return f'{magic} {code}'
-    else:
-        return line
-
-
-def _uncomment_magics_cell(source):
-    """Reverts the comments applied to magics (cell level)
-    """
-    lines = source.splitlines()
-    lines_new = [_uncomment_magic(line) for line in lines]
-    return '\n'.join(lines_new)
+            code, spans_cell = tokenize(cell.source)
+            cells.append(cell.replace(code))
+            spans.append(spans_cell)
+        else:
+            cells.append(cell)
+            spans.append(())
 
+    return Notebook(cells, metadata=nb.metadata), tuple(spans)
 
-def _comment(line):
-    """Adds the # [magic] prefix (line level)
-    """
-    return f'# [magic] {line}'
 
+def tokenize(source):
+    """Finds and masks the magics in a cell
 
-def _comment_ipython_line_magic(line, magic):
-    """Adds suffix to line magics: # [magic] %{name}
+    Returns
+    -------
+    str
+        The source with magic lines replaced by empty lines (only their line
+        break is kept)
 
-    Converts:
-    %timeit x = 1
+    tuple
+        The magics' spans: a tuple of (line number, line) pairs
 
-    Into:
-    x = 1 # [magic] %timeit
+    Notes
+    -----
+    Line magics and inline shell commands are masked. Cell magics are masked
+    as well, if they don't take Python code (e.g., %%bash), the rest of the
+    cell is also masked. Magics can take inputs but their outputs ARE NOT
+    saved (e.g., running %timeit x = y + 1 requires y but x is not declared),
+    however, this is magic dependent (%time x = y + 1 declares x), so we
+    don't analyze the Python code in line magics
     """
-    return line.replace(magic, '').strip() + f' # [magic] {magic.strip()}'
-
+    # most cells don't have magics, skip them without splitting lines
+    if '%' not in source and '!' not in source:
+        return source, ()
 
-def _comment_if_ipython_magic(source):
-    """Comments lines into comments if they're IPython magics (cell level)
-    """
     # TODO: support for nested cell magics. e.g.,
     # %%timeit
     # %%timeit
     # something()
-    lines_out = []
-    comment_rest = False
+    lines = source.splitlines(keepends=True)
+    spans = []
+    mask_rest = False
 
-    # TODO: inline magics should add a comment at the end of the line, because
-    # the python code may change the dependency structure. e.g.,
-    # %timeit z = x + y -> z = x + y # [magic] %timeit
-    # note that this only applies to inline magics that take Python code as arg
+    for number, line in enumerate(lines):
+        if not mask_rest:
+            match = _MAGIC.match(line)
 
-    # NOTE: magics can take inputs but their outputs ARE NOT saved. e.g.,
-    # %timeit x = y + 1
-    # running such magic requires having y but after running it, x IS NOT
-    # declared. But this is magic dependent %time x = y + 1 will add x to the
-    # scope
+            if match is None:
+                continue
 
-    for line in source.splitlines():
-        cell_magic = _is_ipython_cell_magic(line)
+            cell_magic = match.group(1)
 
-        if comment_rest:
-            lines_out.append(_comment(line))
-        else:
-            line_magic = _is_ipython_line_magic(line)
+            # if cell magic whose content *is not* Python, mask all the
+            # remaining lines in the cell
+            if cell_magic and cell_magic not in HAS_INLINE_PYTHON:
+                mask_rest = True
 
-            # if line magic, comment line
-            if line_magic:
-                # NOTE: switched _comment_ipython_line_magic(line, line_magic)
-                # for _comment
-                lines_out.append(_comment(line))
+        spans.append((number, line))
+        lines[number] = _line_break(line)
 
-            # if inline shell, comment line
-            elif _is_inline_shell(line):
-                lines_out.append(_comment(line))
+    if not spans:
+        return source, ()
 
-            # if cell magic, comment line
-            elif cell_magic in HAS_INLINE_PYTHON:
-                lines_out.append(_comment(line))
+    return ''.join(lines), tuple(spans)
 
-            # if cell magic whose content *is not* Pytho, comment line and
-            # all the remaining lines in the cell
-            elif cell_magic:
-                lines_out.append(_comment(line))
-                comment_rest = True
 
-            # otherwise, don't do anything
-            else:
-                lines_out.append(line)
-
-    return '\n'.join(lines_out)
+def restore(code, spans):
+    """Reverts tokenize, returns the original source
+    """
+    if not spans:
+        return code
 
+    lines = _split(code, spans)
 
-# NOTE: the code in the following lines is based on Ploomber's source code.
-# We did that instead of importing it since Ploomber has many dependencies. At
-# some point, we may integrate this into Ploomber and remove this.
+    for number, line in spans:
+        lines[number] = line
 
+    return ''.join(lines)
 
-def _is_commented_line_magic(source):
-    """Determines if the source is an IPython cell magic. e.g.,
 
-    %cd some-directory
+def map_code(fn, code, spans):
+    """
+    Applies fn to the Python code between magics (e.g., to remove import
+    statements), then restores the magics in their position. Empty lines
+    that fn leaves in the code between magics (e.g., where an import was)
+    are removed, and so are the ones left after the last magic if fn removes
+    all the code that follows it
     """
-    m = re.match(_IS_COMMENTED_LINE_MAGIC, source)
+    if not spans:
+        return fn(code)
 
-    if not m:
-        return False
+    lines = _split(code, spans)
+    magic_lines = dict(spans)
+    out, segment = [], []
 
-    return m.group(1), m.group(2)
+    for number, line in enumerate(lines):
+        if number in magic_lines:
+            if segment:
+                out.append(_map_segment(fn, segment))
+                segment = []
 
+            out.append(magic_lines[number])
+        else:
+            segment.append(line)
 
-def _is_ipython_cell_magic(source):
-    """Determines if the source is an IPython cell magic. e.g.,
+    if segment:
+        mapped = _map_segment(fn, segment)
 
-    %cd some-directory
-    """
-    m = re.match(_IS_IPYTHON_CELL_MAGIC, source.lstrip())
-
-    if not m:
-        return False
+        if mapped.strip() or not ''.join(segment).strip():
+            out.append(mapped)
+        else:
+            # end with the last magic, and with a line break only if the
+            # original code had one
+            magic = out[-1]
+            out[-1] = (magic[:len(magic) - len(_line_break(magic))] +
+                       _line_break(segment[-1]))
 
-    return m.group()
+    return ''.join(out)
 
 
-def _is_ipython_line_magic(line):
+def _map_segment(fn, lines):
     """
-    Determines if the source line is an IPython magic. e.g.,
-
-    %%bash
-    for i in 1 2 3; do
-      echo $i
-    done
+    Applies fn to the code between magics, only keeps the empty lines that
+    were in the original code
     """
-    m = re.match(_IS_IPYTHON_LINE_MAGIC, line)
+    new = fn(''.join(lines)).splitlines(keepends=True)
+    matcher = SequenceMatcher(None, lines, new, autojunk=False)
+    out = []
 
-    if not m:
-        return False
+    for tag, _, _, start, end in matcher.get_opcodes():
+        out.extend(line for line in new[start:end]
+                   if tag == 'equal' or line.strip())
 
-    return m.group()
+    return ''.join(out)
 
 
-def _is_inline_shell(line):
-    m = re.match(_IS_INLINE_SHELL, line)
+def _split(code, spans):
+    lines = code.splitlines(keepends=True)
+    # a masked line at the end has no line break, so it's not in lines
+    lines.extend([''] * (spans[-1][0] + 1 - len(lines)))
+    return lines
 
-    if not m:
-        return False
 
-    return m.group()
+def _line_break(line):
+    """Returns the line break at the end of the line (if any)
+    """
+    return line[len(line.splitlines()[0]):]
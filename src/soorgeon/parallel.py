@@ -0,0 +1,152 @@
+"""
+Run independent steps (e.g., analyzing or exporting each section) in a
+process pool
+"""
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+# arguments shared by all the calls in a worker process, set once per worker
+# so they're only sent once
+_shared = None
+
+
+def _initialize(shared):
+    global _shared
+    _shared = shared
+
+
+def _call(fn, item):
+    return fn(_shared, item)
+
+
+def _call_many(fn, items, args):
+    return [fn(_shared, item, *args) for item in items]
+
+
+def is_parallel(jobs, items):
+    """Returns True if the items should be processed in a process pool
+    """
+    return jobs is not None and jobs > 1 and len(items) > 1
+
+
+def run(fn, items, jobs, shared=None):
+    """Returns [fn(shared, item) for item in items]
+
+    Parameters
+    ----------
+    fn : callable
+        A module-level function (so it can be sent to other processes)
+
+    items : list
+        Arguments for each call
+
+    jobs : int or None
+        Number of processes. If None or 1, calls are made in the current
+        process
+
+    shared
+        First argument for all the calls
+
+    Notes
+    -----
+    Results are returned in the same order as the items, regardless of the
+    order in which the processes finish
+    """
+    if not is_parallel(jobs, items):
+        return [fn(shared, item) for item in items]
+
+    # send items in chunks to reduce communication overhead, but keep them
+    # small enough so the work is evenly distributed
+    chunksize = max(1, len(items) // (jobs * 4))
+
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=_initialize,
+                             initargs=(shared, )) as pool:
+        return list(pool.map(partial(_call, fn), items, chunksize=chunksize))
+
+
+class Pool:
+    """
+    Worker processes shared by several steps (e.g., analyzing and then
+    exporting the sections of a notebook)
+
+    Parameters
+    ----------
+    jobs : int or None
+        Number of processes. If None or 1, calls are made in the current
+        process
+
+    shared
+        First argument for all the calls, sent once per worker when it
+        starts
+
+    Notes
+    -----
+    Item i in each call to map always runs in the same worker (i % jobs), so
+    objects a worker creates in one step (e.g., when parsing a section) are
+    reused in the next steps. Processes start on the first call that needs
+    them and stop when closing the pool
+    """
+
+    def __init__(self, jobs, shared=None):
+        self._jobs = jobs
+        self._shared = shared
+        self._workers = None
+
+    def is_parallel(self, items):
+        """Returns True if the items would be processed in other processes
+        """
+        return is_parallel(self._jobs, items)
+
+    def map(self, fn, items, *args):
+        """Returns [fn(shared, item, *args) for item in items]
+
+        Parameters
+        ----------
+        fn : callable
+            A module-level function (so it can be sent to other processes)
+
+        items : list
+            Arguments for each call
+
+        *args
+            Arguments for all the calls, sent once per worker
+        """
+        if not self.is_parallel(items):
+            return [fn(self._shared, item, *args) for item in items]
+
+        if self._workers is None:
+            self._workers = [
+                ProcessPoolExecutor(max_workers=1,
+                                    initializer=_initialize,
+                                    initargs=(self._shared, ))
+                for _ in range(self._jobs)
+            ]
+
+        n_workers = len(self._workers)
+        futures = [
+            worker.submit(_call_many, fn, items[idx::n_workers], args)
+            for idx, worker in enumerate(self._workers[:len(items)])
+        ]
+
+        results = [None] * len(items)
+
+        for idx, future in enumerate(futures):
+            results[idx::n_workers] = future.result()
+
+        return results
+
+    def close(self):
+        """Stops the worker processes
+        """
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.shutdown()
+
+            self._workers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
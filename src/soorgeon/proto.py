@@ -1,14 +1,15 @@
 """
 ProtoTask handles the logic to convert a notebook section into a Ploomber task
 """
-from copy import deepcopy
+import hashlib
 from pathlib import Path
 
 import nbformat
-import jupytext
+import parso
 from jinja2 import Template
 
-from soorgeon import io, magics
+from soorgeon import io, magics, writers
+from soorgeon.cells import Cell
 
 _PICKLING_TEMPLATE = Template("""\
 {%- for product in products -%}
@@ -64,11 +65,21 @@ def _new_unpickling_cell(up_and_in, df_format, serializer):
 
 class ProtoTask:
     """A group of cells that will be converted into a Ploomber task
+
+    Parameters
+    ----------
+    cells : list
+        The cells, with magics masked
+
+    magics : tuple, default=None
+        The spans of each cell (see magics.mask_magics). If None, cells don't
+        have magics
     """
 
-    def __init__(self, name, cells, df_format, serializer, py):
+    def __init__(self, name, cells, df_format, serializer, py, magics=None):
         self._name = name
         self._cells = cells
+        self._magics = magics
         self._df_format = df_format
         self._serializer = serializer
         self._py = py
@@ -126,7 +137,7 @@ class ProtoTask:
         upstream_current = upstream[self.name]
 
         if upstream_current:
-            source += f'upstream = {list(upstream_current)}\n'
+            source += f'upstream = {sorted(upstream_current)}\n'
         else:
             source += 'upstream = None\n'
 
@@ -135,21 +146,19 @@ class ProtoTask:
         parameters = nbformat.v4.new_code_cell(source=source)
         parameters.metadata['tags'] = ['parameters']
 
-        return [parameters] + cells
-
-    def _add_imports_cell(self, code_nb, add_pathlib_and_pickle, definitions,
-                          df_format, serializer):
-        # FIXME: instatiate this in the constructor so we only build it once
-        ip = io.ImportsParser(code_nb)
+        return [Cell(parameters)] + cells
 
-        source_raw = ip.get_imports_cell_for_task(io.remove_imports(str(self)))
+    def _add_imports_cell(self,
+                          imports_parser,
+                          add_pathlib_and_pickle,
+                          definitions,
+                          df_format,
+                          serializer,
+                          tree=None):
+        tree = tree if tree is not None else parso.parse(str(self))
+        names = io.find_names(tree, skip_imports=True)
 
-        # since we analyze the code structure as a code string (and not a
-        # notebook) - if a magic (which is turned into a comment at this
-        # stage) is right above an import statement, parso will make it part
-        # of the import node, so we remove them here. Other comments are
-        # unchanged
-        source = magics._delete_magics_cell(source_raw)
+        source = imports_parser.get_imports_cell_for_names(names)
 
         # FIXME: only add them if they're not already there
         if add_pathlib_and_pickle:
@@ -181,75 +190,98 @@ class ProtoTask:
         upstream,
         io_,
         providers,
-        code_nb,
+        imports_parser,
         definitions,
+        tree=None,
     ):
         """Export as a Python string
 
         Parameters
         ----------
+        imports_parser : io.ImportsParser
+            Parser with the notebook's import statements. Build it once and
+            share it with all the tasks
+
         definitions : dict
             {name: code, ...} mapping with all the function and class
             definitions in the notebook. Used to add an import statement
             to the task
+
+        tree : parso.python.tree.Module, default=None
+            The parsed task's source code. If None, it is parsed
         """
 
-        nb = nbformat.v4.new_notebook()
         # TODO: simplify, make each function return a single cell and then join
         # here
 
-        cells = deepcopy(self._cells)
+        spans = self._magics or ((), ) * len(self._cells)
 
-        # remove import statements from code cells
+        # remove import statements from code cells and restore the magics
+        # (cells are views, so we don't copy the notebook to modify them)
         # FIXME: remove function definitions and class definitions
-        for cell in cells:
-            if cell.cell_type == 'code':
-                cell['source'] = io.remove_imports(cell['source'])
+        cells = [
+            Cell(cell,
+                 magics.map_code(io.remove_imports, cell['source'], spans_))
+            if cell['cell_type'] == 'code' else Cell(cell)
+            for cell, spans_ in zip(self._cells, spans)
+        ]
 
         # remove empty cells and whitespace-only cells (we may have some after
         # removing imports)
-        cells = [cell for cell in cells if cell['source'].strip()]
+        cells = [cell for cell in cells if cell.source.strip()]
 
         cell_unpickling = self._unpickling_cell(io_, providers)
 
         if cell_unpickling:
-            cells = [cell_unpickling] + cells
+            cells = [Cell(cell_unpickling)] + cells
 
         cells = self._add_parameters_cell(cells, upstream)
 
         cell_pickling = self._pickling_cell(io_)
 
         if cell_pickling:
-            cells = cells + [cell_pickling]
+            cells = cells + [Cell(cell_pickling)]
 
         cell_imports = self._add_imports_cell(
-            code_nb,
+            imports_parser,
             add_pathlib_and_pickle=cell_pickling or cell_unpickling,
             definitions=definitions,
             df_format=self._df_format,
-            serializer=self._serializer)
+            serializer=self._serializer,
+            tree=tree)
 
-        pre = [cell_imports] if cell_imports else []
-
-        nb.cells = pre + cells
+        pre = [Cell(cell_imports)] if cell_imports else []
 
         # TODO: H2 header should be the top cell
 
-        # remove magics
-        nb_out = magics.uncomment_magics(nb)
+        cells = pre + cells
+
+        nb_out = nbformat.v4.new_notebook()
 
-        # jupytext does not write metadata automatically when writing to
-        # ipnyb (but it does for py:percent), we save it here to ensure
-        # ipynb has the kernelspec info
-        if not self._py:
+        # this is the only place where we create new cells (shallow copies,
+        # the cells' metadata and outputs are shared with the original ones)
+        if self._py:
+            nb_out.cells = [cell.to_node() for cell in cells]
+        else:
+            # cell ids are random, replace them so exporting the same
+            # notebook twice generates the same file
+            nb_out.cells = [
+                cell.to_node(id=_cell_id(self.name, index))
+                if 'id' in cell else cell.to_node()
+                for index, cell in enumerate(cells)
+            ]
+
+            # jupytext does not write metadata automatically when writing to
+            # ipnyb (but it does for py:percent), we save it here to ensure
+            # ipynb has the kernelspec info
             nb_out.metadata.kernelspec = {
                 "display_name": 'Python 3',
                 "language": 'python',
                 "name": 'python3',
             }
 
-        return jupytext.writes(nb_out,
-                               fmt='py:percent' if self._py else 'ipynb')
+        return writers.writes(nb_out,
+                              fmt='py:percent' if self._py else 'ipynb')
 
     def to_spec(self, io, product_prefix):
         """
@@ -266,7 +298,7 @@ class ProtoTask:
             out: str(
                 Path(product_prefix,
                      _product_name(self.name, out, self._df_format)))
-            for out in outputs
+            for out in sorted(outputs)
         }
 
         # FIXME: check that there isn't an nb key already
@@ -286,6 +318,10 @@ class ProtoTask:
                          if cell.cell_type == 'code')
 
 
+def _cell_id(task, index):
+    return hashlib.sha1(f'{task}-{index}'.encode()).hexdigest()[:8]
+
+
 def _product_name(task, variable, df_format):
     ext = ('pkl'
            if not df_format or not variable.startswith('df') else df_format)
@@ -8,6 +8,7 @@ import warnings
 from io import StringIO
 
 from pyflakes import api as pyflakes_api
+from pyflakes import checker
 from pyflakes.reporter import Reporter
 from pyflakes.messages import (UndefinedName, UndefinedLocal,
                                DuplicateArgument, ReturnOutsideFunction,
@@ -139,3 +140,25 @@ def check_notebook(nb):
     pyflakes_api.check(source_code, filename='', reporter=reporter)
 
     reporter._check()
+
+
+def check_module(module):
+    """
+    Like check_notebook, but takes the notebook's source code already parsed
+    into an ast module, this saves parsing the source code again
+
+    Parameters
+    ----------
+    module : ast.Module
+        The parsed notebook's source code
+    """
+    reporter = MyReporter()
+
+    # this replicates what pyflakes.api.check does after parsing the code
+    checker_ = checker.Checker(module, filename='')
+    checker_.messages.sort(key=lambda m: m.lineno)
+
+    for message in checker_.messages:
+        reporter.flake(message)
+
+    reporter._check()
@@ -0,0 +1,471 @@
+"""
+soorgeon serve: a long-lived process that keeps the imports, parso's grammar
+and the analysis of each notebook in memory, so editor integrations (and the
+CLI, which forwards commands to it when it's running) don't pay for them on
+every call
+
+Requests are sent over a Unix socket, one per connection. The client sends
+a JSON line with {"method": ..., "params": {...}, "version": ...} and the
+server replies with a JSON line with {"result": ..., "output": ...} or
+{"error": {"type": ..., "message": ...}, "output": ...}, where output has
+what the server printed while handling the request. Requests from other
+soorgeon versions are refused (with a VersionMismatch error)
+"""
+import io
+import os
+import sys
+import json
+import signal
+import socket
+import logging
+import threading
+import socketserver
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import click
+
+from soorgeon import __version__, exceptions
+
+logger = logging.getLogger(__name__)
+
+# number of notebooks whose analysis is kept in memory
+MAX_SESSIONS = 32
+
+# seconds to wait for the server to reply
+TIMEOUT = 60
+
+
+class NotRunningError(Exception):
+    """Raised by call if soorgeon serve isn't running
+    """
+    pass
+
+
+class UnavailableError(NotRunningError):
+    """
+    Raised by call if soorgeon serve is running but can't handle the
+    request: it didn't reply in time or runs a different soorgeon version
+    """
+    pass
+
+
+def default_socket():
+    """
+    Path to the server's socket, it's read from the SOORGEON_SOCKET
+    environment variable, if not set, it's ~/.soorgeon/serve.sock
+    """
+    return Path(
+        os.environ.get('SOORGEON_SOCKET')
+        or Path('~', '.soorgeon', 'serve.sock').expanduser())
+
+
+def call(method, socket_path=None, timeout=None, **params):
+    """Sends a request to soorgeon serve
+
+    Parameters
+    ----------
+    method : {'ping', 'analyze', 'refactor', 'clean'}
+        Method to call, see Server for the parameters of each one (paths
+        must be absolute, since the server runs in another directory)
+
+    socket_path : str or pathlib.Path, default=None
+        Path to the server's socket. If None, it uses default_socket()
+
+    timeout : float, default=None
+        Seconds to wait for the server to reply. If None, it uses TIMEOUT
+
+    Returns
+    -------
+    The method's result, what the server printed while running the method
+    is printed
+
+    Raises
+    ------
+    NotRunningError
+        If the server isn't running or the SOORGEON_NO_SERVER environment
+        variable is set
+
+    UnavailableError
+        If the server didn't reply in time (note that it may still be
+        running the method) or runs a different soorgeon version
+
+    exceptions.BaseException
+        If the method raised an error (it keeps the type if the error
+        was one of the exceptions in soorgeon.exceptions)
+    """
+    path = Path(socket_path or default_socket())
+
+    if os.environ.get('SOORGEON_NO_SERVER'):
+        raise NotRunningError('SOORGEON_NO_SERVER is set')
+
+    if not hasattr(socket, 'AF_UNIX') or not path.exists():
+        raise NotRunningError(f'soorgeon serve is not running ({str(path)!r})')
+
+    timeout = TIMEOUT if timeout is None else timeout
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        # the socket file exists but the server isn't running (e.g., it
+        # was killed)
+        except (ConnectionRefusedError, FileNotFoundError) as e:
+            raise NotRunningError(
+                f'soorgeon serve is not running ({str(path)!r})') from e
+
+        # after connecting: with a timeout, connecting fails instead of
+        # waiting if there are many pending connections
+        sock.settimeout(timeout)
+
+        request = {'method': method, 'params': params, 'version': __version__}
+
+        try:
+            sock.sendall(json.dumps(request).encode() + b'\n')
+
+            with sock.makefile('rb') as file:
+                line = file.readline()
+        except socket.timeout as e:
+            message = f'soorgeon serve did not reply in {timeout}s'
+            logger.warning(message)
+            raise UnavailableError(message) from e
+
+    if not line:
+        raise exceptions.BaseException(
+            'soorgeon serve closed the connection without replying')
+
+    response = json.loads(line)
+
+    if response['output']:
+        click.echo(response['output'], nl=False)
+
+    if 'error' in response:
+        if response['error']['type'] == 'VersionMismatch':
+            logger.warning(response['error']['message'])
+            raise UnavailableError(response['error']['message'])
+
+        raise _to_exception(response['error'])
+
+    return response['result']
+
+
+def _to_exception(error):
+    cls = getattr(exceptions, error['type'], None)
+
+    if isinstance(cls, type) and issubclass(cls, exceptions.BaseException):
+        return cls(error['message'])
+    else:
+        return exceptions.BaseException(f'{error["type"]}: {error["message"]}')
+
+
+class Server:
+    """Handles soorgeon serve's requests
+
+    Parameters
+    ----------
+    max_sessions : int, default=MAX_SESSIONS
+        Number of notebooks whose analysis is kept in memory, when exceeded,
+        the least recently used one is dropped
+
+    Notes
+    -----
+    Requests are handled concurrently (one thread per connection), except
+    for requests with the same notebook and options, since they share a
+    session.Session
+    """
+    METHODS = ('ping', 'analyze', 'refactor', 'clean')
+
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        # import everything upfront, so the first request doesn't pay for it
+        import parso
+        from soorgeon import export, structure, clean  # noqa: F401
+
+        parso.load_grammar()
+
+        self._max_sessions = max_sessions
+        # {key: (session.Session, threading.Lock), ...}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def handle(self, request):
+        """Runs a request, returns the response
+        """
+        method = request.get('method')
+        params = request.get('params') or {}
+        response = {}
+
+        # clients with another version may send different parameters or
+        # expect different results
+        if request.get('version') != __version__:
+            return {
+                'error': {
+                    'type':
+                    'VersionMismatch',
+                    'message':
+                    (f'soorgeon serve runs version {__version__}, '
+                     f'got a request from version {request.get("version")}'
+                     ', restart soorgeon serve'),
+                },
+                'output': '',
+            }
+
+        with _output.capture() as output:
+            try:
+                if method not in self.METHODS:
+                    raise exceptions.BaseException(
+                        f'method must be one of {", ".join(self.METHODS)}, '
+                        f'got: {method!r}')
+
+                response['result'] = getattr(self, method)(**params)
+            except click.ClickException as e:
+                response['error'] = {
+                    'type': type(e).__name__,
+                    'message': exceptions._build_message(e),
+                }
+            except Exception as e:
+                logger.exception(f'Error handling {method!r}')
+                response['error'] = {
+                    'type': type(e).__name__,
+                    'message': str(e),
+                }
+
+        response['output'] = output.getvalue()
+
+        return response
+
+    def ping(self):
+        return 'pong'
+
+    def analyze(self, path, engine='parso'):
+        """Like soorgeon.analyze, returns a dictionary
+        """
+        from soorgeon import structure, ipynb
+
+        with self._session(('analyze', path), engine=engine) as session:
+            analysis = session.update(ipynb.read(path))
+            return structure.from_analysis(analysis)._asdict()
+
+    def refactor(self,
+                 path,
+                 cwd,
+                 product_prefix=None,
+                 df_format=None,
+                 single_task=False,
+                 file_format=None,
+                 serializer=None,
+                 engine='parso',
+                 no_cache=False):
+        """Like export.refactor, the pipeline is written to cwd
+
+        Notes
+        -----
+        There is no jobs argument, requests run in threads, and starting
+        processes from them isn't safe (they're forked with the state of
+        other threads)
+        """
+        from soorgeon import export, ipynb
+
+        if single_task:
+            export.single_task_from_path(path,
+                                         product_prefix=product_prefix,
+                                         file_format=file_format,
+                                         output_dir=cwd)
+            return
+
+        ext = Path(path).suffix[1:] if file_format is None else file_format
+        key = ('refactor', path, cwd, ext, df_format, serializer, no_cache)
+        # like soorgeon refactor, results are also stored in .soorgeon/cache
+        # (unless passing no_cache), so they're shared with it
+        path_to_cache = Path('.soorgeon', 'cache')
+
+        if no_cache:
+            self._drop(key)
+
+        with self._session(key,
+                           engine=engine,
+                           df_format=df_format,
+                           serializer=serializer,
+                           py=ext == 'py',
+                           output_dir=cwd,
+                           verbose=True,
+                           path_to_cache=(None if no_cache else Path(
+                               cwd, path_to_cache))) as session, \
+                export.suggest_single_task(path):
+            session.update(ipynb.read(path, outputs=ext != 'py'))
+            session.exporter.export(product_prefix=product_prefix)
+
+        if not no_cache:
+            export._echo_cache(path_to_cache)
+
+    def clean(self, path):
+        """Like soorgeon clean
+        """
+        from soorgeon.clean import basic_clean
+        basic_clean(path)
+
+    @contextmanager
+    def _session(self, key, **kwargs):
+        """
+        Yields the session for key (creating it if needed), only one thread
+        can use it at a time
+        """
+        from soorgeon.session import Session
+
+        # the engine is part of the key, since the cache entries depend on it
+        key = key + (kwargs.get('engine', 'parso'), )
+        evicted = []
+
+        with self._lock:
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+            else:
+                self._sessions[key] = (Session(**kwargs), threading.Lock())
+
+            while len(self._sessions) > self._max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+
+            session, lock = self._sessions[key]
+
+        for session_, lock_ in evicted:
+            with lock_:
+                session_.close()
+
+        with lock:
+            yield session
+
+    def _drop(self, key):
+        with self._lock:
+            for key_ in [key_ for key_ in self._sessions if key_[:-1] == key]:
+                session, lock = self._sessions.pop(key_)
+
+                with lock:
+                    session.close()
+
+    @contextmanager
+    def listen(self, path):
+        """
+        Context manager that listens on a Unix socket, yields a
+        socketserver.ThreadingUnixStreamServer (call serve_forever to handle
+        requests)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if path.exists():
+            # a server that didn't exit cleanly leaves the socket file
+            try:
+                call('ping', socket_path=path)
+            # it's running, but busy or with another version
+            except UnavailableError:
+                raise exceptions.BaseException(
+                    f'soorgeon serve is already running ({str(path)!r})')
+            except NotRunningError:
+                path.unlink()
+            else:
+                raise exceptions.BaseException(
+                    f'soorgeon serve is already running ({str(path)!r})')
+
+        server = socketserver.ThreadingUnixStreamServer(str(path), _Handler)
+        server.daemon_threads = True
+        server.soorgeon = self
+
+        try:
+            with _output.install():
+                yield server
+        finally:
+            server.server_close()
+
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+
+        if line:
+            response = self.server.soorgeon.handle(json.loads(line))
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class _Output:
+    """
+    Replaces sys.stdout and sys.stderr (while installed) so what each
+    request prints (e.g., with click.echo) goes to its own buffer
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @contextmanager
+    def install(self):
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = _Stream(self._local, stdout)
+        sys.stderr = _Stream(self._local, stderr)
+
+        try:
+            yield
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    @contextmanager
+    def capture(self):
+        self._local.buffer = io.StringIO()
+
+        try:
+            yield self._local.buffer
+        finally:
+            del self._local.buffer
+
+
+class _Stream(io.TextIOBase):
+
+    def __init__(self, local, default):
+        self._local = local
+        self._default = default
+
+    @property
+    def encoding(self):
+        return 'utf-8'
+
+    def isatty(self):
+        return False
+
+    def write(self, s):
+        return getattr(self._local, 'buffer', self._default).write(s)
+
+    def flush(self):
+        getattr(self._local, 'buffer', self._default).flush()
+
+
+_output = _Output()
+
+
+def serve(socket_path=None, max_sessions=MAX_SESSIONS):
+    """Runs soorgeon serve until interrupted
+    """
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        raise exceptions.BaseException(
+            'soorgeon serve requires Unix sockets, which are not supported '
+            'on this platform')
+
+    path = Path(socket_path or default_socket())
+    server = Server(max_sessions=max_sessions)
+
+    # stop cleanly (removing the socket file) when terminated
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    with server.listen(path) as unix_server:
+        click.echo(f'Listening on {str(path)!r}, press Ctrl+C to stop...')
+
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            click.echo('Stopped.')
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
@@ -0,0 +1,179 @@
+"""
+Incremental analysis for long-lived processes (e.g., editor integrations)
+that refactor the same notebook many times as it's edited
+"""
+import threading
+from pathlib import PurePosixPath
+from uuid import uuid4
+
+import parso
+from parso.cache import parser_cache
+
+from soorgeon.cache import AnalysisCache, MemoryCache
+from soorgeon.export import NotebookExporter
+
+# parso's diff parser reads and updates a global cache (parser_cache) shared
+# by all sessions, sessions used from different threads (e.g., in soorgeon
+# serve) must hold this lock when parsing or removing trees from it
+_parser_cache_lock = threading.Lock()
+
+
+class Session:
+    """
+    Keeps the parsed code and the static analysis of a notebook in memory
+    so they can be updated incrementally when the notebook changes
+
+    Parameters
+    ----------
+    engine : {'parso', 'ast'}, default='parso'
+        Engine to find the inputs and outputs of each section
+
+    df_format : {None, 'parquet', 'csv'}, default=None
+        Format to store data frames, passed to NotebookExporter
+
+    serializer : {None, 'cloudpickle', 'dill'}, default=None
+        Serializer for non-picklable data, passed to NotebookExporter
+
+    py : bool, default=False
+        Generate tasks in py:percent format instead of ipynb
+
+    jobs : int, default=None
+        Number of processes to analyze and export the sections that changed
+
+    output_dir : str or pathlib.Path, default=None
+        Directory to write the pipeline, passed to NotebookExporter
+
+    verbose : bool, default=False
+        Print messages when exporting, passed to NotebookExporter
+
+    path_to_cache : str or pathlib.Path, default=None
+        Directory with an AnalysisCache (e.g., .soorgeon/cache) to also
+        store the analysis results, so they're shared with processes that
+        use it. If None, results are only kept in memory
+
+    Notes
+    -----
+    Code is reparsed with parso's diff parser, which only parses the regions
+    that changed and updates the previous tree in place, so trees from
+    earlier updates must not be used after calling update. Inputs and
+    outputs are only computed again for sections whose code (or the names
+    they inherit from earlier sections) changed. A session must be used by
+    one thread at a time, different sessions can be used concurrently
+    """
+
+    def __init__(self,
+                 engine='parso',
+                 df_format=None,
+                 serializer=None,
+                 py=False,
+                 jobs=None,
+                 output_dir=None,
+                 verbose=False,
+                 path_to_cache=None):
+        self._engine = engine
+        self._df_format = df_format
+        self._serializer = serializer
+        self._py = py
+        self._jobs = jobs
+        self._output_dir = output_dir
+        self._verbose = verbose
+
+        self._path_to_cache = path_to_cache
+
+        self._grammar = parso.load_grammar()
+        self._cache = self._new_cache()
+        self._exporter = None
+
+        # parso keeps the trees (to diff them in the next parse) in a global
+        # cache keyed by path, we use fake paths unique to this session
+        self._root = PurePosixPath('soorgeon-session', uuid4().hex)
+        self._paths = set()
+
+    @property
+    def exporter(self):
+        """NotebookExporter for the notebook passed in the last update
+        """
+        if self._exporter is None:
+            raise ValueError('Call update before using the exporter')
+
+        return self._exporter
+
+    @property
+    def cache(self):
+        """MemoryCache with the analysis results of each section
+        """
+        return self._cache
+
+    def update(self, nb):
+        """Analyze the notebook, reusing the results from the previous call
+
+        Parameters
+        ----------
+        nb : nbformat.NotebookNode
+            Notebook to analyze
+
+        Returns
+        -------
+        analysis.Analysis
+            Static analysis results
+        """
+        def parse(name, code):
+            with _parser_cache_lock:
+                return self._grammar.parse(code,
+                                           diff_cache=True,
+                                           path=self._path_to(name))
+
+        self._exporter = NotebookExporter(nb,
+                                          verbose=self._verbose,
+                                          df_format=self._df_format,
+                                          serializer=self._serializer,
+                                          py=self._py,
+                                          engine=self._engine,
+                                          cache=self._cache,
+                                          jobs=self._jobs,
+                                          parse=parse,
+                                          output_dir=self._output_dir)
+        analysis = self._exporter.analysis
+
+        # forget trees for sections that no longer exist
+        paths = {self._path_to(None)} | {
+            self._path_to(name)
+            for name in self._exporter._snippets
+        }
+        self._forget(self._paths - paths)
+        self._paths = paths
+
+        return analysis
+
+    def close(self):
+        """Release the parsed code and analysis results
+        """
+        self._forget(self._paths)
+        self._paths = set()
+        self._cache = self._new_cache()
+        self._exporter = None
+
+    def _new_cache(self):
+        backend = (None if self._path_to_cache is None else AnalysisCache(
+            self._path_to_cache))
+        return MemoryCache(backend=backend)
+
+    def _path_to(self, name):
+        if name is None:
+            return self._root / 'notebook'
+        else:
+            return self._root / 'sections' / name
+
+    def _forget(self, paths):
+        # NOTE: parso doesn't have a public API to remove trees from its cache
+        with _parser_cache_lock:
+            trees = parser_cache.get(self._grammar._hashed, {})
+
+            for path in paths:
+                trees.pop(path, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,120 @@
+"""
+Analyze a notebook's structure (sections and the variables they share)
+without generating a pipeline
+"""
+from collections import namedtuple
+from pathlib import Path
+
+NotebookStructure = namedtuple('NotebookStructure', [
+    'sections', 'inputs', 'outputs', 'outputs_pruned', 'upstream',
+    'definitions'
+])
+NotebookStructure.__doc__ = """Results of soorgeon.analyze
+
+Attributes
+----------
+sections : list
+    Section names, in the order they appear in the notebook
+
+inputs : dict
+    {section: [variable, ...], ...} mapping with the variables each section
+    uses from earlier sections
+
+outputs : dict
+    {section: [variable, ...], ...} mapping with the variables each section
+    defines
+
+outputs_pruned : dict
+    Like outputs, but only includes variables used by other sections
+
+upstream : dict
+    {section: [upstream_section, ...], ...} mapping
+
+definitions : dict
+    {name: code, ...} mapping with all the function and class definitions in
+    the notebook
+"""
+
+
+def analyze(nb_or_path, engine='parso'):
+    """
+    Finds the sections in a notebook and how they depend on each other. It
+    runs the same checks and static analysis as soorgeon refactor, but it
+    doesn't generate any code or write any files
+
+    Parameters
+    ----------
+    nb_or_path : str, pathlib.Path or nbformat.NotebookNode
+        Notebook (or path to it) to analyze
+
+    engine : {'parso', 'ast'}, default='parso'
+        Engine to find the inputs and outputs of each section
+
+    Returns
+    -------
+    NotebookStructure
+        All values are lists and dictionaries (with sorted lists), use
+        ._asdict() to get a JSON-serializable dictionary
+
+    Examples
+    --------
+    >>> import soorgeon
+    >>> structure = soorgeon.analyze('nb.ipynb') # doctest: +SKIP
+    >>> structure.upstream # doctest: +SKIP
+    {'load': [], 'clean': ['load'], 'plot': ['clean']}
+    """
+    # imported here so the CLI can format results (see to_text) from
+    # soorgeon serve without importing the rest of the dependencies
+    from soorgeon import ipynb
+    from soorgeon.export import NotebookExporter
+
+    if isinstance(nb_or_path, (str, Path)):
+        nb = ipynb.read(nb_or_path)
+    else:
+        nb = nb_or_path
+
+    exporter = NotebookExporter(nb, verbose=False, engine=engine)
+    return from_analysis(exporter.analysis)
+
+
+def from_analysis(analysis):
+    """Returns a NotebookStructure from an analysis.Analysis object
+    """
+    return NotebookStructure(
+        sections=list(analysis.io),
+        inputs={
+            name: sorted(inputs)
+            for name, (inputs, _) in analysis.io.items()
+        },
+        outputs={
+            name: sorted(outputs)
+            for name, (_, outputs) in analysis.io.items()
+        },
+        outputs_pruned={
+            name: sorted(outputs)
+            for name, (_, outputs) in analysis.io_pruned.items()
+        },
+        upstream=analysis.upstream,
+        definitions=analysis.definitions,
+    )
+
+
+def to_text(structure):
+    """Returns a human-readable summary of a NotebookStructure
+    """
+    def names(values):
+        return ', '.join(values) if values else '-'
+
+    lines = []
+
+    for section in structure.sections:
+        lines.append(section)
+        lines.append(f'  upstream: {names(structure.upstream[section])}')
+        lines.append(f'  inputs: {names(structure.inputs[section])}')
+        lines.append('  outputs: '
+                     f'{names(structure.outputs_pruned[section])}')
+
+    if structure.definitions:
+        lines.append(f'\ndefinitions: {names(structure.definitions)}')
+
+    return '\n'.join(lines)
@@ -0,0 +1,148 @@
+"""
+Watch mode: refactor a notebook every time it's saved, keeping the analysis
+in memory so only the sections that changed are analyzed again
+"""
+import time
+import logging
+from pathlib import Path
+
+import click
+
+from soorgeon import exceptions, files, ipynb
+from soorgeon.session import Session
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Refactors a notebook when it changes
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to the notebook
+
+    product_prefix : str, default=None
+        A prefix to add to all products. If None, it's set to 'output'
+
+    file_format : {None, 'py', 'ipynb'}, default=None
+        Format for pipeline tasks, if None keeps the same format as the input
+
+    output_dir : str or pathlib.Path, default=None
+        Directory to write the pipeline. If None, it uses the current
+        directory
+
+    **kwargs
+        Passed to session.Session (e.g., engine, df_format, serializer)
+
+    Notes
+    -----
+    The first update exports the whole project (including requirements.txt,
+    .gitignore and README.md), the next ones only rewrite the task files,
+    pipeline.yaml and exported.py if their content changed. Task files
+    from sections that no longer exist are deleted
+    """
+
+    def __init__(self,
+                 path,
+                 product_prefix=None,
+                 file_format=None,
+                 output_dir=None,
+                 **kwargs):
+        self._path = Path(path)
+        self._product_prefix = product_prefix or 'output'
+        self._output_dir = Path(output_dir or '')
+
+        ext = self._path.suffix[1:] if file_format is None else file_format
+        # .ipynb tasks keep the notebook's outputs
+        self._outputs = ext != 'py'
+        self._session = Session(py=ext == 'py',
+                                output_dir=output_dir,
+                                **kwargs)
+
+        # files generated in the last update
+        self._generated = None
+        # modification time and size of the notebook in the last update
+        self._stat = None
+
+    def update(self):
+        """Refactors the notebook if it changed since the last call
+
+        Returns
+        -------
+        list or None
+            Paths to the files written, None if the notebook didn't change
+        """
+        stat = self._path.stat()
+        stat = (stat.st_mtime_ns, stat.st_size)
+
+        if stat == self._stat:
+            return None
+
+        self._stat = stat
+        self._session.update(ipynb.read(self._path, outputs=self._outputs))
+        exporter = self._session.exporter
+
+        if self._generated is None:
+            exporter.export_requirements()
+            exporter.export_gitignore(self._product_prefix)
+            exporter.export_readme()
+            self._generated = set()
+
+        sources = exporter.get_pipeline_files(self._product_prefix)
+        definitions = exporter.get_definitions_source()
+
+        if definitions is not None:
+            sources['exported.py'] = definitions
+
+        written = [
+            path for path, content in sources.items()
+            if files.write_text(self._output_dir / path, content)
+        ]
+
+        for path in self._generated - set(sources):
+            try:
+                (self._output_dir / path).unlink()
+            except FileNotFoundError:
+                pass
+
+        self._generated = set(sources)
+
+        return written
+
+    def run(self, interval=1):
+        """Checks the notebook every interval seconds until interrupted
+        """
+        while True:
+            # if the notebook has errors, show them and wait for the user to
+            # fix them (update won't refactor until the notebook changes)
+            try:
+                written = self.update()
+            except exceptions.BaseException as e:
+                e.show()
+            except Exception as e:
+                logger.exception('Error refactoring notebook')
+                click.secho(f'Error: {e}', fg='red')
+            else:
+                if written:
+                    click.echo(f'Refactored {str(self._path)!r}, updated: '
+                               f'{", ".join(written)}')
+
+            time.sleep(interval)
+
+
+def watch(path, interval=1, **kwargs):
+    """Refactor a notebook every time it changes, until interrupted
+
+    Parameters
+    ----------
+    **kwargs
+        Passed to Watcher
+    """
+    watcher = Watcher(path, **kwargs)
+    click.echo(f'Watching {str(path)!r} for changes, press Ctrl+C to stop...')
+
+    try:
+        watcher.run(interval=interval)
+    except KeyboardInterrupt:
+        click.echo('Stopped watching.')
@@ -0,0 +1,185 @@
+"""
+Writes the generated tasks as py:percent or ipynb files. jupytext.writes
+detects the format, filters metadata, dumps the YAML header and validates
+the notebook every time, which adds up in pipelines with many tasks, so we
+write the cells directly. Cells that jupytext writes in a special way (e.g.,
+cells with magics or jupytext metadata) fall back to jupytext.writes, the
+output is the same (see tests/test_writers.py)
+
+Matching jupytext's output relies on some of its internal functions, so
+setup.py pins jupytext to the versions we test against
+"""
+import json
+from functools import lru_cache
+
+import jupytext
+import nbformat
+from jupytext.magics import is_magic
+from jupytext.metadata_filter import is_valid_metadata_key
+from jupytext.pep8 import pep8_lines_between_cells
+
+# cell metadata that jupytext does not write in py:percent files
+_IGNORED_METADATA = {
+    'autoscroll', 'collapsed', 'scrolled', 'trusted', 'execution',
+    'ExecuteTime', 'lines_to_next_cell'
+}
+
+# cell metadata that changes how jupytext writes a cell
+_JUPYTEXT_METADATA = {
+    'active', 'cell_depth', 'cell_marker', 'cell_type', 'hide_input',
+    'hide_output', 'incorrectly_encoded_metadata', 'language',
+    'lines_to_end_of_cell_marker', 'magic_args', 'noskipline', 'region_name',
+    'run_control', 'skipline', 'title'
+}
+
+
+def writes(nb, fmt):
+    """Returns the text representation of a notebook, like jupytext.writes
+
+    Parameters
+    ----------
+    nb : nbformat.NotebookNode
+        The notebook
+
+    fmt : {'py:percent', 'ipynb'}
+        Format
+    """
+    if fmt not in {'py:percent', 'ipynb'}:
+        raise ValueError("fmt must be one of 'py:percent' or 'ipynb', "
+                         f"got: {fmt!r}")
+
+    if fmt == 'py:percent':
+        text = _to_percent(nb)
+    else:
+        text = _to_ipynb(nb)
+
+    return jupytext.writes(nb, fmt=fmt) if text is None else text
+
+
+@lru_cache(maxsize=None)
+def _percent_header():
+    # the header only depends on the jupytext version (if the notebook has
+    # no metadata), so we get it once
+    return jupytext.writes(nbformat.v4.new_notebook(), fmt='py:percent')
+
+
+def _to_percent(nb):
+    """
+    Returns the notebook in py:percent format, or None if jupytext must
+    write it
+    """
+    if nb.metadata:
+        return None
+
+    texts = []
+
+    for cell in nb.cells:
+        text = _percent_cell(cell)
+
+        if text is None:
+            return None
+
+        texts.append(text)
+
+    # like jupytext, we go backwards since the number of blank lines after a
+    # cell depends on the next one
+    lines = []
+
+    for cell, text in zip(reversed(nb.cells), reversed(texts)):
+        blank = cell.metadata.get('lines_to_next_cell')
+
+        if blank is None:
+            blank = pep8_lines_between_cells(text, lines, '.py')
+
+        lines = text + [''] * blank + lines
+
+    return _percent_header() + '\n' + '\n'.join(lines)
+
+
+def _percent_cell(cell):
+    """Returns the cell's lines, or None if jupytext must write it
+    """
+    metadata = cell.metadata
+
+    if cell.cell_type not in {'code', 'markdown'} or any(
+            key in _JUPYTEXT_METADATA or not is_valid_metadata_key(key)
+            for key in metadata) or any(
+                isinstance(tag, str) and tag.startswith('active-')
+                for tag in metadata.get('tags', [])):
+        return None
+
+    source = cell.source
+
+    if source == '':
+        lines = ['']
+    else:
+        lines = source.splitlines()
+
+        if source.endswith('\n'):
+            lines.append('')
+
+    # jupytext interprets cell magics (e.g., %%bash) in code and markdown
+    # cells
+    if lines[0].startswith('%%'):
+        return None
+
+    options = ' '.join(
+        key if value is None else f'{key}={json.dumps(value)}'
+        for key, value in metadata.items()
+        if key not in _IGNORED_METADATA and not (key == 'tags' and not value))
+
+    if cell.cell_type == 'markdown':
+        options = f'[markdown] {options}' if options else '[markdown]'
+        marker = f'# %% {options}'
+        return [marker] + ['# ' + line if line else '#' for line in lines]
+
+    # jupytext comments magics in code cells
+    if any(is_magic(line, 'python', True, True) for line in lines):
+        return None
+
+    first = lines[0]
+    indent = first[:len(first) - len(first.lstrip())] if first.strip() else ''
+    marker = f'{indent}# %% {options}' if options else f'{indent}# %%'
+
+    return [marker] if lines == [''] else [marker] + lines
+
+
+def _to_ipynb(nb):
+    """
+    Returns the notebook in ipynb format, or None if jupytext must write it
+    """
+    # jupytext rearranges some notebook metadata (e.g., jupytext's)
+    if set(nb.metadata) - {'kernelspec'}:
+        return None
+
+    cells = []
+
+    for cell in nb.cells:
+        # outputs and attachments need to be split into lines
+        if (not isinstance(cell.source, str) or cell.get('outputs')
+                or cell.get('attachments')):
+            return None
+
+        cell = {**cell, 'source': cell.source.splitlines(True)}
+
+        # nbformat removes it when writing
+        if 'trusted' in cell['metadata']:
+            cell['metadata'] = {
+                key: value
+                for key, value in cell['metadata'].items() if key != 'trusted'
+            }
+
+        cells.append(cell)
+
+    # same format as nbformat.writes
+    return json.dumps(
+        {
+            'cells': cells,
+            'metadata': nb.metadata,
+            'nbformat': nb.nbformat,
+            'nbformat_minor': nb.nbformat_minor,
+        },
+        indent=1,
+        sort_keys=True,
+        separators=(',', ': '),
+        ensure_ascii=False)
@@ -37,3 +37,13 @@ def tmp_empty(tmp_path):
     os.chdir(str(tmp_path))
     yield str(Path(tmp_path).resolve())
     os.chdir(old)
+
+
+@pytest.fixture(autouse=True)
+def no_server(monkeypatch, tmp_path_factory):
+    """
+    Point the CLI to a socket that doesn't exist, so tests don't send
+    commands to a soorgeon serve running in the machine
+    """
+    path = tmp_path_factory.getbasetemp() / 'no-server.sock'
+    monkeypatch.setenv('SOORGEON_SOCKET', str(path))
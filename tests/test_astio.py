@@ -0,0 +1,77 @@
+"""
+The ast engine must return the same io as the parso engine
+"""
+import ast
+from glob import glob
+from pathlib import Path
+
+import jupytext
+import pytest
+from conftest import PATH_TO_TESTS
+
+from soorgeon import io, astio
+from soorgeon.export import NotebookExporter
+
+_kaggle = Path(PATH_TO_TESTS, '..', '_kaggle', '_render')
+path_to_nbs = sorted(glob(str(Path(_kaggle, '*', '*.py')))) + sorted(
+    glob(str(Path(PATH_TO_TESTS, 'assets', 'nb-*.py'))))
+
+
+def get_name(path):
+    path = Path(path)
+    return path.stem if path.parent.name == 'assets' else path.parent.name
+
+
+names = [get_name(nb) for nb in path_to_nbs]
+
+
+@pytest.mark.parametrize('path', path_to_nbs, ids=names)
+def test_find_io_matches_parso_engine(path):
+    snippets = NotebookExporter(jupytext.read(path), verbose=False)._snippets
+
+    assert astio.find_io(snippets) == io.find_io(snippets)
+
+
+@pytest.mark.parametrize('code, expected', [
+    ['import pandas as pd', {'pd'}],
+    ['import a.b, c as d', {'a', 'd'}],
+    ['from a import b as c, d', {'c', 'd'}],
+    ['def fn():\n    import pandas', {'fn'}],
+    ['if x:\n    import a\nelse:\n    class B:\n        pass', {'a', 'B'}],
+    ['try:\n    import a\nexcept Exception:\n    import b', {'a', 'b'}],
+])
+def test_find_defined_names(code, expected):
+    assert astio.find_defined_names(ast.parse(code)) == expected
+
+
+@pytest.mark.parametrize('code, inputs, outputs', [
+    ['a = b = fn(x)', {'fn', 'x'}, {'a', 'b'}],
+    ['a = b.c = 1', {'b'}, {'a', 'b'}],
+    ['print(sum((x for x in y)))', {'y'}, set()],
+    ['z = [y for x in a if x for y in x]', {'a', 'y'}, {'z'}],
+])
+def test_find_inputs_and_outputs(code, inputs, outputs):
+    assert astio.find_inputs_and_outputs(code) == (inputs, outputs)
+    assert io.find_inputs_and_outputs(code) == (inputs, outputs)
+
+
+@pytest.mark.parametrize('find_inputs_and_outputs', [
+    astio.find_inputs_and_outputs,
+    pytest.param(io.find_inputs_and_outputs,
+                 marks=pytest.mark.xfail(
+                     reason='parso engine reports the loop variable of '
+                     'generators without parenthesis as an input')),
+],
+                         ids=['ast', 'parso'])
+def test_find_inputs_and_outputs_bare_generator(find_inputs_and_outputs):
+    code = 'print(sum(x for x in y))'
+    assert find_inputs_and_outputs(code) == ({'y'}, set())
+
+
+def test_find_inputs_and_outputs_function_with_local_import():
+    code = """
+def fn():
+    import math
+    return math.pi
+"""
+    assert astio.find_inputs_and_outputs(code) == (set(), set())
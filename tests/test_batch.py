@@ -0,0 +1,159 @@
+from pathlib import Path
+
+import pytest
+import jupytext
+from click.testing import CliRunner
+
+from soorgeon import batch, cli
+
+simple = """# ## first
+
+x = 1
+
+# ## second
+
+y = x + 1
+"""
+
+star_import = """# ## first
+
+from math import *
+
+# ## second
+
+y = 1
+"""
+
+
+def _write(path, content):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    jupytext.write(jupytext.reads(content, fmt='py:light'), path)
+
+
+def test_find_notebooks_in_directory(tmp_empty):
+    _write('nbs/a.ipynb', simple)
+    _write('nbs/sub/b.ipynb', simple)
+    _write('nbs/sub/.ipynb_checkpoints/b-checkpoint.ipynb', simple)
+    _write('nbs/sub/b-backup.ipynb', simple)
+    # not a backup of another notebook
+    _write('nbs/d-backup.ipynb', simple)
+    _write('nbs/c.py', simple)
+
+    assert batch.find_notebooks('nbs') == [
+        Path('nbs', 'a.ipynb'),
+        Path('nbs', 'd-backup.ipynb'),
+        Path('nbs', 'sub', 'b.ipynb'),
+    ]
+
+
+def test_find_notebooks_with_glob(tmp_empty):
+    _write('nbs/a.ipynb', simple)
+    _write('nbs/sub/b.py', simple)
+
+    assert batch.find_notebooks('nbs/**/*.py') == [Path('nbs', 'sub', 'b.py')]
+
+
+def test_output_dirs(tmp_empty):
+    paths = [Path('nbs', 'a.ipynb'), Path('nbs', 'sub', 'b.ipynb')]
+
+    assert batch.output_dirs(paths, 'out') == [
+        Path('out', 'a'),
+        Path('out', 'sub', 'b'),
+    ]
+
+
+@pytest.mark.parametrize('jobs', [None, 2])
+def test_refactor_many(tmp_empty, jobs):
+    _write('nbs/simple.ipynb', simple)
+    _write('nbs/star.ipynb', star_import)
+    Path('nbs', 'broken.ipynb').write_text('not a notebook')
+
+    results = batch.refactor_many(batch.find_notebooks('nbs'),
+                                  'out',
+                                  jobs=jobs)
+
+    assert [(Path(r.path).name, r.status) for r in results] == [
+        ('broken.ipynb', 'failed'),
+        ('simple.ipynb', 'ok'),
+        ('star.ipynb', 'single-task'),
+    ]
+    assert 'Star imports are not supported' in results[2].error
+    assert Path('out', 'simple', 'tasks', 'second.ipynb').exists()
+    assert Path('out', 'star', 'star.ipynb').exists()
+    # files are written in the output directories
+    assert not Path('pipeline.yaml').exists()
+
+
+def test_refactor_many_twice_does_not_modify_notebooks(tmp_empty):
+    _write('nbs/simple.ipynb', simple)
+    _write('nbs/star.ipynb', star_import)
+
+    def read():
+        return {
+            str(path): path.read_bytes()
+            for path in Path('nbs').glob('**/*')
+        }
+
+    before = read()
+
+    for _ in range(2):
+        results = batch.refactor_many(batch.find_notebooks('nbs'), 'out')
+
+        assert [r.status for r in results] == ['ok', 'single-task']
+
+    assert read() == before
+
+
+def test_refactor_many_cli(tmp_empty):
+    _write('nbs/a.ipynb', simple)
+    _write('nbs/b.ipynb', simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, [
+        'refactor-many', 'nbs', '--out-root', 'pipelines', '--jobs', '2',
+        '--file-format', 'py'
+    ])
+
+    assert result.exit_code == 0
+    assert '2 succeeded, 0 failed' in result.output
+    assert Path('pipelines', 'a', 'tasks', 'second.py').exists()
+    assert Path('pipelines', 'b', 'tasks', 'second.py').exists()
+
+    # notebooks in the output directory are ignored
+    result = runner.invoke(cli.cli, ['refactor-many', '.', '-o', 'pipelines'])
+
+    assert result.exit_code == 0
+    assert '2 succeeded, 0 failed' in result.output
+
+
+def test_refactor_many_cli_shows_skipped_backups(tmp_empty):
+    _write('nbs/a.ipynb', simple)
+    _write('nbs/a-backup.ipynb', simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor-many', 'nbs'])
+
+    assert result.exit_code == 0
+    assert f"Skipping 1 backup(s): {Path('nbs', 'a-backup.ipynb')}" in (
+        result.output)
+    assert '1 succeeded, 0 failed' in result.output
+
+
+def test_refactor_many_cli_fails_if_any_notebook_fails(tmp_empty):
+    _write('nbs/a.ipynb', simple)
+    Path('nbs', 'b.ipynb').write_text('not a notebook')
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor-many', 'nbs'])
+
+    assert result.exit_code == 1
+    assert '1 succeeded, 1 failed' in result.output
+
+
+def test_refactor_many_cli_no_notebooks(tmp_empty):
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor-many', 'nbs/*.ipynb'])
+
+    assert result.exit_code == 1
+    assert "No notebooks found in 'nbs/*.ipynb'" in result.output
@@ -0,0 +1,200 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from soorgeon import context, analysis, io
+from soorgeon.cache import AnalysisCache, MemoryCache
+
+snippets = {
+    'load': 'import pandas as pd\ndf = pd.read_csv("data.csv")',
+    'clean': 'df = df[df.x > 0]',
+    'plot': 'df.plot()',
+}
+
+
+def _context(snippets):
+    ctx = context.AnalysisContext('\n'.join(snippets.values()))
+    ctx.add_snippets(snippets)
+    return ctx
+
+
+def test_get_and_set(tmp_empty):
+    cache = AnalysisCache()
+    key = cache.key('some', 'code')
+
+    assert cache.get(key) is None
+
+    cache.set(key, {'inputs': ['x']})
+
+    assert cache.get(key) == {'inputs': ['x']}
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert Path('.soorgeon', 'cache', '.gitignore').read_text() == '*\n'
+
+
+def test_set_from_many_threads(tmp_empty):
+    cache = AnalysisCache()
+    key = cache.key('code')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.set(key, [i]), range(100)))
+
+    assert cache.get(key)[0] in range(100)
+    # no temporary files left behind
+    assert sorted(path.name for path in Path('.soorgeon', 'cache').iterdir()
+                  ) == ['.gitignore', f'{key}.json']
+
+
+def test_key_depends_on_all_parts():
+    keys = {
+        AnalysisCache.key('a', 'b'),
+        AnalysisCache.key('ab'),
+        AnalysisCache.key('a', 'b', 'c'),
+        AnalysisCache.key('b', 'a'),
+    }
+
+    assert len(keys) == 4
+
+
+def test_corrupted_entry_is_a_miss(tmp_empty):
+    cache = AnalysisCache()
+    key = cache.key('code')
+    cache.set(key, [1, 2, 3])
+    Path('.soorgeon', 'cache', f'{key}.json').write_text('{')
+
+    assert cache.get(key) is None
+
+
+def test_evicts_least_recently_used(tmp_empty):
+    cache = AnalysisCache(max_size=25)
+    keys = [cache.key(str(i)) for i in range(3)]
+
+    for i, key in enumerate(keys):
+        cache.set(key, 'x' * 10)
+        path = Path('.soorgeon', 'cache', f'{key}.json')
+        os.utime(path, (i, i))
+
+    # using the first one makes the second one the least recently used
+    cache.get(keys[0])
+    cache.evict()
+
+    assert [cache.get(key) is not None for key in keys] == [True, False, True]
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analysis_reuses_cached_results(tmp_empty, engine):
+    expected = io.find_io(snippets)
+
+    first = analysis.Analysis(_context(snippets),
+                              engine=engine,
+                              cache=AnalysisCache())
+
+    cache = AnalysisCache()
+    ctx = _context(snippets)
+    second = analysis.Analysis(ctx, engine=engine, cache=cache)
+
+    assert first.io == second.io == expected
+    # one entry with the names each section defines and one with its io
+    assert (cache.hits, cache.misses) == (6, 0)
+    # sections are not parsed if their results are cached
+    assert not ctx._trees and not ctx._modules
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analysis_only_analyzes_sections_that_changed(tmp_empty, engine):
+    analysis.Analysis(_context(snippets), engine=engine, cache=AnalysisCache())
+
+    edited = {**snippets, 'clean': 'df = df[df.x > 1]'}
+    cache = AnalysisCache()
+    ctx = _context(edited)
+    result = analysis.Analysis(ctx, engine=engine, cache=cache)
+
+    assert result.io == io.find_io(edited)
+    assert (cache.hits, cache.misses) == (4, 2)
+    assert set(ctx._trees) | set(ctx._modules) == {'clean'}
+
+
+def test_analysis_invalidates_sections_if_inherited_names_change(tmp_empty):
+    analysis.Analysis(_context(snippets), cache=AnalysisCache())
+
+    edited = {**snippets, 'load': 'import pandas\ndf = pandas.read_csv("x")'}
+    cache = AnalysisCache()
+    result = analysis.Analysis(_context(edited), cache=cache)
+
+    assert result.io == io.find_io(edited)
+    # clean and plot define the same names but inherit different ones
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analysis_with_cache_and_jobs(tmp_empty, engine):
+    edited = {**snippets, 'clean': 'df = df[df.x > 1]'}
+    analysis.Analysis(_context(snippets),
+                      engine=engine,
+                      cache=AnalysisCache(),
+                      jobs=2)
+
+    cache = AnalysisCache()
+    result = analysis.Analysis(_context(edited),
+                               engine=engine,
+                               cache=cache,
+                               jobs=2)
+
+    assert result.io == io.find_io(edited)
+    assert (cache.hits, cache.misses) == (4, 2)
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analysis_with_cache_and_jobs_parses_in_workers(tmp_empty, engine):
+    analysis.Analysis(_context(snippets), engine=engine, cache=AnalysisCache())
+
+    edited = {
+        **snippets, 'clean': 'df = df[df.x > 1]',
+        'plot': 'df.plot(kind="bar")'
+    }
+    ctx = _context(edited)
+    result = analysis.Analysis(ctx,
+                               engine=engine,
+                               cache=AnalysisCache(),
+                               jobs=2)
+
+    assert result.io == io.find_io(edited)
+    # the sections that changed are only parsed in the workers
+    assert not ctx._trees and not ctx._modules
+
+
+def test_memory_cache_keeps_entries_used_since_last_evict():
+    cache = MemoryCache()
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.evict()
+
+    assert cache.get('a') == 1
+    assert cache.get('c') is None
+
+    cache.evict()
+
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get('b') is None
+
+
+def test_memory_cache_with_backend(tmp_empty):
+    MemoryCache(backend=AnalysisCache()).set('a', 1)
+
+    cache = MemoryCache(backend=AnalysisCache())
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analysis_with_memory_cache(engine):
+    cache = MemoryCache()
+    analysis.Analysis(_context(snippets), engine=engine, cache=cache)
+    result = analysis.Analysis(_context(snippets), engine=engine, cache=cache)
+
+    assert result.io == io.find_io(snippets)
+    assert (cache.hits, cache.misses) == (6, 6)
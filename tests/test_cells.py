@@ -0,0 +1,92 @@
+import pickle
+
+import pytest
+import nbformat
+
+from soorgeon.cells import Cell, Notebook
+
+
+@pytest.fixture
+def node():
+    return nbformat.v4.new_code_cell(source='x = 1',
+                                     metadata=dict(tags=['some-tag']),
+                                     outputs=[])
+
+
+def test_cell_reads_from_node(node):
+    cell = Cell(node)
+
+    assert cell.source == 'x = 1'
+    assert cell['source'] == 'x = 1'
+    assert cell.cell_type == 'code'
+    assert cell['cell_type'] == 'code'
+    assert cell.metadata is node.metadata
+    assert 'id' in cell
+    assert cell.get('attachments') is None
+
+
+def test_replace_does_not_modify_node(node):
+    cell = Cell(node)
+    new = cell.replace('y = 2')
+
+    assert new.source == 'y = 2'
+    assert cell.source == 'x = 1'
+    assert node.source == 'x = 1'
+    assert new.metadata is node.metadata
+
+
+def test_replace_with_same_source_shares_the_string(node):
+    source = ''.join(['x = ', '1'])
+    new = Cell(node).replace(source)
+
+    assert new.source is node.source
+
+
+def test_view_of_view_shares_node(node):
+    view = Cell(Cell(node, 'y = 2'))
+
+    assert view.source == 'y = 2'
+    assert view == Cell(node, 'y = 2')
+    assert view != Cell(node)
+
+
+def test_cell_is_read_only(node):
+    with pytest.raises(AttributeError) as excinfo:
+        Cell(node).source = 'y = 2'
+
+    assert 'Cell is read-only' in str(excinfo.value)
+
+
+def test_to_node(node):
+    out = Cell(node, 'y = 2').to_node(id='some-id')
+
+    assert isinstance(out, nbformat.NotebookNode)
+    assert out.source == 'y = 2'
+    assert out.id == 'some-id'
+    assert out.metadata is node.metadata
+    assert node.source == 'x = 1'
+    assert node.id != 'some-id'
+
+
+def test_notebook_map_code():
+    nb = nbformat.v4.new_notebook()
+    nb.cells = [
+        nbformat.v4.new_markdown_cell(source='## header'),
+        nbformat.v4.new_code_cell(source='x = 1'),
+    ]
+
+    view = Notebook.from_nb(nb).map_code(str.upper)
+
+    assert [cell.source for cell in view.cells] == ['## header', 'X = 1']
+    assert view.metadata is nb.metadata
+    assert nb.cells[1].source == 'x = 1'
+    assert Notebook.from_nb(view) is view
+
+
+def test_pickle(node):
+    view = Notebook([Cell(node, 'y = 2')])
+
+    loaded = pickle.loads(pickle.dumps(view))
+
+    assert [cell.source for cell in loaded.cells] == ['y = 2']
+    assert loaded.cells[0].metadata == node.metadata
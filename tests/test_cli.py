@@ -1,3 +1,6 @@
+import sys
+import json
+import subprocess
 from unittest.mock import Mock
 from pathlib import Path
 
@@ -6,6 +9,7 @@ import jupytext
 import pytest
 from click.testing import CliRunner
 
+import soorgeon
 from soorgeon import cli, export
 from ploomber.spec import DAGSpec
 
@@ -45,6 +49,68 @@ def test_refactor_product_prefix(tmp_empty, args, product_prefix):
     assert all([p.startswith(product_prefix) for p in paths])
 
 
+@pytest.mark.parametrize('args', [
+    ['nb.py', '--engine', 'ast'],
+    ['nb.py', '-e', 'parso'],
+])
+def test_refactor_engine(tmp_empty, args):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, args)
+
+    spec = DAGSpec('pipeline.yaml')
+    dag = spec.to_dag()
+
+    assert result.exit_code == 0
+    assert list(dag['cell-2'].upstream) == ['cell-0']
+    assert list(dag['cell-4'].upstream) == ['cell-2']
+
+
+@pytest.mark.parametrize('args', [
+    ['nb.py', '--jobs', '2'],
+    ['nb.py', '-j', '1', '--engine', 'ast'],
+])
+def test_refactor_jobs(tmp_empty, args):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, args)
+
+    spec = DAGSpec('pipeline.yaml')
+    dag = spec.to_dag()
+
+    assert result.exit_code == 0
+    assert list(dag['cell-2'].upstream) == ['cell-0']
+    assert list(dag['cell-4'].upstream) == ['cell-2']
+
+
+def test_refactor_jobs_must_be_positive(tmp_empty):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, ['nb.py', '--jobs', '0'])
+
+    assert result.exit_code == 2
+    assert not Path('pipeline.yaml').exists()
+
+
+@pytest.mark.parametrize('args, cache', [
+    [['nb.py'], True],
+    [['nb.py', '--no-cache'], False],
+])
+def test_refactor_cache(tmp_empty, args, cache):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, args)
+
+    assert result.exit_code == 0
+    assert Path('.soorgeon', 'cache').is_dir() is cache
+    assert ("Cached the analysis of each section in '.soorgeon/cache'"
+            in result.output) is cache
+
+
 @pytest.mark.parametrize('input_, out_ext, args', [
     ['nb.py', 'py', ['nb.py']],
     ['nb.ipynb', 'ipynb', ['nb.ipynb']],
@@ -316,6 +382,85 @@ def test_single_task(tmp_empty, input_, backup, file_format, source):
     assert jupytext.read(Path(backup)).metadata
 
 
+@pytest.mark.parametrize('backup', [True, False])
+def test_single_task_to_output_dir(tmp_empty, backup):
+    jupytext.write(jupytext.reads(simple, fmt='py:light'), 'nb.ipynb')
+
+    export.single_task_from_path('nb.ipynb',
+                                 product_prefix=None,
+                                 file_format='py',
+                                 output_dir='pipeline',
+                                 backup=backup)
+
+    assert Path('pipeline', 'nb.py').exists()
+    assert Path('pipeline', 'pipeline.yaml').exists()
+    assert Path('nb-backup.ipynb').exists() is backup
+    assert not Path('pipeline.yaml').exists()
+
+
+def test_single_task_in_other_directory(tmp_empty):
+    Path('nbs').mkdir()
+    jupytext.write(jupytext.reads(simple, fmt='py:light'), 'nbs/nb.ipynb')
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, ['nbs/nb.ipynb', '--single-task'])
+
+    assert result.exit_code == 0
+    assert Path('nb.ipynb').exists()
+    assert Path('nbs', 'nb-backup.ipynb').exists()
+
+
+def test_refactor_log(tmp_empty, monkeypatch):
+    Path('nb.py').write_text(simple)
+    basic_config = Mock()
+    monkeypatch.setattr(cli.logging, 'basicConfig', basic_config)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, ['nb.py', '--log', 'info'])
+
+    assert result.exit_code == 0
+    basic_config.assert_called_once_with(level='INFO')
+
+
+def test_analyze(tmp_empty):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.analyze, ['nb.py'])
+
+    assert result.exit_code == 0
+    assert 'cell-2\n  upstream: cell-0\n  inputs: x\n' in result.output
+    assert not Path('pipeline.yaml').exists()
+
+
+@pytest.mark.parametrize('args', [
+    ['nb.py', '--json'],
+    ['nb.py', '--json', '--engine', 'ast'],
+])
+def test_analyze_json(tmp_empty, args):
+    Path('nb.py').write_text(simple)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.analyze, args)
+
+    assert result.exit_code == 0
+    assert json.loads(result.output)['upstream'] == {
+        'cell-0': [],
+        'cell-2': ['cell-0'],
+        'cell-4': ['cell-2'],
+    }
+
+
+def test_analyze_shows_error(tmp_empty):
+    Path('nb.py').write_text('# ## Section\n\nfrom math import *\n')
+
+    runner = CliRunner()
+    result = runner.invoke(cli.analyze, ['nb.py'])
+
+    assert result.exit_code == 1
+    assert 'star imports' in result.output.lower()
+
+
 @pytest.mark.parametrize('code', [
     """
 # ## header
@@ -427,3 +572,59 @@ def test_clean_no_task(tmp_empty):
 
     assert result.exit_code == 2
     assert "Error: Invalid value for 'FILENAME'" in result.output
+
+
+# generous enough to avoid flaky tests on slow machines (importing the CLI
+# takes ~30ms, and ~2s if it imports the subsystems at module level)
+IMPORT_TIME_BUDGET_US = 500_000
+
+
+def _import_times(module):
+    """
+    Imports module in a new process and returns a {name: cumulative import
+    time in microseconds, ...} mapping with all the imported modules
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True)
+
+    times = {}
+
+    # format: "import time: {self} | {cumulative} | {indentation}{name}"
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split('|')
+
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def test_cli_import_time():
+    times = _import_times('soorgeon.cli')
+
+    assert times['soorgeon.cli'] < IMPORT_TIME_BUDGET_US
+
+
+@pytest.mark.parametrize('module', [
+    'soorgeon.cli',
+    'soorgeon',
+])
+def test_imports_subsystems_lazily(module):
+    heavy = {
+        'jupytext', 'nbformat', 'parso', 'jinja2', 'yaml', 'isort',
+        'pyflakes', 'soorgeon.export'
+    }
+
+    assert not heavy & set(_import_times(module))
+
+
+def test_analyze_is_imported_lazily():
+    from soorgeon.structure import analyze
+
+    assert soorgeon.analyze is analyze
+
+    with pytest.raises(AttributeError):
+        soorgeon.missing
@@ -0,0 +1,62 @@
+import ast
+import pickle
+
+import pytest
+
+from soorgeon import context
+
+
+def test_analysis_context_parses_once():
+    ctx = context.AnalysisContext('x = 1\ny = x + 1')
+    ctx.add_snippets({'first': 'x = 1', 'second': 'y = x + 1'})
+
+    assert ctx.tree is ctx.tree
+    assert ctx.module is ctx.module
+    assert ctx.trees['first'] is ctx.trees['first']
+    assert isinstance(ctx.module, ast.Module)
+
+
+def test_analysis_context_keeps_snippets_order():
+    ctx = context.AnalysisContext('x = 1\ny = x + 1')
+    ctx.add_snippets({'second': 'y = x + 1', 'first': 'x = 1'})
+
+    assert list(ctx.trees) == ['second', 'first']
+    assert ctx.trees['second'].get_code() == 'y = x + 1'
+
+
+def test_analysis_context_syntax_error():
+    ctx = context.AnalysisContext('if')
+
+    with pytest.raises(SyntaxError):
+        ctx.module
+
+
+def test_analysis_context_custom_parse():
+    calls = []
+
+    def parse(name, code):
+        calls.append(name)
+        return context._parse(name, code)
+
+    ctx = context.AnalysisContext('x = 1\ny = x + 1', parse=parse)
+    ctx.add_snippets({'first': 'x = 1', 'second': 'y = x + 1'})
+
+    ctx.tree
+    ctx.trees
+
+    assert calls == [None, 'first', 'second']
+
+
+def test_analysis_context_pickle():
+    ctx = context.AnalysisContext('x = 1\ny = x + 1',
+                                  parse=lambda name, code: None)
+    ctx.add_snippets({'first': 'x = 1', 'second': 'y = x + 1'})
+    ctx.trees
+
+    loaded = pickle.loads(pickle.dumps(ctx))
+
+    # objects are parsed again (with parso)
+    assert loaded._trees == {}
+    assert loaded.code == ctx.code
+    assert list(loaded.snippets.items()) == list(ctx.snippets.items())
+    assert loaded.trees['first'].get_code() == 'x = 1'
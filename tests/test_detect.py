@@ -148,3 +148,65 @@ def test_is_inside_list_comprehension(code, expected):
 def test_inside_function_call(code, expected):
     leaf = testutils.get_first_leaf_with_value(code, 'df')
     assert detect.is_inside_function_call(leaf) is expected
+
+
+_leaf_index_code = """
+import pandas as pd
+
+df = pd.read_csv('data.csv', sep=',')
+
+for x, y in zip(range(10), df.columns):
+    print(x, y)
+
+    for z in range(x):
+        with open(f'{z}.txt') as f:
+            f.write(str(y))
+
+with open('file.txt') as f: f.read()
+
+for i in range(3): print(i)
+
+
+def fn(a, b=1, *args, **kwargs):
+    for i in range(a):
+        print(fn(i, b=b))
+
+    return (1, 2, 3)
+
+
+class Something:
+    def method(self, x):
+        with x:
+            return [i for i in x]
+
+
+df2 = something(df['x'], key=value).attribute
+result = Constructor({'data': (df - 1)}).do_stuff()
+"""
+
+
+@pytest.mark.parametrize('code', [
+    _leaf_index_code,
+    testutils.exploratory,
+    testutils.mixed,
+])
+def test_leaf_index_matches_detectors(code):
+    tree = parso.parse(code)
+    index = detect.LeafIndex(tree)
+    leaf = tree.get_first_leaf()
+
+    while leaf:
+        assert index.is_inside_funcdef(leaf) is detect.is_inside_funcdef(leaf)
+        assert index.is_for_loop(leaf) is detect.is_for_loop(leaf)
+        assert (index.is_context_manager(leaf) is
+                detect.is_context_manager(leaf))
+        assert (index.is_inside_function_call(leaf) is
+                detect.is_inside_function_call(leaf))
+
+        if leaf.type == 'name':
+            assert (index.is_left_side_of_assignment(leaf) ==
+                    detect.is_left_side_of_assignment(leaf))
+
+        assert index.next_leaf(leaf) is leaf.get_next_leaf()
+
+        leaf = leaf.get_next_leaf()
@@ -1,10 +1,21 @@
+import os
+import sys
+import copy
+import tarfile
+import zipfile
+import subprocess
+from io import BytesIO
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from importlib import resources
+from collections import Counter
 
 import yaml
 import parso
 import pytest
 import jupytext
+import nbformat
 from ploomber.spec import DAGSpec
 import papermill as pm
 
@@ -147,10 +158,9 @@ a_, b_ = range(10), range(10)
 things = {f'"{a}"': b for a, b in zip(a_, b_) if b > 3}
 """
 
-# NOTE: since we turn magics into comments, we add an import in the middle
-# of the notebook to ensure that the magic above it won't turn into a comment
-# in the final import node (the import note will be moved to the top of
-# the notebook)
+# NOTE: we add an import in the middle of the notebook to ensure that the
+# magic above it isn't moved to the import node (the import node will be moved
+# to the top of the notebook)
 magics = """\
 # ## first
 
@@ -264,6 +274,56 @@ def test_from_nb_works_with_magics(tmp_empty, py, ext):
     ]
 
 
+@pytest.mark.parametrize('py', [True, False], ids=['py', 'ipynb'])
+def test_from_nb_does_not_modify_nb(tmp_empty, py):
+    nb = _read(magics)
+    nb_copy = copy.deepcopy(nb)
+
+    export.from_nb(nb, py=py)
+
+    assert nb == nb_copy
+
+
+def test_from_nb_keeps_magics_above_imports(tmp_empty):
+    nb = _read("""\
+# ## first
+
+# %%capture
+import math
+x = math.sqrt(1)
+""")
+
+    export.from_nb(nb, py=True)
+
+    first = jupytext.read(Path('tasks', 'first.py'))
+
+    assert [c['source'] for c in first.cells][-1] == ('%%capture\n'
+                                                      'x = math.sqrt(1)')
+
+
+def test_from_nb_keeps_magic_cell_above_imports(tmp_empty):
+    nb = _read("""\
+# ## first
+
+# +
+# %load_ext autoreload
+# %autoreload 2
+
+import math
+# -
+
+x = math.sqrt(1)
+""")
+
+    export.from_nb(nb, py=True)
+
+    first = jupytext.read(Path('tasks', 'first.py'))
+    sources = [c['source'] for c in first.cells]
+
+    assert sources[sources.index('## first') + 1] == ('%load_ext autoreload\n'
+                                                      '%autoreload 2')
+
+
 def test_exporter_infers_structure_from_line_magics():
     exporter = export.NotebookExporter(_read(magics_structured))
 
@@ -340,6 +400,143 @@ def test_from_nb_appends_gitignore(tmp_empty):
     assert path.read_text() == 'something\nsome-directory\n'
 
 
+@pytest.mark.parametrize('py', [True, False])
+def test_export_twice_does_not_write_files(tmp_empty, py):
+    export.NotebookExporter(_read(with_definitions), py=py).export()
+    paths = [path for path in Path().glob('**/*') if path.is_file()]
+    contents = {path: path.read_text() for path in paths}
+
+    for path in paths:
+        os.utime(path, (1, 1))
+
+    export.NotebookExporter(_read(with_definitions), py=py).export()
+
+    assert Path('exported.py').exists()
+    assert sorted(Path().glob('**/*')) == sorted(
+        set(paths) | {Path('tasks')})
+    assert {path: path.read_text() for path in paths} == contents
+    assert {path.stat().st_mtime for path in paths} == {1}
+
+
+many_variables = """# ## first
+
+import math
+import random
+
+a, b, c, d, e = 1, 2, 3, 4, 5
+df_x, df_y = [], []
+
+# ## second
+
+f, g, h = a + 1, b + 1, math.sqrt(c)
+
+# ## third
+
+def add(x, y):
+    return x + y
+
+i = add(a, f) + g + h + d + e + len(df_x) + len(df_y) + random.random()
+"""
+
+
+@pytest.mark.parametrize('py', [True, False])
+def test_export_is_independent_of_hash_seed(tmp_empty, py):
+    Path('nb.py').write_text(many_variables)
+    script = ('import jupytext\n'
+              'from soorgeon import export\n'
+              "nb = jupytext.read('../nb.py', fmt='py:light')\n"
+              f'export.NotebookExporter(nb, py={py}, df_format="csv")'
+              '.export()')
+    outputs = []
+
+    for seed in ['0', '1', '2']:
+        Path(seed).mkdir()
+        subprocess.run([sys.executable, '-c', script],
+                       cwd=seed,
+                       env={
+                           **os.environ, 'PYTHONHASHSEED': seed
+                       },
+                       check=True)
+        outputs.append({
+            str(path.relative_to(seed)): path.read_bytes()
+            for path in Path(seed).glob('**/*') if path.is_file()
+        })
+
+    assert 'pipeline.yaml' in outputs[0]
+    assert all(output == outputs[0] for output in outputs)
+
+
+def _files_in(directory):
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in Path(directory).glob('**/*') if path.is_file()
+    }
+
+
+def test_export_to_output_dir(tmp_empty):
+    export.from_nb(_read(with_definitions),
+                   product_prefix='some-directory',
+                   output_dir='pipeline')
+
+    assert set(_files_in('pipeline')) == {
+        'README.md', '.gitignore', 'exported.py', 'pipeline.yaml',
+        'requirements.txt', 'tasks/load.ipynb', 'tasks/clean.ipynb',
+        'tasks/plot.ipynb'
+    }
+    assert Path('pipeline', '.gitignore').read_text() == 'some-directory\n'
+    assert not Path('pipeline.yaml').exists()
+
+
+def test_concurrent_exports_to_output_dirs(tmp_empty):
+    notebooks = [simple, eda, with_definitions, many_variables]
+
+    for index, nb in enumerate(notebooks):
+        export.from_nb(_read(nb), output_dir=f'serial-{index}')
+
+    def from_nb(index):
+        export.from_nb(_read(notebooks[index]), output_dir=f'thread-{index}')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(from_nb, range(len(notebooks))))
+
+    for index, _ in enumerate(notebooks):
+        assert _files_in(f'thread-{index}') == _files_in(f'serial-{index}')
+
+    assert not set(os.listdir()) - {
+        f'{prefix}-{index}'
+        for prefix in ('serial', 'thread') for index in range(4)
+    }
+
+
+def test_from_nb_does_not_configure_logging(tmp_empty, monkeypatch):
+    basic_config = Mock()
+    monkeypatch.setattr(export.logging, 'basicConfig', basic_config)
+
+    export.from_nb(_read(simple))
+
+    basic_config.assert_not_called()
+
+
+@pytest.mark.parametrize('fn, arg', [
+    [export.from_nb, _read(simple)],
+    [export.from_path, 'nb.ipynb'],
+    [export.refactor, 'nb.ipynb'],
+])
+def test_log_is_deprecated(tmp_empty, monkeypatch, fn, arg):
+    jupytext.write(_read(simple), 'nb.ipynb')
+    basic_config = Mock()
+    monkeypatch.setattr(export.logging, 'basicConfig', basic_config)
+
+    # log used to be the second positional argument
+    with pytest.warns(DeprecationWarning, match='log is deprecated'):
+        fn(arg, 'info')
+
+    basic_config.assert_called_once_with(level='INFO')
+    # 'info' isn't taken as the product prefix
+    assert 'output/' in Path('pipeline.yaml').read_text()
+    assert not Path('info').exists()
+
+
 def test_from_nb_doesnt_create_gitignore_if_absolute_prefix(tmp_empty):
     export.from_nb(_read(simple), product_prefix='/some/absolute/dir')
 
@@ -497,6 +694,19 @@ def test_export_requirements_doesnt_overwrite(tmp_empty):
     assert reqs.read_text() == expected
 
 
+def test_export_requirements_only_appends_missing_packages(tmp_empty):
+    reqs = Path('requirements.txt')
+    reqs.write_text('soorgeon\nmatplotlib\n')
+
+    exporter = export.NotebookExporter(_read(definition_with_import))
+    exporter.export_requirements()
+    exporter.export_requirements()
+
+    expected = ('soorgeon\nmatplotlib\n# Auto-generated file, may need '
+                'manual editing\nload\nploomber>=0.14.7\n')
+    assert reqs.read_text() == expected
+
+
 def test_does_not_create_exported_py_if_no_definitions(tmp_empty):
     exporter = export.NotebookExporter(_read(simple))
     exporter.export_definitions()
@@ -559,6 +769,27 @@ def test_get_raw_io(code, expected):
     assert exporter._get_raw_io() == expected
 
 
+def test_export_analyzes_each_snippet_once(tmp_empty, monkeypatch):
+    calls = Counter()
+    original = io.find_inputs_and_outputs_from_tree
+
+    def find_inputs_and_outputs_from_tree(tree, local_scope=None):
+        calls[id(tree)] += 1
+        return original(tree, local_scope=local_scope)
+
+    monkeypatch.setattr(io, 'find_inputs_and_outputs_from_tree',
+                        find_inputs_and_outputs_from_tree)
+
+    exporter = export.NotebookExporter(_read(eda))
+    exporter.export()
+
+    trees = exporter._context.trees
+
+    assert len(trees) == 3
+    assert all(calls[id(tree)] == 1 for tree in trees.values())
+    assert exporter.analysis is exporter.analysis
+
+
 def test_exporter_init_with_syntax_error():
     code = """\
 # ## first
@@ -667,6 +898,32 @@ def my_function(a, b, c=None):
     export._check_functions_do_not_use_global_variables(code)
 
 
+@pytest.mark.parametrize('code, expected', [
+    ['def fn(x):\n    return fn(x - 1) if x else 0\n', None],
+    ['def fn(x):\n    return x + y\n\ny = 1\n', "'y'"],
+    ['def fn(x):\n    return x\n\nfn(z)\nz = 1\n', None],
+    ['import functools\n\n@functools.cache\ndef fn(x):\n    return x + a\n',
+     "'a'"],
+    ['if True:\n    def fn(x):\n        return x + b\n', "'b'"],
+],
+                         ids=[
+                             'recursive',
+                             'global',
+                             'code-after-function',
+                             'decorated',
+                             'inside-if',
+                         ])
+def test_check_functions_do_not_use_global_variables_cases(code, expected):
+    if expected is None:
+        export._check_functions_do_not_use_global_variables(code)
+    else:
+        with pytest.raises(exceptions.InputError) as excinfo:
+            export._check_functions_do_not_use_global_variables(code)
+
+        assert f"Function 'fn' uses variables {expected}" in str(
+            excinfo.value)
+
+
 # FIXME: this is broken because we consider all the definitions in the file
 # but we should only take into account the ones that happen before the node
 # we're parsing
@@ -819,6 +1076,48 @@ def test_validates_serializer():
     assert 'serializer must be one of ' in str(excinfo.value)
 
 
+def test_validates_engine():
+    with pytest.raises(ValueError) as excinfo:
+        export.NotebookExporter(_read(''), engine='something')
+
+    assert 'engine must be one of ' in str(excinfo.value)
+
+
+def test_exporter_ast_engine(monkeypatch):
+    monkeypatch.setattr(io, 'find_io', Mock(side_effect=AssertionError))
+
+    exporter = export.NotebookExporter(_read(eda), engine='ast')
+
+    assert exporter.analysis.find_inputs_memo is None
+    assert exporter.analysis.upstream == {
+        'load': [],
+        'clean': ['load'],
+        'plot': ['clean'],
+    }
+
+
+@pytest.mark.parametrize('jobs', [0, -1, 1.5, '2'])
+def test_validates_jobs(jobs):
+    with pytest.raises(ValueError) as excinfo:
+        export.NotebookExporter(_read(''), jobs=jobs)
+
+    assert 'jobs must be None or an integer ' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_exporter_jobs(engine, jobs):
+    serial = export.NotebookExporter(_read(eda), engine=engine, py=True)
+    exporter = export.NotebookExporter(_read(eda),
+                                       engine=engine,
+                                       py=True,
+                                       jobs=jobs)
+
+    assert exporter.io == serial.io
+    assert exporter.analysis.upstream == serial.analysis.upstream
+    assert exporter.get_sources() == serial.get_sources()
+
+
 def test_creates_readme(tmp_empty):
     exporter = export.NotebookExporter(_read(simple))
     exporter.export()
@@ -834,3 +1133,133 @@ def test_appends_to_readme(tmp_empty):
 
     expected = '# Some stuff\n' + resources.read_text(assets, 'README.md')
     assert Path('README.md').read_text() == expected
+
+
+@pytest.mark.parametrize('nb, py', [
+    [simple, False],
+    [with_definitions, False],
+    [with_definitions, True],
+    [many_variables, True],
+])
+def test_export_to_memory(tmp_empty, nb, py):
+    export.from_nb(_read(nb), py=py, output_dir='pipeline')
+
+    exporter = export.NotebookExporter(_read(nb), py=py)
+
+    assert exporter.export_to_memory() == _files_in('pipeline')
+    assert os.listdir() == ['pipeline']
+
+
+def test_export_to_memory_product_prefix():
+    exporter = export.NotebookExporter(_read(simple))
+    files = exporter.export_to_memory(product_prefix='/absolute/dir')
+
+    assert '.gitignore' not in files
+    assert 'nb: /absolute/dir/cell-0.ipynb' in files['pipeline.yaml'].decode()
+
+
+class _WriteOnly:
+    """A file-like object that can't seek or tell (e.g., a socket)
+    """
+
+    def __init__(self):
+        self.buffer = BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+@pytest.mark.parametrize('archive_format, read', [
+    ['zip', lambda data: {
+        info.filename: zipfile.ZipFile(data).read(info)
+        for info in zipfile.ZipFile(data).infolist()
+    }],
+    ['tar', lambda data: {
+        member.name: tarfile.open(fileobj=data).extractfile(member).read()
+        for member in tarfile.open(fileobj=data).getmembers()
+    }],
+])
+def test_export_to_archive(archive_format, read):
+    exporter = export.NotebookExporter(_read(with_definitions))
+    fileobj = _WriteOnly()
+
+    exporter.export_to_archive(fileobj, archive_format=archive_format)
+
+    fileobj.buffer.seek(0)
+    assert read(fileobj.buffer) == exporter.export_to_memory()
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'tar'])
+def test_export_to_archive_is_deterministic(archive_format):
+    first, second = BytesIO(), BytesIO()
+
+    export.NotebookExporter(_read(eda)).export_to_archive(
+        first, archive_format)
+    export.NotebookExporter(_read(eda)).export_to_archive(
+        second, archive_format)
+
+    assert first.getvalue() == second.getvalue()
+
+
+def test_export_to_archive_validates_format():
+    exporter = export.NotebookExporter(_read(simple))
+
+    with pytest.raises(ValueError) as excinfo:
+        exporter.export_to_archive(BytesIO(), archive_format='rar')
+
+    assert ("archive_format must be one of 'zip' or 'tar'"
+            in str(excinfo.value))
+
+
+def test_export_to_archive_writes_files_as_generated(monkeypatch):
+    exporter = export.NotebookExporter(_read(with_definitions))
+    fileobj = _WriteOnly()
+    sizes = {}
+    get_readme = exporter._get_readme
+
+    def _get_readme(content):
+        # the files generated before are already in the archive
+        sizes['before-readme'] = len(fileobj.buffer.getvalue())
+        return get_readme(content)
+
+    monkeypatch.setattr(exporter, '_get_readme', _get_readme)
+
+    exporter.export_to_archive(fileobj)
+
+    assert sizes['before-readme'] > 0
+
+
+def test_from_path_ipynb_keeps_outputs(tmp_empty):
+    nb = _read(simple)
+    output = nbformat.v4.new_output('stream',
+                                    name='stdout',
+                                    text='some output\n')
+    nb.cells[1].outputs = [output]
+    nb.cells[1].execution_count = 1
+    jupytext.write(nb, 'nb.ipynb')
+
+    export.from_path('nb.ipynb')
+
+    task = jupytext.read(Path('tasks', 'cell-0.ipynb'))
+    code = [cell for cell in task.cells if cell.source == 'x = 1']
+
+    assert [cell.outputs for cell in code] == [[output]]
+    assert [cell.execution_count for cell in code] == [1]
+
+
+@pytest.mark.parametrize('py, outputs', [
+    [True, False],
+    [False, True],
+])
+def test_from_path_reads_outputs_for_ipynb_tasks(tmp_empty, monkeypatch, py,
+                                                 outputs):
+    jupytext.write(_read(simple), 'nb.ipynb')
+    read = Mock(wraps=export.ipynb.read)
+    monkeypatch.setattr(export.ipynb, 'read', read)
+
+    export.from_path('nb.ipynb', py=py)
+
+    read.assert_called_once_with('nb.ipynb', outputs=outputs)
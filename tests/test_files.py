@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from soorgeon import files
+
+
+def test_read_text(tmp_empty):
+    Path('file.txt').write_text('content')
+
+    assert files.read_text('file.txt') == 'content'
+    assert files.read_text('missing.txt') is None
+
+
+def test_write_text(tmp_empty):
+    assert files.write_text(Path('some', 'dir', 'file.txt'), 'content')
+    assert Path('some', 'dir', 'file.txt').read_text() == 'content'
+    assert os.listdir(Path('some', 'dir')) == ['file.txt']
+
+
+def test_write_text_skips_unchanged_files(tmp_empty):
+    path = Path('file.txt')
+    path.write_text('content')
+    os.utime(path, (1, 1))
+
+    assert not files.write_text(path, 'content')
+    assert path.stat().st_mtime == 1
+
+    assert files.write_text(path, 'new content')
+    assert path.read_text() == 'new content'
+
+
+def test_write_text_overwrites_binary_files(tmp_empty):
+    path = Path('file.txt')
+    path.write_bytes(b'\xff\xfe\x00')
+
+    assert files.write_text(path, 'content')
+    assert path.read_text() == 'content'
+
+
+def test_write_text_keeps_permissions(tmp_empty):
+    path = Path('file.sh')
+    path.write_text('content')
+    path.chmod(0o755)
+
+    assert files.write_text(path, 'new content')
+    assert path.stat().st_mode & 0o777 == 0o755
+
+
+def test_write_text_keeps_old_content_if_interrupted(tmp_empty, monkeypatch):
+    path = Path('file.txt')
+    path.write_text('content')
+
+    def replace(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(files.os, 'replace', replace)
+
+    with pytest.raises(KeyboardInterrupt):
+        files.write_text(path, 'new content')
+
+    assert path.read_text() == 'content'
+    assert os.listdir() == ['file.txt']
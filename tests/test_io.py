@@ -104,10 +104,32 @@ imports = {
 def test_providermapping():
     m = io.ProviderMapping(io.find_io(eda))
 
-    assert m._providers_for_task('load') == {}
-    assert m._providers_for_task('clean') == {'df': 'load'}
-    assert m._providers_for_task('plot') == {'df': 'clean'}
     assert m.get('df', 'clean') == 'load'
+    assert m.get('df', 'plot') == 'clean'
+
+    with pytest.raises(KeyError):
+        m.get('df', 'load')
+
+
+def test_providermapping_matches_earlier_sections():
+    io_ = {
+        'a': (set(), {'x', 'y'}),
+        'b': ({'x'}, {'x'}),
+        'c': ({'x', 'y'}, {'z'}),
+        'd': ({'x', 'y', 'z'}, set()),
+    }
+    m = io.ProviderMapping(io_)
+
+    assert m.get('x', 'b') == 'a'
+    assert m.get('y', 'b') == 'a'
+    assert m.get('x', 'c') == 'b'
+    assert m.get('y', 'c') == 'a'
+    assert m.get('x', 'd') == 'b'
+    assert m.get('z', 'd') == 'c'
+    assert m.get('x', 'not-a-section') == 'b'
+
+    with pytest.raises(KeyError):
+        m.get('z', 'c')
 
 
 def test_providermapping_error():
@@ -234,6 +256,25 @@ def test_importsparser(code_nb, code_task, expected):
     assert ip.get_imports_cell_for_task(code_task) == expected
 
 
+def test_importsparser_keeps_notebook_order():
+    ip = io.ImportsParser('import b\nimport a\nfrom c import d')
+    assert ip.get_imports_cell_for_names({'d', 'a', 'b', 'x'}) == (
+        'import b\nimport a\nfrom c import d')
+
+
+@pytest.mark.parametrize('code, skip_imports, expected', [
+    ['import pandas as pd\ndf = pd.read_csv(path)', False,
+     {'pandas', 'pd', 'df', 'read_csv', 'path'}],
+    ['import pandas as pd\ndf = pd.read_csv(path)', True,
+     {'pd', 'df', 'read_csv', 'path'}],
+    ['def fn():\n    from math import sqrt\n    return sqrt(x)', True,
+     {'fn', 'sqrt', 'x'}],
+])
+def test_find_names(code, skip_imports, expected):
+    tree = parso.parse(code)
+    assert io.find_names(tree, skip_imports=skip_imports) == expected
+
+
 @pytest.mark.parametrize('code, expected', [
     ['import pandas as pd\nimport numpy as np', '\n'],
     ['import math', ''],
@@ -270,6 +311,27 @@ def test_definitions_mapping(snippets, names, a, b):
     assert im.get('b') == b
 
 
+def test_definitions_mapping_all_scopes():
+    im = io.DefinitionsMapping({
+        'a': 'import pandas',
+        'b': 'x = 1',
+        'c': 'def fn():\n    pass',
+        'd': 'y = 2',
+    })
+
+    scopes = im.all_scopes()
+
+    assert scopes == {
+        'a': set(),
+        'b': {'pandas'},
+        'c': {'pandas'},
+        'd': {'pandas', 'fn'},
+    }
+    # snippets that do not define names share the scope with the next one
+    assert scopes['b'] is scopes['c']
+    assert im.get('unknown') == {'pandas', 'fn'}
+
+
 @pytest.mark.parametrize('code, def_expected, in_expected, out_expected', [
     ['for x in range(10):\n    pass', {'x'},
      set(), set()],
@@ -560,3 +622,26 @@ def test_get_local_scope(code, expected):
 def test_get_modified_objects(code, expected):
     leaf = testutils.get_first_leaf_with_value(code, '=')
     assert (io._get_modified_objects(leaf, {'i', 'j', 'k'}, set()) == expected)
+
+
+def test_memoize_find_inputs():
+    tree = parso.parse('x = [i for i in range(n)]')
+
+    with io.memoize_find_inputs() as memo:
+        in_, out = io.find_inputs_and_outputs_from_tree(tree)
+        memoized = io.find_inputs(tree.children[0])
+        assert io.find_inputs(tree.children[0]) is memoized
+
+    assert in_ == {'n'}
+    assert out == {'x'}
+    assert isinstance(memoized, frozenset)
+    assert memo.hits >= 2
+    assert memo.misses >= 1
+    assert io._find_inputs_memo.get() is None
+
+
+def test_find_inputs_and_outputs_from_tree_only_analyzes_the_node():
+    tree = parso.parse('def fn(x):\n    return x\n\ny = fn(z)\n')
+    funcdef = next(tree.iter_funcdefs())
+
+    assert io.find_inputs_and_outputs_from_tree(funcdef) == (set(), set())
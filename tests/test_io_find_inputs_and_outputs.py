@@ -1,6 +1,6 @@
 import pytest
 
-from soorgeon import io
+from soorgeon import io, astio
 
 only_outputs = """
 x = 1
@@ -642,8 +642,13 @@ out = something(1, lambda x: x)
         'lambda_with_input_assignment',
         'lambda_as_arg_assignment',
     ])
-def test_find_inputs_and_outputs(code_str, inputs, outputs):
-    in_, out = io.find_inputs_and_outputs(code_str)
+@pytest.mark.parametrize(
+    'find_inputs_and_outputs',
+    [io.find_inputs_and_outputs, astio.find_inputs_and_outputs],
+    ids=['parso', 'ast'])
+def test_find_inputs_and_outputs(code_str, inputs, outputs,
+                                 find_inputs_and_outputs):
+    in_, out = find_inputs_and_outputs(code_str)
 
     assert in_ == inputs
     assert out == outputs
@@ -0,0 +1,219 @@
+import json
+import base64
+import tracemalloc
+from pathlib import Path
+
+import pytest
+import jupytext
+import nbformat
+
+from soorgeon import ipynb
+
+
+def _notebook():
+    nb = nbformat.v4.new_notebook()
+    nb.metadata.kernelspec = {'name': 'python3', 'display_name': 'Python 3'}
+
+    markdown = nbformat.v4.new_markdown_cell(
+        '## Load\n\n![img](attachment:a.png)')
+    markdown.attachments = {'a.png': {'image/png': 'iVBORw0KGgo='}}
+
+    code = nbformat.v4.new_code_cell(
+        'x = "a \\"quoted\\" string\\\\"\nd = {"key": [1, 2]}\n',
+        execution_count=1,
+        outputs=[
+            nbformat.v4.new_output('stream', text='{[ "brackets" ]}\\'),
+            nbformat.v4.new_output('execute_result', {
+                'text/plain': 'ünicode \\" "}',
+                'image/png': base64.b64encode(b'\x00' * 1000).decode(),
+            },
+                                   execution_count=1),
+        ])
+    code.metadata['tags'] = ['some-tag']
+
+    nb.cells = [
+        markdown,
+        code,
+        nbformat.v4.new_raw_cell('raw'),
+        nbformat.v4.new_code_cell(''),
+    ]
+
+    return nb
+
+
+def _without_outputs(nb):
+    for cell in nb.cells:
+        if cell.cell_type == 'code':
+            cell.outputs = []
+            cell.execution_count = None
+
+    return nb
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_read(tmp_empty, indent):
+    nb = _notebook()
+    Path('nb.ipynb').write_text(
+        json.dumps(nb, indent=indent, ensure_ascii=False))
+
+    expected = _without_outputs(jupytext.read('nb.ipynb'))
+
+    assert ipynb.read('nb.ipynb') == expected
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_read_with_outputs(tmp_empty, indent):
+    nb = _notebook()
+    nb.cells[1].outputs[0]['text'] = ['{[ "brackets" ]}\n', 'line']
+    Path('nb.ipynb').write_text(
+        json.dumps(nb, indent=indent, ensure_ascii=False))
+
+    assert ipynb.read('nb.ipynb', outputs=True) == jupytext.read('nb.ipynb')
+
+
+@pytest.mark.parametrize('outputs', [False, True])
+def test_read_repairs_cell_ids(tmp_empty, outputs):
+    nb = _notebook()
+    nb.cells[1].id = nb.cells[0].id
+    del nb.cells[3]['id']
+    Path('nb.ipynb').write_text(json.dumps(nb))
+
+    with pytest.warns(Warning) as expected_warnings:
+        expected = jupytext.read('nb.ipynb')
+
+    with pytest.warns(Warning) as warnings_:
+        read = ipynb.read('nb.ipynb', outputs=outputs)
+
+    def kept(nb_read):
+        return [
+            cell.get('id') == original.get('id')
+            for cell, original in zip(nb_read.cells, nb.cells)
+        ]
+
+    # new ids are random, but they're set in the same cells
+    assert kept(read) == kept(expected) == [True, False, True, False]
+    assert len({cell.id for cell in read.cells}) == 4
+    assert ({type(w.message) for w in warnings_} == {
+        type(w.message)
+        for w in expected_warnings
+    })
+
+
+def test_read_keeps_cell_ids_before_nbformat_4_5(tmp_empty):
+    nb = _notebook()
+    nb.nbformat_minor = 4
+
+    for cell in nb.cells:
+        del cell['id']
+
+    Path('nb.ipynb').write_text(json.dumps(nb))
+
+    read = ipynb.read('nb.ipynb')
+
+    assert all('id' not in cell for cell in read.cells)
+    assert read == _without_outputs(jupytext.read('nb.ipynb'))
+
+
+def test_read_source_as_lines(tmp_empty):
+    nbformat.write(_notebook(), 'nb.ipynb')
+
+    assert '"source": [' in Path('nb.ipynb').read_text()
+    assert ipynb.read('nb.ipynb') == _without_outputs(
+        jupytext.read('nb.ipynb'))
+
+
+def test_read_removes_transient_metadata(tmp_empty):
+    nb = _notebook()
+    nb.metadata['signature'] = 'sha256:something'
+    nb.cells[1].metadata['trusted'] = True
+    Path('nb.ipynb').write_text(json.dumps(nb))
+
+    read = ipynb.read('nb.ipynb')
+
+    assert 'signature' not in read.metadata
+    assert 'trusted' not in read.cells[1].metadata
+
+
+def test_read_other_formats(tmp_empty):
+    Path('nb.py').write_text('# ## Load\n\nx = 1\n')
+
+    def cells(nb):
+        return [(cell.cell_type, cell.source) for cell in nb.cells]
+
+    assert cells(ipynb.read('nb.py')) == cells(jupytext.read('nb.py'))
+
+
+def test_read_nbformat_3(tmp_empty):
+    nb = {
+        'metadata': {},
+        'nbformat': 3,
+        'nbformat_minor': 0,
+        'worksheets': [{
+            'cells': [{
+                'cell_type': 'code',
+                'input': 'x = 1',
+                'language': 'python',
+                'outputs': [],
+                'metadata': {}
+            }],
+            'metadata': {}
+        }]
+    }
+    Path('nb.ipynb').write_text(json.dumps(nb))
+
+    assert ipynb.read('nb.ipynb') == jupytext.read('nb.ipynb')
+
+
+@pytest.mark.parametrize('content', [
+    '',
+    '{"cells": [',
+    '{"cells": [{"cell_type": "code", "source": "unterminated}]}',
+    'not json',
+])
+def test_read_invalid(tmp_empty, content):
+    Path('nb.ipynb').write_text(content)
+
+    with pytest.raises(Exception) as expected:
+        jupytext.read('nb.ipynb')
+
+    with pytest.raises(type(expected.value)):
+        ipynb.read('nb.ipynb')
+
+
+def test_read_memory_doesnt_depend_on_outputs(tmp_empty):
+    nb = _notebook()
+    image = base64.b64encode(b'\x00' * 10_000_000).decode()
+    nb.cells[1].outputs[1]['data']['image/png'] = image
+    nbformat.write(nb, 'nb.ipynb')
+
+    tracemalloc.start()
+
+    try:
+        ipynb.read('nb.ipynb')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < 1_000_000
+
+
+@pytest.mark.parametrize('doc', [
+    '{}',
+    '{"a": []}',
+    ' { "a" : [ 1 , 2.5e3 , -1 ] , "b" : { } , "c" : null } ',
+    '{"a": "\\\\", "b": "\\"", "c": "\\\\\\"}[", "d": [[{"e": true}]]}',
+    '{"a\\"b": false, "c": ["]", "}", "{"]}',
+])
+def test_scanner(doc):
+    scanner = ipynb._Scanner(doc.encode())
+    expected = json.loads(doc)
+
+    assert {key: scanner.value()
+            for key in scanner.object()} == expected
+
+    scanner = ipynb._Scanner(doc.encode())
+
+    for _ in scanner.object():
+        scanner.skip()
+
+    assert scanner._pos == len(doc)
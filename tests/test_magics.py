@@ -1,7 +1,7 @@
 import pytest
 import jupytext
 
-from soorgeon import magics
+from soorgeon import magics, io
 
 source = """\
 # ## first
@@ -27,12 +27,15 @@ print('x')
 """
 
 
-@pytest.mark.parametrize('source, expected', [
-    ['%%html\na\nb', '# [magic] %%html\n# [magic] a\n# [magic] b'],
-    ['%%capture\na\nb', '# [magic] %%capture\na\nb'],
-    ['%%timeit\na\nb', '# [magic] %%timeit\na\nb'],
-    ['%%time\na\nb', '# [magic] %%time\na\nb'],
-    ['%time 1\n2\n%time 3', '# [magic] %time 1\n2\n# [magic] %time 3'],
+@pytest.mark.parametrize('source, expected, spans', [
+    ['%%html\na\nb', '\n\n', ((0, '%%html\n'), (1, 'a\n'), (2, 'b'))],
+    ['%%capture\na\nb', '\na\nb', ((0, '%%capture\n'), )],
+    ['%%timeit\na\nb', '\na\nb', ((0, '%%timeit\n'), )],
+    ['%%time\na\nb', '\na\nb', ((0, '%%time\n'), )],
+    ['%time 1\n2\n%time 3', '\n2\n', ((0, '%time 1\n'), (2, '%time 3'))],
+    ['x = 1\n  ! ls\ny = 2\n', 'x = 1\n\ny = 2\n', ((1, '  ! ls\n'), )],
+    ['x = 10 % 3\n!\n', 'x = 10 % 3\n!\n', ()],
+    ['x = 1\r\n%cd x\r\n', 'x = 1\r\n\r\n', ((1, '%cd x\r\n'), )],
 ],
                          ids=[
                              'another-language',
@@ -40,92 +43,66 @@ print('x')
                              'inline-python-2',
                              'inline-python-3',
                              'line-magics',
+                             'inline-shell',
+                             'no-magics',
+                             'windows-line-breaks',
                          ])
-def test_comment_if_ipython_magic(source, expected):
-    assert magics._comment_if_ipython_magic(source) == expected
-
-
-def test_comment_magics():
-    nb = jupytext.reads(source, fmt='py:light')
-
-    nb_new = magics.comment_magics(nb)
-
-    assert [c['source'] for c in nb_new.cells] == [
-        '## first',
-        '# [magic] %%bash\n# [magic] ls',
-        '# [magic] %%html\n# [magic] <br>hi',
-        '## second',
-        '# [magic] %timeit 1 + 1',
-        '# [magic] %cd x',
-        "# [magic] %%capture\nprint('x')",
-        '# [magic] ! echo hello',
-    ]
+def test_tokenize(source, expected, spans):
+    code, spans_ = magics.tokenize(source)
 
+    assert code == expected
+    assert spans_ == spans
+    assert magics.restore(code, spans_) == source
 
-@pytest.mark.parametrize('line, expected', [
-    ['# [magic] %%timeit something()', '%%timeit something()'],
-    ['# [magic] %timeit something()', '%timeit something()'],
-    ['# [magic] %some_magic another()', '%some_magic another()'],
-])
-def test_uncomment_magic(line, expected):
-    assert magics._uncomment_magic(line) == expected
 
+def test_tokenize_shares_source_without_magics():
+    source = 'x = 1\ny = 2'
+    assert magics.tokenize(source)[0] is source
 
-@pytest.mark.parametrize('line, expected', [
-    ['# [magic] %%timeit something()', False],
-    ['something() # [magic] %timeit', ('something()', '%timeit')],
-    ['another() # [magic] %time', ('another()', '%time')],
-])
-def test_is_commented_line_magic(line, expected):
-    assert magics._is_commented_line_magic(line) == expected
 
-
-def test_uncomment_magics_cell():
+def test_mask_magics():
     nb = jupytext.reads(source, fmt='py:light')
+    sources = [c['source'] for c in nb.cells]
 
-    nb_new = magics.comment_magics(nb)
-
-    assert [magics._uncomment_magics_cell(c['source'])
-            for c in nb_new.cells] == [
-                '## first',
-                '%%bash\nls',
-                '%%html\n<br>hi',
-                '## second',
-                '%timeit 1 + 1',
-                '%cd x',
-                "%%capture\nprint('x')",
-                '! echo hello',
-            ]
-
-
-def test_uncomment_magics():
-    nb = jupytext.reads(source, fmt='py:light')
+    nb_new, spans = magics.mask_magics(nb)
 
-    nb_new = magics.comment_magics(nb)
-    nb_out = magics.uncomment_magics(nb_new)
-
-    assert [c['source'] for c in nb_out.cells] == [
+    assert [c['source'] for c in nb_new.cells] == [
         '## first',
-        '%%bash\nls',
-        '%%html\n<br>hi',
+        '\n',
+        '\n',
         '## second',
-        '%timeit 1 + 1',
-        '%cd x',
-        "%%capture\nprint('x')",
-        '! echo hello',
+        '',
+        '',
+        "\nprint('x')",
+        '',
     ]
+    assert [magics.restore(c['source'], s)
+            for c, s in zip(nb_new.cells, spans)] == sources
+    # nb is not modified
+    assert [c['source'] for c in nb.cells] == sources
 
 
-@pytest.mark.parametrize('line, expected', [
-    ['%timeit x = 1', 'x = 1 # [magic] %timeit'],
-    ['%time x = 1', 'x = 1 # [magic] %time'],
-    ['     %time x = 1', 'x = 1 # [magic] %time'],
+@pytest.mark.parametrize('source, expected', [
+    ['import x\n%time f()\ny', '%time f()\ny'],
+    ['%%capture\nimport x\ny = 1', '%%capture\ny = 1'],
+    ['%%capture\nimport x\n\ny = 1', '%%capture\n\ny = 1'],
+    ['%%capture\nimport x', '%%capture'],
+    ['%%capture\nimport x\n', '%%capture\n'],
+    ['%load_ext autoreload\n%autoreload 2\n\nimport x\nimport y',
+     '%load_ext autoreload\n%autoreload 2'],
+    ['%%bash\nimport x', '%%bash\nimport x'],
+    ['import x\ny = 1', '\ny = 1'],
 ],
                          ids=[
-                             'time',
-                             'timeit',
-                             'leading-whitespace',
+                             'line-magic',
+                             'magic-above-import',
+                             'keeps-empty-lines',
+                             'only-import',
+                             'only-import-line-break',
+                             'magics-above-imports',
+                             'another-language',
+                             'no-magics',
                          ])
-def test_comment_ipython_line_magic(line, expected):
-    magic = magics._is_ipython_line_magic(line)
-    assert magics._comment_ipython_line_magic(line, magic) == expected
+def test_map_code_remove_imports(source, expected):
+    code, spans = magics.tokenize(source)
+    assert magics.map_code(io.remove_imports, code, spans) == expected
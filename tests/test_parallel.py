@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from soorgeon import parallel
+
+
+def _add(shared, item):
+    return shared + item, os.getpid()
+
+
+@pytest.mark.parametrize('jobs, items, expected', [
+    [None, [1, 2], False],
+    [1, [1, 2], False],
+    [2, [1], False],
+    [2, [1, 2], True],
+])
+def test_is_parallel(jobs, items, expected):
+    assert parallel.is_parallel(jobs, items) is expected
+
+
+@pytest.mark.parametrize('jobs', [None, 1, 2, 3])
+def test_run_keeps_order(jobs):
+    results = parallel.run(_add, list(range(20)), jobs, shared=10)
+
+    assert [value for value, _ in results] == list(range(10, 30))
+
+
+def test_run_in_current_process():
+    results = parallel.run(_add, [1, 2], None, shared=0)
+
+    assert {pid for _, pid in results} == {os.getpid()}
+
+
+def test_run_in_other_processes():
+    results = parallel.run(_add, [1, 2], 2, shared=0)
+
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def _add_args(shared, item, other):
+    return shared + item + other, os.getpid()
+
+
+@pytest.mark.parametrize('jobs', [None, 1, 2, 3])
+def test_pool_keeps_order(jobs):
+    with parallel.Pool(jobs, shared=10) as pool:
+        results = pool.map(_add_args, list(range(20)), 100)
+
+    assert [value for value, _ in results] == list(range(110, 130))
+
+
+def test_pool_runs_items_in_the_same_worker():
+    with parallel.Pool(2, shared=0) as pool:
+        first = pool.map(_add, list(range(5)))
+        second = pool.map(_add, list(range(5)))
+
+    pids = [pid for _, pid in first]
+
+    assert os.getpid() not in pids
+    assert len(set(pids)) == 2
+    assert pids == [pid for _, pid in second]
+
+
+def test_pool_in_current_process():
+    with parallel.Pool(2, shared=0) as pool:
+        results = pool.map(_add, [1])
+
+    assert {pid for _, pid in results} == {os.getpid()}
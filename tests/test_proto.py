@@ -2,7 +2,7 @@ import jupytext
 import pytest
 
 from testutils import exploratory, mixed, _read
-from soorgeon import proto
+from soorgeon import proto, io
 
 # TODO: do we need roundtrip conversion? we'l only use this for static analysis
 # so i think we're fine
@@ -32,7 +32,7 @@ def test_prototask_add_imports_cell(cells_idx, expected):
                          df_format=None,
                          serializer=None,
                          py=True)
-    cell = pt._add_imports_cell(exploratory,
+    cell = pt._add_imports_cell(io.ImportsParser(exploratory),
                                 add_pathlib_and_pickle=False,
                                 definitions=None,
                                 df_format=None,
@@ -0,0 +1,334 @@
+import os
+import threading
+from pathlib import Path
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import jupytext
+from click.testing import CliRunner
+
+import soorgeon
+from soorgeon import server, cli, export, exceptions
+
+simple = """# ## Cell 0
+
+x = 1
+
+# ## Cell 2
+
+y = x + 1
+
+# ## Cell 4
+
+z = y + 1
+"""
+
+
+@pytest.fixture(scope='module')
+def soorgeon_server():
+    return server.Server(max_sessions=2)
+
+
+@pytest.fixture
+def running(soorgeon_server, tmp_path, monkeypatch):
+    """Runs the server in a thread, yields the socket's path
+    """
+    # short path, since Unix sockets have a length limit
+    path = Path(f'/tmp/soorgeon-test-{os.getpid()}.sock')
+    monkeypatch.setenv('SOORGEON_SOCKET', str(path))
+
+    with soorgeon_server.listen(path) as unix_server:
+        thread = threading.Thread(target=unix_server.serve_forever)
+        thread.start()
+
+        try:
+            yield path
+        finally:
+            unix_server.shutdown()
+            thread.join()
+
+    assert not path.exists()
+
+
+def _files_in(directory):
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in Path(directory).glob('**/*') if path.is_file()
+    }
+
+
+def test_call_if_not_running(tmp_empty):
+    with pytest.raises(server.NotRunningError):
+        server.call('ping', socket_path='missing.sock')
+
+
+def test_call_if_disabled(running, monkeypatch):
+    monkeypatch.setenv('SOORGEON_NO_SERVER', '1')
+
+    with pytest.raises(server.NotRunningError):
+        server.call('ping')
+
+
+def test_call_with_stale_socket(tmp_empty):
+    path = Path(tmp_empty, 'stale.sock')
+    stale = server.socket.socket(server.socket.AF_UNIX)
+    stale.bind(str(path))
+    stale.close()
+
+    with pytest.raises(server.NotRunningError):
+        server.call('ping', socket_path=path)
+
+
+def test_call_timeout(tmp_empty):
+    path = Path(tmp_empty, 'busy.sock')
+
+    # accepts connections but never replies
+    with server.socket.socket(server.socket.AF_UNIX) as busy:
+        busy.bind(str(path))
+        busy.listen()
+
+        with pytest.raises(server.UnavailableError) as excinfo:
+            server.call('ping', socket_path=path, timeout=0.1)
+
+    assert 'did not reply in 0.1s' in str(excinfo.value)
+
+
+def test_refuses_requests_from_other_versions(soorgeon_server):
+    response = soorgeon_server.handle({'method': 'ping', 'version': '0.0.1'})
+
+    assert response['error']['type'] == 'VersionMismatch'
+    assert 'got a request from version 0.0.1' in response['error']['message']
+    assert 'result' not in response
+
+
+def test_call_with_other_version(running, soorgeon_server, monkeypatch):
+    response = soorgeon_server.handle({'method': 'ping', 'version': '0.0.1'})
+    monkeypatch.setattr(soorgeon_server, 'handle',
+                        Mock(return_value=response))
+
+    with pytest.raises(server.UnavailableError):
+        server.call('ping')
+
+
+def test_ping(running):
+    assert server.call('ping') == 'pong'
+
+
+def test_unknown_method(running):
+    with pytest.raises(exceptions.BaseException) as excinfo:
+        server.call('unknown')
+
+    assert 'method must be one of' in str(excinfo.value)
+
+
+def test_already_running(running, soorgeon_server):
+    with pytest.raises(exceptions.BaseException) as excinfo:
+        with soorgeon_server.listen(running):
+            pass
+
+    assert 'already running' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analyze(tmp_empty, running, engine):
+    Path('nb.py').write_text(simple)
+    path = os.path.abspath('nb.py')
+
+    expected = soorgeon.analyze(path, engine=engine)._asdict()
+
+    assert server.call('analyze', path=path, engine=engine) == expected
+    # the second call uses the analysis in memory
+    assert server.call('analyze', path=path, engine=engine) == expected
+
+
+def test_analyze_updates_analysis(tmp_empty, running):
+    Path('nb.py').write_text(simple)
+    path = os.path.abspath('nb.py')
+    server.call('analyze', path=path)
+
+    Path('nb.py').write_text(simple.replace('y = x + 1', 'y = 1'))
+
+    assert server.call('analyze', path=path)['upstream'] == {
+        'cell-0': [],
+        'cell-2': [],
+        'cell-4': ['cell-2'],
+    }
+
+
+def test_keeps_max_sessions(tmp_empty, running, soorgeon_server):
+    for name in ['a', 'b', 'c']:
+        Path(f'{name}.py').write_text(simple)
+        server.call('analyze', path=os.path.abspath(f'{name}.py'))
+
+    assert [key[1] for key in soorgeon_server._sessions] == [
+        os.path.abspath('b.py'),
+        os.path.abspath('c.py'),
+    ]
+
+
+def test_analyze_error(tmp_empty, running):
+    Path('nb.py').write_text('# ## Section\n\nfrom math import *\n')
+
+    with pytest.raises(exceptions.InputError) as excinfo:
+        server.call('analyze', path=os.path.abspath('nb.py'))
+
+    assert 'star imports' in str(excinfo.value).lower()
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {
+        'file_format': 'py',
+        'product_prefix': 'some-dir'
+    },
+    {
+        'single_task': True
+    },
+])
+def test_refactor(tmp_empty, running, kwargs):
+    Path('nb.py').write_text(simple)
+    Path('local').mkdir()
+    Path('served').mkdir()
+
+    params = {
+        'product_prefix': None,
+        'df_format': None,
+        'single_task': False,
+        'file_format': None,
+        'serializer': None,
+        **kwargs
+    }
+    export.refactor(Path('nb.py').absolute(), output_dir='local', **params)
+    server.call('refactor',
+                path=os.path.abspath('nb.py'),
+                cwd=os.path.abspath('served'),
+                **params)
+
+    assert _files_in('served') == _files_in('local')
+
+
+def test_refactor_suggests_single_task(tmp_empty, running, monkeypatch):
+    Path('nb.py').write_text(simple)
+    monkeypatch.setattr(export.NotebookExporter, 'export',
+                        Mock(side_effect=KeyError('some-key')))
+
+    with pytest.raises(exceptions.InputError) as excinfo:
+        server.call('refactor',
+                    path=os.path.abspath('nb.py'),
+                    cwd=tmp_empty)
+
+    assert '--single-task' in str(excinfo.value)
+    assert 'some-key' in str(excinfo.value)
+
+
+def test_concurrent_requests(tmp_empty, running):
+    notebooks = {
+        f'nb-{idx}.py': simple.replace('x = 1', f'x = {idx}')
+        for idx in range(8)
+    }
+
+    for name, code in notebooks.items():
+        Path(name).write_text(code)
+
+    def analyze(name):
+        return server.call('analyze', path=os.path.abspath(name))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(analyze, notebooks))
+
+    expected = soorgeon.analyze(jupytext.reads(simple))._asdict()
+    assert all(result == expected for result in results)
+
+
+def test_captures_output(tmp_empty, running, monkeypatch):
+    Path('script.py').write_text('x = 1\n')
+
+    def basic_clean(path):
+        cli.click.echo(f'Finished cleaning {path}')
+
+    monkeypatch.setattr('soorgeon.clean.basic_clean', basic_clean)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.clean, ['script.py'])
+
+    assert result.exit_code == 0
+    path = Path(tmp_empty, 'script.py')
+    assert result.output == f'Finished cleaning {path}\n'
+
+
+@pytest.mark.parametrize('args', [
+    ['analyze', 'nb.py'],
+    ['analyze', 'nb.py', '--json'],
+    ['refactor', 'nb.py'],
+])
+def test_cli_forwards_to_server(tmp_empty, running, monkeypatch, args):
+    runner = CliRunner()
+
+    for directory in ['local', 'served']:
+        Path(directory).mkdir()
+        Path(directory, 'nb.py').write_text(simple)
+
+    os.chdir('local')
+    expected = runner.invoke(cli.cli, args, env={'SOORGEON_NO_SERVER': '1'})
+
+    # make sure the command doesn't run in this process
+    monkeypatch.setattr(export, 'refactor', Mock(side_effect=ValueError))
+    monkeypatch.setattr('soorgeon.structure.analyze',
+                        Mock(side_effect=ValueError))
+
+    os.chdir('../served')
+    result = runner.invoke(cli.cli, args)
+
+    assert result.exit_code == 0
+    assert result.output == expected.output
+    assert _files_in('.') == _files_in('../local')
+
+
+def test_cli_refactor_with_log_runs_in_process(tmp_empty, running,
+                                               monkeypatch):
+    Path('nb.py').write_text(simple)
+    monkeypatch.setattr(server, 'call', Mock(side_effect=ValueError))
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor', 'nb.py', '--log', 'info'])
+
+    assert result.exit_code == 0
+    assert Path('pipeline.yaml').exists()
+
+
+def test_cli_falls_back_if_server_is_unavailable(tmp_empty, running,
+                                                 monkeypatch):
+    Path('nb.py').write_text(simple)
+    monkeypatch.setattr(server, 'call',
+                        Mock(side_effect=server.UnavailableError('timeout')))
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor', 'nb.py'])
+
+    assert result.exit_code == 0
+    assert Path('pipeline.yaml').exists()
+
+
+def test_refactor_does_not_take_jobs(tmp_empty, running):
+    Path('nb.py').write_text(simple)
+
+    with pytest.raises(exceptions.BaseException) as excinfo:
+        server.call('refactor',
+                    path=os.path.abspath('nb.py'),
+                    cwd=tmp_empty,
+                    jobs=2)
+
+    assert 'jobs' in str(excinfo.value)
+
+
+def test_cli_refactor_with_jobs_runs_in_process(tmp_empty, running,
+                                                monkeypatch):
+    Path('nb.py').write_text(simple)
+    monkeypatch.setattr(server, 'call', Mock(side_effect=ValueError))
+
+    runner = CliRunner()
+    result = runner.invoke(cli.cli, ['refactor', 'nb.py', '--jobs', '2'])
+
+    assert result.exit_code == 0
+    assert Path('pipeline.yaml').exists()
@@ -0,0 +1,151 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import jupytext
+from parso.cache import parser_cache
+
+from soorgeon import export, session as session_module
+from soorgeon.session import Session
+
+eda = """# ## Load
+
+import pandas as pd
+import seaborn as sns
+from sklearn.datasets import load_iris
+
+df = load_iris(as_frame=True)['data']
+
+# ## Clean
+
+df = df[df['petal length (cm)'] > 2]
+
+# ## Plot
+
+sns.histplot(df['petal length (cm)'])
+"""
+
+
+def _read(nb_str):
+    return jupytext.reads(nb_str, fmt='py:light')
+
+
+def _edit(old, new):
+    assert old in eda
+    return _read(eda.replace(old, new))
+
+
+def _sessions_trees(session):
+    trees = parser_cache.get(session._grammar._hashed, {})
+    return {path for path in trees if session._root in path.parents}
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+@pytest.mark.parametrize('old, new, misses', [
+    ['df = df[df', 'df = df[df.x > 0]\ndf = df[df', 1],
+    ['sns.histplot(', 'plot = sns.histplot(', 1],
+    # adding an import changes the names the next sections inherit
+    ['import pandas as pd', 'import pandas as pd\nimport numpy as np', 3],
+],
+                         ids=['clean', 'plot', 'load'])
+def test_update_only_analyzes_sections_that_changed(engine, old, new,
+                                                    misses):
+    session = Session(engine=engine, py=True)
+    session.update(_read(eda))
+
+    nb = _edit(old, new)
+    hits, misses_before = session.cache.hits, session.cache.misses
+    analysis = session.update(nb)
+    expected = export.NotebookExporter(nb, py=True)
+
+    # each section has two entries: the names it defines (only missing for
+    # the edited section) and its inputs and outputs
+    assert session.cache.misses - misses_before == 1 + misses
+    assert session.cache.hits - hits == 6 - 1 - misses
+    assert analysis.io == expected.analysis.io
+    assert analysis.upstream == expected.analysis.upstream
+    assert session.exporter.get_sources() == expected.get_sources()
+
+
+def test_update_reuses_trees():
+    session = Session()
+    session.update(_read(eda))
+    tree = session.exporter.tree
+    clean = session.exporter._context.get_tree('clean')
+
+    session.update(_edit('df = df[df', 'df = df[df.x > 0]\ndf = df[df'))
+
+    # the diff parser updates the trees in place
+    assert session.exporter.tree is tree
+    assert session.exporter._context.get_tree('clean') is clean
+    assert clean.get_code() == ("df = df[df.x > 0]\n"
+                                "df = df[df['petal length (cm)'] > 2]")
+
+
+def test_update_forgets_removed_sections():
+    session = Session()
+    session.update(_read(eda))
+    session.update(_edit('# ## Plot', '# ## Another plot'))
+
+    names = {path.name for path in _sessions_trees(session)}
+
+    assert names == {'notebook', 'load', 'clean'}
+
+
+def test_close():
+    with Session() as session:
+        session.update(_read(eda))
+
+        assert _sessions_trees(session)
+
+    assert not _sessions_trees(session)
+
+    with pytest.raises(ValueError) as excinfo:
+        session.exporter
+
+    assert 'Call update before' in str(excinfo.value)
+
+
+def test_parses_with_lock(monkeypatch):
+    lock = threading.Lock()
+    monkeypatch.setattr(session_module, '_parser_cache_lock', lock)
+    session = Session()
+    parse = session._grammar.parse
+    calls = []
+
+    def parse_with_lock(*args, **kwargs):
+        calls.append(lock.locked())
+        return parse(*args, **kwargs)
+
+    monkeypatch.setattr(session._grammar, 'parse', parse_with_lock)
+
+    session.update(_read(eda))
+    session.update(_edit('# ## Plot', '# ## Another plot'))
+
+    assert calls and all(calls)
+
+
+def test_sessions_in_threads():
+    notebooks = [
+        eda.replace('> 2', f'> {idx}') + f'\nx_{idx} = {idx}\n'
+        for idx in range(8)
+    ]
+
+    def update(code):
+        with Session() as session:
+            for _ in range(3):
+                session.update(_read(code))
+                session.update(_read(code.replace('# ## Plot', '# ## Other')))
+
+            return session.exporter.get_sources()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(update, notebooks))
+
+    expected = [
+        export.NotebookExporter(_read(code.replace('# ## Plot',
+                                                   '# ## Other')),
+                                verbose=False).get_sources()
+        for code in notebooks
+    ]
+    assert results == expected
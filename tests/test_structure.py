@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+import jupytext
+
+import soorgeon
+from soorgeon import structure, proto, exceptions
+
+eda = """# ## Load
+
+import pandas as pd
+import seaborn as sns
+from sklearn.datasets import load_iris
+
+df = load_iris(as_frame=True)['data']
+unused = 1
+
+# ## Clean
+
+def clean(df):
+    return df[df['petal length (cm)'] > 2]
+
+df = clean(df)
+
+# ## Plot
+
+sns.histplot(df['petal length (cm)'])
+"""
+
+
+def _read(nb_str):
+    return jupytext.reads(nb_str, fmt='py:light')
+
+
+@pytest.mark.parametrize('engine', ['parso', 'ast'])
+def test_analyze(engine):
+    result = soorgeon.analyze(_read(eda), engine=engine)
+
+    assert result.sections == ['load', 'clean', 'plot']
+    assert result.inputs == {'load': [], 'clean': ['df'], 'plot': ['df']}
+    assert result.outputs == {
+        'load': ['df', 'unused'],
+        'clean': ['df'],
+        'plot': [],
+    }
+    assert result.outputs_pruned == {
+        'load': ['df'],
+        'clean': ['df'],
+        'plot': [],
+    }
+    assert result.upstream == {
+        'load': [],
+        'clean': ['load'],
+        'plot': ['clean'],
+    }
+    assert list(result.definitions) == ['clean']
+
+
+def test_analyze_path(tmp_empty):
+    Path('nb.py').write_text(eda)
+
+    result = soorgeon.analyze('nb.py')
+
+    assert result == soorgeon.analyze(_read(eda))
+    assert json.loads(json.dumps(result._asdict())) == result._asdict()
+
+
+def test_analyze_doesnt_generate_code(tmp_empty, monkeypatch):
+    export_ = Mock()
+    monkeypatch.setattr(proto.ProtoTask, 'export', export_)
+
+    soorgeon.analyze(_read(eda))
+
+    export_.assert_not_called()
+    assert not list(Path('.').iterdir())
+
+
+def test_analyze_runs_checks():
+    nb = _read('# ## Section\n\nfrom math import *\n')
+
+    with pytest.raises(exceptions.InputError):
+        soorgeon.analyze(nb)
+
+
+def test_to_text():
+    text = structure.to_text(soorgeon.analyze(_read(eda)))
+
+    assert text == """\
+load
+  upstream: -
+  inputs: -
+  outputs: df
+clean
+  upstream: load
+  inputs: df
+  outputs: df
+plot
+  upstream: clean
+  inputs: df
+  outputs: -
+
+definitions: clean"""
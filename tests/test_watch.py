@@ -0,0 +1,134 @@
+import os
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from soorgeon import cli
+from soorgeon.watch import Watcher
+
+nb = """# ## Load
+
+import pandas as pd
+
+df = pd.DataFrame({'x': [1, 2, 3]})
+
+# ## Clean
+
+df = df[df.x > 1]
+
+# ## Plot
+
+df.plot()
+"""
+
+
+def _write(content, mtime):
+    Path('nb.py').write_text(content)
+    # make sure the watcher sees a new modification time
+    os.utime('nb.py', (mtime, mtime))
+
+
+def test_first_update_exports_project(tmp_empty):
+    _write(nb, 1)
+
+    written = Watcher('nb.py').update()
+
+    assert set(written) == {
+        'tasks/load.py', 'tasks/clean.py', 'tasks/plot.py', 'pipeline.yaml'
+    }
+    assert Path('requirements.txt').exists()
+    assert Path('README.md').exists()
+    assert Path('.gitignore').read_text() == 'output\n'
+
+
+def test_update_only_writes_files_that_changed(tmp_empty):
+    _write(nb, 1)
+    watcher = Watcher('nb.py')
+    watcher.update()
+    requirements = Path('requirements.txt').read_text()
+
+    assert watcher.update() is None
+
+    _write(nb.replace('df.plot()', 'df.plot(kind="hist")'), 2)
+
+    assert watcher.update() == ['tasks/plot.py']
+    assert 'kind="hist"' in Path('tasks', 'plot.py').read_text()
+    assert Path('requirements.txt').read_text() == requirements
+
+
+def test_update_deletes_tasks_from_removed_sections(tmp_empty):
+    _write(nb, 1)
+    watcher = Watcher('nb.py')
+    watcher.update()
+
+    _write(nb.replace('# ## Plot', '# ## Another plot'), 2)
+
+    assert set(watcher.update()) == {'tasks/another-plot.py', 'pipeline.yaml'}
+    assert not Path('tasks', 'plot.py').exists()
+
+
+def test_update_writes_definitions(tmp_empty):
+    _write(nb, 1)
+    watcher = Watcher('nb.py')
+    watcher.update()
+
+    with_definitions = nb.replace('df.plot()',
+                                  'def plot(df):\n    df.plot()\n')
+    _write(with_definitions, 2)
+
+    assert 'exported.py' in watcher.update()
+    assert 'def plot(df):' in Path('exported.py').read_text()
+
+    # saved again, but nothing changed
+    _write(with_definitions, 3)
+
+    assert watcher.update() == []
+
+
+def test_refactor_watch(tmp_empty, monkeypatch):
+    _write(nb, 1)
+
+    def sleep(interval):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr('soorgeon.watch.time.sleep', sleep)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, ['nb.py', '--watch'])
+
+    assert result.exit_code == 0
+    assert 'Stopped watching' in result.output
+    assert Path('pipeline.yaml').exists()
+
+
+@pytest.mark.parametrize('content', [
+    nb + '\nif\n',
+    nb.replace('df.plot()', 'df.plot(undefined)'),
+])
+def test_refactor_watch_keeps_going_if_notebook_has_errors(
+        tmp_empty, monkeypatch, content):
+    _write(content, 1)
+
+    def sleep(interval):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr('soorgeon.watch.time.sleep', sleep)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor, ['nb.py', '--watch'])
+
+    assert result.exit_code == 0
+    assert 'Error: ' in result.output
+    assert not Path('pipeline.yaml').exists()
+
+
+def test_refactor_watch_single_task(tmp_empty):
+    _write(nb, 1)
+
+    runner = CliRunner()
+    result = runner.invoke(cli.refactor,
+                           ['nb.py', '--watch', '--single-task'])
+
+    assert result.exit_code == 2
+    assert '--watch cannot be used with --single-task' in result.output
@@ -0,0 +1,144 @@
+"""
+writers.writes must return the same output as jupytext.writes
+"""
+from glob import glob
+from pathlib import Path
+
+import jupytext
+import nbformat
+import pytest
+from conftest import PATH_TO_TESTS
+
+from soorgeon import writers
+from soorgeon.export import NotebookExporter
+
+_kaggle = Path(PATH_TO_TESTS, '..', '_kaggle', '_render')
+path_to_nbs = sorted(glob(str(Path(_kaggle, '*', '*.py')))) + sorted(
+    glob(str(Path(PATH_TO_TESTS, 'assets', 'nb-*.py'))))
+
+
+def get_name(path):
+    path = Path(path)
+    return path.stem if path.parent.name == 'assets' else path.parent.name
+
+
+names = [get_name(nb) for nb in path_to_nbs]
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Records the notebooks passed to writers.writes
+    """
+    notebooks = []
+    writes = writers.writes
+
+    def record(nb, fmt):
+        notebooks.append((nb, fmt))
+        return writes(nb, fmt)
+
+    monkeypatch.setattr(writers, 'writes', record)
+
+    return notebooks
+
+
+@pytest.mark.parametrize('py', [True, False], ids=['py', 'ipynb'])
+@pytest.mark.parametrize('path', path_to_nbs, ids=names)
+def test_tasks_match_jupytext(written, path, py):
+    NotebookExporter(jupytext.read(path), py=py, verbose=False).get_sources()
+
+    assert written
+
+    for nb, fmt in written:
+        # the tasks don't have cells that need jupytext
+        text = (writers._to_percent(nb)
+                if py else writers._to_ipynb(nb))
+
+        assert text is not None
+        assert text == jupytext.writes(nb, fmt=fmt)
+
+
+def _nb(*cells, **metadata):
+    nb = nbformat.v4.new_notebook(metadata=metadata)
+    nb.cells = list(cells)
+    return nb
+
+
+_code = nbformat.v4.new_code_cell
+_markdown = nbformat.v4.new_markdown_cell
+
+
+@pytest.mark.parametrize('nb', [
+    _nb(_code('x = 1'), _code('y = 2')),
+    _nb(_code('')),
+    _nb(_code('x = 1\n'), _markdown('')),
+    _nb(_markdown('## header\n\nsome text'), _code('x = 1')),
+    _nb(_code('def fn():\n    pass'), _code('x = 1')),
+    _nb(_code('x = 1'), _code('class A:\n    pass')),
+    _nb(_code('x = """\ndef fn():\n"""'), _code('x = 1')),
+    _nb(_code('    x = 1')),
+    _nb(_code('x = 1', metadata=dict(tags=['parameters'])),
+        _code('y = 1', metadata=dict(tags=[]))),
+    _nb(_code('x = 1', metadata=dict(key=None, _uuid='abc', some=[1]))),
+    _nb(_markdown('text', metadata=dict(tags=['tag'], key='é'))),
+    _nb(_code('x = 1', metadata=dict(lines_to_next_cell=3, scrolled=True)),
+        _code('y = 2')),
+    _nb(_code('%timeit 1 + 1'), _code('! ls')),
+    _nb(_code('x = 1\ndf.head?'), _code('cd some-dir')),
+    _nb(_code('%%bash\nls'), _markdown('%%html')),
+    _nb(nbformat.v4.new_raw_cell('raw')),
+    _nb(_code('x = 1', metadata=dict(title='title', hide_input=True))),
+    _nb(_code('x = 1', metadata={'some key': 1})),
+    _nb(_code('x = 1'), language_info=dict(name='python')),
+],
+                         ids=[
+                             'code',
+                             'empty',
+                             'trailing-line-break',
+                             'markdown',
+                             'function',
+                             'next-class',
+                             'quoted-function',
+                             'indented',
+                             'tags',
+                             'metadata',
+                             'markdown-metadata',
+                             'lines-to-next-cell',
+                             'magics',
+                             'help-and-shell',
+                             'cell-magics',
+                             'raw',
+                             'jupytext-metadata',
+                             'invalid-key',
+                             'notebook-metadata',
+                         ])
+@pytest.mark.parametrize('fmt', ['py:percent', 'ipynb'])
+def test_writes(nb, fmt):
+    assert writers.writes(nb, fmt) == jupytext.writes(nb, fmt=fmt)
+
+
+@pytest.mark.parametrize('cell', [
+    _code('x = 1', metadata=dict(trusted=True)),
+    _code('x = 1',
+          outputs=[nbformat.v4.new_output('stream', text='a\nb\n')]),
+    _markdown('text', attachments={'a.png': {
+        'image/png': 'abc'
+    }}),
+],
+                         ids=[
+                             'trusted',
+                             'outputs',
+                             'attachments',
+                         ])
+def test_writes_ipynb(cell):
+    nb = _nb(cell,
+             kernelspec=dict(display_name='Python 3',
+                             language='python',
+                             name='python3'))
+    assert writers.writes(nb, 'ipynb') == jupytext.writes(nb, fmt='ipynb')
+
+
+def test_writes_unknown_format():
+    with pytest.raises(ValueError) as excinfo:
+        writers.writes(_nb(), 'md')
+
+    assert "fmt must be one of 'py:percent' or 'ipynb'" in str(excinfo.value)